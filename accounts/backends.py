@@ -0,0 +1,115 @@
+"""
+Authentication backend that keeps signed-in users in memory.
+
+Without it every authenticated request loads its User by primary key.
+CachedModelBackend keeps up to MAX_USERS recently seen users per process,
+for at most AUTH_USER_CACHE_SECONDS.
+
+A cached user is only served while its version in the AUTH_USER_CACHE
+cache is unchanged. Saving or deleting a User bumps that version from a
+signal. That covers toggle_user_active, delete_user, password changes and
+resets, and last_login updates. Every process drops its copy on its next
+request for that user. So that other processes see the bump, point
+AUTH_USER_CACHE at a cache they share (Redis, Memcached).
+QuerySet.update() sends no signals: call invalidate_user after using it
+on users.
+
+The version is read before the user is loaded, and bumped both when the
+change is made and when it commits. A change landing between the two
+reads therefore leaves an entry that is already out of date, never a
+stale one that looks current. Users are loaded from the primary database,
+as a lagging replica could return the old row under the new version.
+Inactive users are never returned, cached or not.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_save
+
+MAX_USERS = 256
+
+_users = OrderedDict()  # user id -> (user, version, expires)
+_lock = threading.Lock()
+
+
+def _versions():
+    return caches[settings.AUTH_USER_CACHE]
+
+
+def _version_key(user_id):
+    return f'auth_user_version:{user_id}'
+
+
+def invalidate_user(user_id):
+    """Make every process reload this user on its next request."""
+    key = _version_key(user_id)
+    versions = _versions()
+    versions.add(key, 0, timeout=None)
+    try:
+        versions.incr(key)
+    except ValueError:  # Evicted in between
+        versions.set(key, 1, timeout=None)
+    with _lock:
+        _users.pop(user_id, None)
+
+
+def clear():
+    with _lock:
+        _users.clear()
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend with get_user served from a small per-process cache."""
+
+    def get_user(self, user_id):
+        if not settings.AUTH_USER_CACHE_SECONDS:
+            return super().get_user(user_id)
+        try:
+            user_id = get_user_model()._meta.pk.to_python(user_id)
+        except ValidationError:
+            return None
+        version = _versions().get(_version_key(user_id), 0)
+        now = time.monotonic()
+        with _lock:
+            entry = _users.get(user_id)
+            if entry is not None:
+                user, cached_version, expires = entry
+                if cached_version == version and now < expires:
+                    _users.move_to_end(user_id)
+                    # A copy, so changes a view makes to request.user stay in that request
+                    return copy.deepcopy(user)
+                del _users[user_id]
+
+        try:
+            user = get_user_model()._default_manager.using(DEFAULT_DB_ALIAS).get(pk=user_id)
+        except get_user_model().DoesNotExist:
+            return None
+        if self.user_can_authenticate(user):
+            with _lock:
+                _users[user_id] = (copy.deepcopy(user), version, now + settings.AUTH_USER_CACHE_SECONDS)
+                while len(_users) > MAX_USERS:
+                    _users.popitem(last=False)
+            return user
+        return None
+
+
+def _user_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        user_id = instance.pk
+        invalidate_user(user_id)
+        # Again once committed: a process that loaded the user in between read the old row
+        transaction.on_commit(lambda: invalidate_user(user_id))
+
+
+def connect_signals():
+    User = get_user_model()
+    post_save.connect(_user_changed, sender=User, dispatch_uid='auth_user_cache')
+    post_delete.connect(_user_changed, sender=User, dispatch_uid='auth_user_cache')
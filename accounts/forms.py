@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from .models import User, SystemManager, Settings
 from django.contrib.auth.forms import AuthenticationForm
 from django.utils.html import mark_safe
+from tickets.models import CatalogItem
 
 class SettingsForm(forms.ModelForm):
     class Meta:
@@ -12,6 +13,7 @@ class SettingsForm(forms.ModelForm):
         fields = [
             'ticket_visibility',
             'ticket_self_assignment',
+            'auto_assignment',
             'asset_visibility',
             'can_modify_assigned_assets',
             'can_modify_all_assets',
@@ -19,6 +21,7 @@ class SettingsForm(forms.ModelForm):
             'notify_new_message',
             'notify_ticket_assigned',
             'notify_ticket_resolved',
+            'technician_digest',
             'smtp_enabled',
             'smtp_email',
             'smtp_password',
@@ -29,7 +32,8 @@ class SettingsForm(forms.ModelForm):
         ]
         widgets = {
             'smtp_password': forms.PasswordInput(render_value=True),
-            'smtp_port': forms.TextInput(attrs={'class': 'form-control shadow-none'})
+            'smtp_port': forms.TextInput(attrs={'class': 'form-control shadow-none'}),
+            'auto_assignment': forms.Select(attrs={'class': 'form-select shadow-none'}),
         }
 
 class CustomLoginForm(AuthenticationForm):
@@ -146,3 +150,15 @@ class SystemManagerCreationForm(UserCreationForm):
                 departments=self.cleaned_data['departments']
             )
         return user
+
+def catalog_entry_form(model, new=False):
+    """
+    ModelForm class for a ticket catalog entry (CatalogType, CatalogSubtype
+    or CatalogItem). Codes are only set when an entry is added: tickets store them.
+    """
+    fields = ['label', 'position', 'active']
+    if new:
+        fields = ['code'] + fields
+        if model is CatalogItem:
+            fields = ['subtype'] + fields
+    return forms.modelform_factory(model, fields=fields)
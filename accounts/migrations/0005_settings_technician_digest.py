@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_settings_notify_ticket_created'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settings',
+            name='technician_digest',
+            field=models.BooleanField(default=False, help_text='Send technicians a periodic digest of their tickets with new responses instead of one email per reply'),
+        ),
+    ]
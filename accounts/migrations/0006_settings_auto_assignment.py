@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_settings_technician_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settings',
+            name='auto_assignment',
+            field=models.CharField(blank=True, choices=[('', 'Off'), ('RR', 'Round robin'), ('LO', 'Fewest open tickets'), ('SK', 'By skill, then fewest open tickets')], default='', help_text='Assign new tickets to an active technician automatically', max_length=2),
+        ),
+    ]
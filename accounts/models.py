@@ -53,6 +53,20 @@ class Settings(models.Model):
         default=False,
         help_text="Allow technicians to self-assign tickets"
     )
+
+    class AutoAssignment(models.TextChoices):
+        OFF = '', 'Off'
+        ROUND_ROBIN = 'RR', 'Round robin'
+        LEAST_OPEN = 'LO', 'Fewest open tickets'
+        SKILLS = 'SK', 'By skill, then fewest open tickets'
+
+    auto_assignment = models.CharField(
+        max_length=2,
+        choices=AutoAssignment.choices,
+        default=AutoAssignment.OFF,
+        blank=True,
+        help_text="Assign new tickets to an active technician automatically"
+    )
     asset_visibility = models.BooleanField(
         default=False,
         help_text="Allow technicians to see all assets"
@@ -91,6 +105,10 @@ class Settings(models.Model):
         default=True,
         help_text="Send notifications when tickets breach SLA"
     )
+    technician_digest = models.BooleanField(
+        default=False,
+        help_text="Send technicians a periodic digest of their tickets with new responses instead of one email per reply"
+    )
 
     smtp_enabled = models.BooleanField(default=False)
     smtp_email = models.EmailField(blank=True)
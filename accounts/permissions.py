@@ -0,0 +1,132 @@
+"""
+Who may see and change which tickets and assets.
+
+Views ask these helpers instead of combining Settings flags and user types
+themselves. Everything is memoized on the request, so a view that checks
+several things loads Settings once and runs at most one query per question:
+
+* visible_tickets / visible_assets / modifiable_assets return querysets that
+  restrict with a plain indexed filter or a correlated EXISTS subquery
+  (never a join plus DISTINCT over the whole table).
+* can_view_ticket needs no query beyond Settings.
+* can_view_asset / can_modify_asset run one EXISTS query per asset.
+
+The rules:
+
+* System managers see and change everything.
+* Tickets: everyone sees all tickets with Settings.ticket_visibility,
+  otherwise only the ones assigned to them.
+* Assets: everyone sees all assets with Settings.asset_visibility, otherwise
+  the list shows assets linked to their tickets, and opening one of those
+  also needs Settings.can_modify_assigned_assets.
+* Assets can be changed by everyone with Settings.can_modify_all_assets,
+  otherwise those linked to their tickets with can_modify_assigned_assets.
+  Creating and deleting assets needs can_modify_all_assets.
+"""
+from django.db.models import Exists, OuterRef
+
+from assets.models import Asset
+from tickets.models import Ticket
+
+from .models import Settings, User
+
+_CACHE_ATTR = '_helpdesk_permissions'
+
+
+def is_system_manager(user):
+    """Check if user is a system manager"""
+    return user.is_authenticated and user.user_type == User.UserType.SYSTEM_MANAGER
+
+
+def _memo(request, key, compute):
+    cache = request.__dict__.setdefault(_CACHE_ATTR, {})
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def get_settings(request):
+    """The system Settings (or None), loaded once per request"""
+    return _memo(request, 'settings', Settings.objects.first)
+
+
+def _flag(request, name):
+    settings = get_settings(request)
+    return bool(settings and getattr(settings, name))
+
+
+def can_view_all_tickets(request):
+    return is_system_manager(request.user) or _flag(request, 'ticket_visibility')
+
+
+def visible_tickets(request, queryset=None):
+    """
+    Tickets the user may see. Pass a queryset of Ticket or ArchivedTicket to
+    restrict it; by default all current tickets are restricted.
+    """
+    if queryset is None:
+        queryset = Ticket.objects.all()
+    if can_view_all_tickets(request):
+        return queryset
+    return queryset.filter(assigned_to=request.user)
+
+
+def can_view_ticket(request, ticket):
+    """Whether the user may see (and work on) a Ticket or ArchivedTicket"""
+    return can_view_all_tickets(request) or ticket.assigned_to_id == request.user.pk
+
+
+def _linked_to_assigned_tickets(request):
+    """EXISTS: the outer asset is linked to a ticket assigned to the user"""
+    return Exists(Ticket.assets.through.objects.filter(
+        asset_id=OuterRef('pk'), ticket__assigned_to=request.user,
+    ))
+
+
+def _is_linked(request, asset):
+    def compute():
+        return Ticket.assets.through.objects.filter(
+            asset_id=asset.pk, ticket__assigned_to=request.user,
+        ).exists()
+    return _memo(request, ('linked_asset', asset.pk), compute)
+
+
+def can_view_all_assets(request):
+    return is_system_manager(request.user) or _flag(request, 'asset_visibility')
+
+
+def visible_assets(request, queryset=None):
+    """Assets the user may list"""
+    if queryset is None:
+        queryset = Asset.objects.all()
+    if can_view_all_assets(request):
+        return queryset
+    return queryset.filter(_linked_to_assigned_tickets(request))
+
+
+def can_view_asset(request, asset):
+    if can_view_all_assets(request):
+        return True
+    return _flag(request, 'can_modify_assigned_assets') and _is_linked(request, asset)
+
+
+def can_modify_all_assets(request):
+    """Whether the user may create, change and delete any asset"""
+    return is_system_manager(request.user) or _flag(request, 'can_modify_all_assets')
+
+
+def modifiable_assets(request, queryset=None):
+    """Assets the user may change"""
+    if queryset is None:
+        queryset = Asset.objects.all()
+    if can_modify_all_assets(request):
+        return queryset
+    if not _flag(request, 'can_modify_assigned_assets'):
+        return queryset.none()
+    return queryset.filter(_linked_to_assigned_tickets(request))
+
+
+def can_modify_asset(request, asset):
+    if can_modify_all_assets(request):
+        return True
+    return _flag(request, 'can_modify_assigned_assets') and _is_linked(request, asset)
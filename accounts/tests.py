@@ -1,3 +1,246 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from assets.models import Asset
+from tickets.models import ArchivedTicket, Ticket, TicketStatus
+
+from . import backends
+from .models import Settings, User
+from .permissions import (
+    can_modify_all_assets, can_modify_asset, can_view_all_tickets, can_view_asset, can_view_ticket,
+    get_settings, modifiable_assets, visible_assets, visible_tickets,
+)
+
+
+class PermissionServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.settings = Settings.objects.create(
+            ticket_visibility=False,
+            asset_visibility=False,
+            can_modify_assigned_assets=True,
+            can_modify_all_assets=False,
+        )
+        cls.technician = User.objects.create_user(username='tech', password='pw', department='IT')
+        cls.other = User.objects.create_user(username='other', password='pw', department='IT')
+        cls.manager = User.objects.create_user(
+            username='manager', password='pw', department='IT', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+
+        cls.assets = [
+            Asset.objects.create(
+                inventory_number=f'INV-{i}', name=f'Asset {i}', type='COM', location='Nicks Hall', details='',
+            )
+            for i in range(4)
+        ]
+        cls.mine = cls._ticket(cls.technician, cls.assets[:2])
+        # A second ticket linking the same asset must not duplicate it
+        cls._ticket(cls.technician, cls.assets[:1])
+        cls.theirs = cls._ticket(cls.other, cls.assets[2:3])
+
+    @classmethod
+    def _ticket(cls, assigned_to, assets):
+        ticket = Ticket.objects.create(
+            requestor_email='someone@etsu.edu', requestor_name='Someone', title='Broken',
+            description='It is broken.', type='INC', subtype='PRT', item='printer', assigned_to=assigned_to,
+        )
+        ticket.assets.set(assets)
+        return ticket
+
+    def _request(self, user):
+        request = RequestFactory().get('/')
+        request.user = user
+        return request
+
+    def test_settings_are_loaded_once_per_request(self):
+        request = self._request(self.technician)
+        with self.assertNumQueries(1):
+            get_settings(request)
+            can_view_all_tickets(request)
+            can_modify_all_assets(request)
+            can_view_ticket(request, self.mine)
+
+    def test_system_manager_needs_no_queries(self):
+        request = self._request(self.manager)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_view_ticket(request, self.theirs))
+            self.assertTrue(can_view_asset(request, self.assets[3]))
+            self.assertTrue(can_modify_asset(request, self.assets[3]))
+            self.assertEqual(str(visible_assets(request).query), str(Asset.objects.all().query))
+
+    def test_visible_tickets_is_a_plain_assignee_filter(self):
+        request = self._request(self.technician)
+        tickets = visible_tickets(request)
+        sql = str(tickets.query)
+        self.assertIn('"assigned_to_id" =', sql)
+        self.assertNotIn('JOIN', sql)
+        self.assertCountEqual(tickets.values_list('assigned_to', flat=True), [self.technician.pk] * 2)
+
+        archived = visible_tickets(request, ArchivedTicket.objects.all())
+        self.assertIn('"assigned_to_id" =', str(archived.query))
+
+    def test_can_view_ticket_needs_no_query_beyond_settings(self):
+        request = self._request(self.technician)
+        get_settings(request)
+        with self.assertNumQueries(0):
+            self.assertTrue(can_view_ticket(request, self.mine))
+            self.assertFalse(can_view_ticket(request, self.theirs))
+
+    def test_visible_assets_uses_exists_not_distinct(self):
+        request = self._request(self.technician)
+        get_settings(request)
+        assets = visible_assets(request)
+        sql = str(assets.query)
+        self.assertIn('EXISTS', sql)
+        self.assertNotIn('DISTINCT', sql)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                sorted(a.inventory_number for a in assets), ['INV-0', 'INV-1'],
+            )
+
+    def test_asset_checks_cost_one_indexed_query(self):
+        request = self._request(self.technician)
+        get_settings(request)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(can_view_asset(request, self.assets[0]))
+            self.assertTrue(can_modify_asset(request, self.assets[0]))
+        self.assertEqual(len(queries), 1)
+        # .exists() fetches at most one row
+        self.assertIn('LIMIT 1', queries[0]['sql'])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+                plan = ' '.join(row[-1] for row in cursor.fetchall())
+            self.assertNotIn('SCAN', plan)
+
+        with self.assertNumQueries(1):
+            self.assertFalse(can_modify_asset(request, self.assets[2]))
+
+    def test_modifiable_assets_follows_settings(self):
+        request = self._request(self.technician)
+        self.assertCountEqual(modifiable_assets(request), self.assets[:2])
+
+        self.settings.can_modify_assigned_assets = False
+        self.settings.save()
+        request = self._request(self.technician)
+        self.assertFalse(modifiable_assets(request).exists())
+        self.assertFalse(can_view_asset(request, self.assets[0]))
+
+    def test_asset_list_view_avoids_distinct_join(self):
+        self.client.force_login(self.technician)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('asset_list'))
+        self.assertEqual(response.status_code, 200)
+        asset_queries = [q['sql'] for q in queries if 'FROM "assets_asset"' in q['sql']]
+        self.assertTrue(asset_queries)
+        for sql in asset_queries:
+            self.assertNotIn('DISTINCT', sql)
+        settings_queries = [q for q in queries if 'FROM "accounts_settings"' in q['sql']]
+        self.assertEqual(len(settings_queries), 1)
+
+
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.technician = User.objects.create_user(username='tech', password='pw', department='IT')
+        cls.manager = User.objects.create_user(
+            username='manager', password='pw', department='IT', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+
+    def setUp(self):
+        backends.clear()
+        self.client.force_login(self.technician)
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('asset_list'))
+        return response, [q for q in queries if 'FROM "accounts_user"' in q['sql']]
+
+    def test_user_is_loaded_once(self):
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_deactivated_user_is_signed_out(self):
+        self.user_queries()
+        manager = Client()
+        manager.force_login(self.manager)
+        manager.post(reverse('toggle_user_active', args=[self.technician.pk]))
+        response, queries = self.user_queries()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(queries), 1)
+
+    def test_password_change_signs_out_other_sessions(self):
+        self.user_queries()
+        user = User.objects.get(pk=self.technician.pk)
+        user.set_password('new password')
+        user.save()
+        response, _ = self.user_queries()
+        self.assertEqual(response.status_code, 302)
+
+    def test_queryset_updates_need_explicit_invalidation(self):
+        self.user_queries()
+        User.objects.filter(pk=self.technician.pk).update(is_active=False)
+        backends.invalidate_user(self.technician.pk)
+        response, _ = self.user_queries()
+        self.assertEqual(response.status_code, 302)
+
+
+class RebalanceWorkloadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            username='manager', password='pw', department='IT', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        cls.ann, cls.dan = [
+            User.objects.create_user(username=name, password='pw', department='IT', first_name=name.title(),
+                                     user_type=User.UserType.TECHNICIAN)
+            for name in ('ann', 'dan')
+        ]
+        cls.tickets = [
+            Ticket.objects.create(
+                requestor_email='user@etsu.edu', requestor_name='User', title='Help', description='Broken.',
+                type='INC', subtype='LAB', item='projector', assigned_to=cls.dan, status=status,
+            )
+            for status in (TicketStatus.NEW, TicketStatus.IN_PROGRESS)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def assignees(self):
+        return set(Ticket.objects.values_list('assigned_to', 'status'))
+
+    def test_deactivating_with_open_tickets_asks_where_they_go(self):
+        response = self.client.post(reverse('toggle_user_active', args=[self.dan.pk]))
+        self.assertRedirects(response, reverse('rebalance_workload', args=[self.dan.pk]) + '?deactivate=1')
+        self.assertTrue(User.objects.get(pk=self.dan.pk).is_active)
+
+    def test_preview_changes_nothing(self):
+        response = self.client.post(reverse('rebalance_workload', args=[self.dan.pk]), {
+            'reassign_option': 'spread', 'action': 'preview',
+        })
+        self.assertEqual(response.context['summary'], [('Ann', 2)])
+        self.assertEqual(self.assignees(), {(self.dan.pk, TicketStatus.NEW), (self.dan.pk, TicketStatus.IN_PROGRESS)})
+
+    def test_confirm_moves_the_tickets_then_deactivates(self):
+        response = self.client.post(reverse('rebalance_workload', args=[self.dan.pk]), {
+            'reassign_option': 'reassign', 'new_technician': self.ann.pk, 'action': 'confirm', 'deactivate': '1',
+        })
+        self.assertRedirects(response, reverse('manage_users'))
+        self.assertEqual(
+            self.assignees(), {(self.ann.pk, TicketStatus.ASSIGNED), (self.ann.pk, TicketStatus.IN_PROGRESS)},
+        )
+        self.assertFalse(User.objects.get(pk=self.dan.pk).is_active)
+
+    def test_deleting_a_user_unassigns_their_open_tickets(self):
+        self.client.post(reverse('delete_user', args=[self.dan.pk]), {
+            'action': 'confirm_delete', 'reassign_option': 'unassign',
+        })
+        self.assertFalse(User.objects.filter(pk=self.dan.pk).exists())
+        self.assertEqual(self.assignees(), {(None, TicketStatus.NEW)})
@@ -34,5 +34,8 @@ urlpatterns = [
     path('users/add-manager/', views.add_system_manager, name='add_system_manager'),
     path('users/toggle/<int:user_id>/', views.toggle_user_active, name='toggle_user_active'),
     path('users/delete/<int:user_id>/', views.delete_user, name='delete_user'),
+    path('users/rebalance/<int:user_id>/', views.rebalance_workload, name='rebalance_workload'),
+    path('users/skills/<int:user_id>/', views.technician_skills, name='technician_skills'),
     path('settings/', views.manage_settings, name='manage_settings'),
+    path('settings/catalog/', views.manage_catalog, name='manage_catalog'),
 ]
\ No newline at end of file
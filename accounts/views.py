@@ -1,16 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib import messages
+from django.db.models import Count
 from .forms import CustomLoginForm, TechnicianCreationForm, SystemManagerCreationForm
 from django.contrib.auth.views import PasswordResetView
 from .models import User, Settings
-from .forms import SettingsForm
+from .forms import SettingsForm, catalog_entry_form
+from .permissions import is_system_manager
 from .utils import update_email_settings
-
-def is_system_manager(user):
-    return user.is_authenticated and user.user_type == User.UserType.SYSTEM_MANAGER
+from helpdesk.db import retry_on_locked
+from tickets.catalog import get_catalog
+from tickets.models import CatalogItem, CatalogSubtype, CatalogType, TechnicianSkill, Ticket
+from tickets.reassignment import open_tickets, plan_reassignment, reassign_tickets
 
 @login_required
 @user_passes_test(is_system_manager)
@@ -38,6 +42,41 @@ def manage_settings(request):
         'settings': settings
     })
 
+CATALOG_MODELS = {'type': CatalogType, 'subtype': CatalogSubtype, 'item': CatalogItem}
+
+@login_required
+@user_passes_test(is_system_manager)
+@retry_on_locked
+def manage_catalog(request):
+    """Edit the ticket types, subtypes and items offered on the ticket forms"""
+    if request.method == 'POST':
+        model = CATALOG_MODELS.get(request.POST.get('kind'))
+        if model is None:
+            messages.error(request, 'Unknown catalog entry.')
+            return redirect('manage_catalog')
+        instance = get_object_or_404(model, pk=request.POST['id']) if request.POST.get('id') else None
+        form = catalog_entry_form(model, new=instance is None)(request.POST, instance=instance)
+        if form.is_valid():
+            entry = form.save()
+            messages.success(request, f'{entry.label} saved.')
+        else:
+            messages.error(request, ' '.join(error for errors in form.errors.values() for error in errors))
+        return redirect('manage_catalog')
+
+    # Ticket counts help decide what to retire or merge (see remap_ticket_items)
+    counts = {
+        (row['subtype'], row['item']): row['count']
+        for row in Ticket.objects.order_by().values('subtype', 'item').annotate(count=Count('pk'))
+    }
+    subtypes = list(CatalogSubtype.objects.prefetch_related('items'))
+    for subtype in subtypes:
+        for item in subtype.items.all():
+            item.ticket_count = counts.get((subtype.code, item.code), 0)
+    return render(request, 'accounts/manage_catalog.html', {
+        'types': CatalogType.objects.all(),
+        'subtypes': subtypes,
+    })
+
 class CustomPasswordResetView(SuccessMessageMixin, PasswordResetView):
     template_name = 'accounts/password_reset_form.html'
     email_template_name = 'accounts/password_reset_email.html'
@@ -78,10 +117,6 @@ def logout_view(request):
     messages.success(request, 'You have been successfully logged out.')
     return redirect('login')
 
-def is_system_manager(user):
-    """Check if user is a system manager"""
-    return user.is_authenticated and user.user_type == User.UserType.SYSTEM_MANAGER
-
 # User Management Views (these should already exist in your views.py)
 @login_required
 @user_passes_test(is_system_manager)
@@ -96,6 +131,40 @@ def manage_users(request):
     }
     return render(request, 'accounts/manage_users.html', context)
 
+@login_required
+@user_passes_test(is_system_manager)
+def technician_skills(request, user_id):
+    """Choose the subtypes and items skill-based auto-assignment routes to a technician"""
+    technician = get_object_or_404(User, id=user_id, user_type=User.UserType.TECHNICIAN)
+    catalog = get_catalog()
+    if request.method == 'POST':
+        chosen = set()
+        for value in request.POST.getlist('skill'):
+            subtype, _, item = value.partition(':')
+            if subtype in catalog.subtype_labels:
+                chosen.add((subtype, item))
+        technician.skills.all().delete()
+        TechnicianSkill.objects.bulk_create(
+            TechnicianSkill(technician=technician, subtype=subtype, item=item) for subtype, item in sorted(chosen)
+        )
+        messages.success(request, f'Skills for {technician.get_full_name()} updated successfully.')
+        return redirect('manage_users')
+
+    current = {f'{subtype}:{item}' for subtype, item in technician.skills.values_list('subtype', 'item')}
+    subtypes = [
+        {
+            'value': subtype,
+            'label': subtype_label,
+            'checked': f'{subtype}:' in current,
+            'items': [
+                {'value': f'{subtype}:{item}', 'label': label, 'checked': f'{subtype}:{item}' in current}
+                for item, label in catalog.item_choices[subtype]
+            ],
+        }
+        for subtype, subtype_label in catalog.subtype_choices
+    ]
+    return render(request, 'accounts/technician_skills.html', {'technician': technician, 'subtypes': subtypes})
+
 @login_required
 @user_passes_test(is_system_manager)
 def add_technician(request):
@@ -132,6 +201,10 @@ def toggle_user_active(request, user_id):
     """Toggle user active status (system managers only)"""
     user = get_object_or_404(User, id=user_id)
     if user != request.user:  # Prevent self-deactivation
+        if user.is_active and open_tickets(user).exists():
+            # Their open tickets need a new home first
+            messages.info(request, f'Choose what happens to the open tickets of {user.get_full_name()} before deactivating them.')
+            return redirect(reverse('rebalance_workload', args=[user.id]) + '?deactivate=1')
         user.is_active = not user.is_active
         user.save()
         status = 'activated' if user.is_active else 'deactivated'
@@ -140,8 +213,66 @@ def toggle_user_active(request, user_id):
         messages.error(request, 'You cannot deactivate your own account.')
     return redirect('manage_users')
 
+def _reassignment_choice(request, user):
+    """(technician to move tickets to, whether to spread them) from the form, or None if invalid"""
+    option = request.POST.get('reassign_option')
+    if option == 'unassign':
+        return None, False
+    if option == 'spread':
+        return None, True
+    if option == 'reassign':
+        technician = User.objects.filter(
+            id=request.POST.get('new_technician') or None, user_type=User.UserType.TECHNICIAN, is_active=True,
+        ).exclude(id=user.id).first()
+        if technician:
+            return technician, False
+    return None
+
+@login_required
+@user_passes_test(is_system_manager)
+@retry_on_locked
+def rebalance_workload(request, user_id):
+    """Preview and move a user's open tickets: unassign them, hand them to one technician, or spread them out"""
+    user = get_object_or_404(User, id=user_id)
+    deactivate = request.GET.get('deactivate') == '1' or request.POST.get('deactivate') == '1'
+    plan = None
+    if request.method == 'POST':
+        choice = _reassignment_choice(request, user)
+        if choice is None:
+            messages.error(request, "Please select a valid reassignment option.")
+            return redirect('rebalance_workload', user_id=user_id)
+        to, spread = choice
+        if request.POST.get('action') == 'confirm':
+            plan = reassign_tickets(user, to, spread)
+            messages.success(request, f'Moved {len(plan)} open ticket{"s" if len(plan) != 1 else ""} from {user.get_full_name()}.')
+            if deactivate and user != request.user:
+                user.is_active = False
+                user.save(update_fields=['is_active'])
+                messages.success(request, f'User {user.get_full_name()} deactivated successfully.')
+            return redirect('manage_users')
+        plan = plan_reassignment(user, to, spread)
+
+    summary = {}
+    for ticket, technician in plan or ():
+        name = technician.get_full_name() if technician else 'Unassigned'
+        summary[name] = summary.get(name, 0) + 1
+    context = {
+        'user_to_rebalance': user,
+        'tickets_count': len(plan) if plan is not None else open_tickets(user).count(),
+        'other_technicians': User.objects.filter(
+            user_type=User.UserType.TECHNICIAN, is_active=True,
+        ).exclude(id=user_id),
+        'plan': plan,
+        'summary': sorted(summary.items()),
+        'reassign_option': request.POST.get('reassign_option', 'spread'),
+        'new_technician': request.POST.get('new_technician', ''),
+        'deactivate': deactivate,
+    }
+    return render(request, 'accounts/rebalance_workload.html', context)
+
 @login_required
 @user_passes_test(is_system_manager)
+@retry_on_locked
 def delete_user(request, user_id):
     """Delete a user (technician or system manager)"""
     user = get_object_or_404(User, id=user_id)
@@ -151,37 +282,20 @@ def delete_user(request, user_id):
         messages.error(request, "You cannot delete your own account.")
         return redirect('manage_users')
     
-    # Check if user has assigned tickets
-    assigned_tickets = user.assigned_tickets.all()
-    tickets_count = assigned_tickets.count()
+    # Check if user has open tickets
+    tickets_count = open_tickets(user).count()
     
     if request.method == 'POST':
         action = request.POST.get('action')
         
         if action == 'confirm_delete':
-            # Handle assigned tickets if any
+            # Move open tickets first; resolved and closed ones are left unassigned
             if tickets_count > 0:
-                reassign_option = request.POST.get('reassign_option')
-                if reassign_option == 'unassign':
-                    # Unassign all tickets
-                    for ticket in assigned_tickets:
-                        ticket.assigned_to = None
-                        ticket.status = 'NEW'  # Reset to new status
-                        ticket.save()
-                elif reassign_option == 'reassign' and request.POST.get('new_technician'):
-                    # Reassign to another technician
-                    new_technician_id = request.POST.get('new_technician')
-                    try:
-                        new_technician = User.objects.get(id=new_technician_id)
-                        for ticket in assigned_tickets:
-                            ticket.assigned_to = new_technician
-                            ticket.save()
-                    except User.DoesNotExist:
-                        messages.error(request, "Selected technician not found.")
-                        return redirect('delete_user', user_id=user_id)
-                else:
+                choice = _reassignment_choice(request, user)
+                if choice is None:
                     messages.error(request, "Please select a valid reassignment option.")
                     return redirect('delete_user', user_id=user_id)
+                reassign_tickets(user, *choice)
             
             # Now delete the user
             username = user.username
@@ -191,7 +305,7 @@ def delete_user(request, user_id):
     
     # For GET request or if POST didn't process
     # Get other technicians for reassignment options
-    other_technicians = User.objects.filter(user_type='TCH').exclude(id=user_id)
+    other_technicians = User.objects.filter(user_type='TCH', is_active=True).exclude(id=user_id)
     
     context = {
         'user_to_delete': user,
@@ -0,0 +1,144 @@
+"""
+Typeahead lookup of assets by inventory number or name.
+
+Prefix lookups are range scans on the UPPER(inventory_number) and
+UPPER(name) expression indexes, so they cost the same with a hundred or a
+hundred thousand assets. When the prefix matches fewer than LOOKUP_LIMIT
+assets, near matches are drawn from assets sharing a shorter prefix and
+ranked with difflib, which catches the usual typo in the last characters
+of a number.
+
+Results are kept in a small per-process LRU cache. Saving or deleting an
+asset clears it in this process; other processes pick the change up after
+ASSET_LOOKUP_CACHE_SECONDS. Lookups limited to the assets a restricted
+technician may see are not cached: those change with ticket assignments.
+"""
+import difflib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.functions import Upper
+from django.db.models.signals import post_delete, post_save
+
+from .models import Asset
+
+LOOKUP_LIMIT = 8
+MIN_QUERY_LENGTH = 2
+NEAR_MATCH_CANDIDATES = 200
+NEAR_MATCH_CUTOFF = 0.6
+CACHE_SIZE = 1024
+
+# Sorts after every character an inventory number or name can contain
+_PREFIX_END = '\U0010ffff'
+
+
+class LookupCache:
+    """A thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self, **kwargs):
+        with self._lock:
+            self._entries.clear()
+
+
+cache = LookupCache(CACHE_SIZE, getattr(settings, 'ASSET_LOOKUP_CACHE_SECONDS', 60))
+
+
+def connect_signals():
+    post_save.connect(cache.clear, sender=Asset, dispatch_uid='asset_lookup_cache')
+    post_delete.connect(cache.clear, sender=Asset, dispatch_uid='asset_lookup_cache')
+
+
+def normalize(query):
+    return ' '.join(query.split()).upper()[:Asset._meta.get_field('inventory_number').max_length]
+
+
+def _starting_with(queryset, field, prefix):
+    return (
+        queryset.alias(key=Upper(field))
+        .filter(key__gte=prefix, key__lt=prefix + _PREFIX_END)
+        .order_by('key')
+    )
+
+
+def lookup_assets(query, include_details=False, assets=None, limit=LOOKUP_LIMIT):
+    """
+    Up to `limit` assets matching `query`, best first, as small dicts.
+
+    Without `include_details` (the public submission form) only active
+    assets are searched, by inventory number, and only the number and type
+    are returned. With it, `assets` limits the search to the assets the user
+    may see (accounts.permissions.visible_assets); None means all of them.
+    """
+    key = normalize(query)
+    if len(key) < MIN_QUERY_LENGTH:
+        return []
+    if include_details and assets is not None:
+        return _search(key, include_details, limit, assets)
+    cache_key = (key, include_details, limit)
+    results = cache.get(cache_key)
+    if results is None:
+        results = _search(key, include_details, limit)
+        cache.set(cache_key, results)
+    return results
+
+
+def _search(key, include_details, limit, assets=None):
+    if include_details:
+        assets = Asset.objects.all() if assets is None else assets
+        fields = ('inventory_number', 'type', 'name', 'location')
+    else:
+        assets = Asset.objects.filter(is_active=True)
+        fields = ('inventory_number', 'type')
+
+    results = list(_starting_with(assets, 'inventory_number', key).values(*fields)[:limit])
+    seen = {row['inventory_number'] for row in results}
+
+    if include_details and len(results) < limit:
+        for row in _starting_with(assets, 'name', key).values(*fields)[:limit]:
+            if row['inventory_number'] not in seen and len(results) < limit:
+                results.append(row)
+                seen.add(row['inventory_number'])
+
+    if len(results) < limit and len(key) > MIN_QUERY_LENGTH:
+        stem = key[:max(MIN_QUERY_LENGTH, len(key) - 2)]
+        candidates = [
+            row for row in _starting_with(assets, 'inventory_number', stem).values(*fields)[:NEAR_MATCH_CANDIDATES]
+            if row['inventory_number'] not in seen
+        ]
+        scored = sorted(
+            (
+                (difflib.SequenceMatcher(None, key, row['inventory_number'].upper()).ratio(), row)
+                for row in candidates
+            ),
+            key=lambda pair: -pair[0],
+        )
+        results.extend(row for score, row in scored[:limit - len(results)] if score >= NEAR_MATCH_CUTOFF)
+
+    return results
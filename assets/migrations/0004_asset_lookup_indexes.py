@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:00
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_asset_bitlocker_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Upper('inventory_number'), name='asset_inventory_number_upper'),
+        ),
+        migrations.AddIndex(
+            model_name='asset',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='asset_name_upper'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from .validators import validate_bitlocker_key
 
 class AssetType(models.TextChoices):
@@ -31,5 +32,12 @@ class Asset(models.Model):
         help_text="BitLocker recovery key for this device (48 digits, staff only)"
     )
 
+    class Meta:
+        indexes = [
+            # Case-insensitive prefix lookups (assets.lookup)
+            models.Index(Upper('inventory_number'), name='asset_inventory_number_upper'),
+            models.Index(Upper('name'), name='asset_name_upper'),
+        ]
+
     def __str__(self):
         return f"{self.inventory_number} - {self.name}"
\ No newline at end of file
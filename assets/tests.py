@@ -1,3 +1,113 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from accounts.models import Settings, User
+from tickets.models import Ticket, TicketStatus
+
+from .lookup import cache as lookup_cache
+from .models import Asset, AssetType
+
+
+def make_ticket(title, status, assets):
+    ticket = Ticket.objects.create(
+        requestor_email='requestor@etsu.edu', requestor_name='Requestor', title=title,
+        description='It is broken.', type='INC', subtype='LAB', item='projector', status=status,
+    )
+    ticket.assets.add(*assets)
+    return ticket
+
+
+class AssetTicketCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(
+            username='manager', password='pw', department='IT', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        cls.projector, cls.printer, cls.spare = [
+            Asset.objects.create(inventory_number=number, name=name, type=kind, location='Lamb Hall', details='')
+            for number, name, kind in [
+                ('A-1', 'Projector', AssetType.PROJECTOR),
+                ('A-2', 'Printer', AssetType.PRINTER),
+                ('A-3', 'Spare', AssetType.COMPUTER),
+            ]
+        ]
+        make_ticket('Projector dead', TicketStatus.NEW, [cls.projector, cls.printer])
+        make_ticket('Projector flickers', TicketStatus.IN_PROGRESS, [cls.projector])
+        cls.closed = make_ticket('Projector fixed', TicketStatus.CLOSED, [cls.projector])
+        cls.jam = make_ticket('Paper jam', TicketStatus.RESOLVED, [cls.printer])
+        Ticket.objects.filter(pk=cls.jam.pk).update(time_created=timezone.now() + timezone.timedelta(days=1))
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def list_page(self, sort):
+        response = self.client.get(reverse('asset_list'), {'sort': sort})
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['page_obj'])
+
+    def test_list_annotates_ticket_counts(self):
+        assets = {asset.inventory_number: asset for asset in self.list_page('inventory_number')}
+        self.assertEqual((assets['A-1'].total_tickets, assets['A-1'].open_tickets), (3, 2))
+        self.assertEqual((assets['A-2'].total_tickets, assets['A-2'].open_tickets), (2, 1))
+        self.assertEqual((assets['A-3'].total_tickets, assets['A-3'].open_tickets), (0, 0))
+        self.assertIsNone(assets['A-3'].last_ticket_at)
+
+    def test_sorts_by_ticket_counts_and_latest_ticket(self):
+        self.assertEqual([asset.inventory_number for asset in self.list_page('troublesome')], ['A-1', 'A-2', 'A-3'])
+        self.assertEqual([asset.inventory_number for asset in self.list_page('recent_tickets')], ['A-2', 'A-1', 'A-3'])
+
+    def test_list_queries_do_not_grow_with_tickets(self):
+        self.list_page('troublesome')  # Warms the per-process caches
+        with CaptureQueriesContext(connection) as before:
+            self.list_page('troublesome')
+        for number in range(30):
+            make_ticket(f'Again {number}', TicketStatus.NEW, [self.printer, self.spare])
+        with CaptureQueriesContext(connection) as after:
+            self.list_page('troublesome')
+        self.assertEqual(len(before), len(after))
+
+    def test_detail_pages_related_tickets_newest_first(self):
+        tickets = [make_ticket(f'Again {number}', TicketStatus.NEW, [self.projector]) for number in range(20)]
+        url = reverse('asset_detail', args=[self.projector.inventory_number])
+
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 23)
+        self.assertEqual(response.context['related_tickets'], tickets[::-1])
+        self.assertContains(response, 'referenced in 23')
+
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual([ticket.title for ticket in response.context['related_tickets']],
+                         ['Projector fixed', 'Projector flickers', 'Projector dead'])
+
+
+class AssetLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Settings.objects.create(asset_visibility=False)
+        cls.technician = User.objects.create_user(username='tech', password='pw', department='IT')
+        cls.manager = User.objects.create_user(
+            username='manager', password='pw', department='IT', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        cls.linked, cls.other = [
+            Asset.objects.create(inventory_number=number, name='Projector', type=AssetType.PROJECTOR,
+                                 location='Lamb Hall', details='')
+            for number in ('PRJ-1', 'PRJ-2')
+        ]
+        ticket = make_ticket('Projector dead', TicketStatus.NEW, [cls.linked])
+        Ticket.objects.filter(pk=ticket.pk).update(assigned_to=cls.technician)
+
+    def setUp(self):
+        lookup_cache.clear()
+        self.addCleanup(lookup_cache.clear)
+
+    def lookup(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('asset_lookup'), {'q': 'PRJ'})
+        return [row['inventory_number'] for row in response.json()['results']]
+
+    def test_restricted_technician_only_finds_visible_assets(self):
+        self.assertEqual(self.lookup(self.manager), ['PRJ-1', 'PRJ-2'])
+        self.assertEqual(self.lookup(self.technician), ['PRJ-1'])
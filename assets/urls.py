@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.asset_list, name='asset_list'),
     path('create/', views.asset_create, name='asset_create'),
+    path('lookup/', views.asset_lookup, name='asset_lookup'),
     path('<str:inventory_number>/', views.asset_detail, name='asset_detail'),
     path('<str:inventory_number>/update/', views.asset_update, name='asset_update'),
     path('<str:inventory_number>/<int:back_to_asset_detail>/update/', views.asset_update, name='asset_update'),
@@ -2,28 +2,61 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from .models import Asset
 from .forms import AssetForm
-from accounts.models import Settings
-from django.contrib.auth import get_user_model
+from .lookup import lookup_assets
+from accounts.permissions import (
+    can_modify_all_assets, can_modify_asset, can_view_all_assets, can_view_asset, get_settings, visible_assets,
+)
+from helpdesk.db import retry_on_locked
+from tickets.assignment import OPEN_STATUSES
+from tickets.models import Ticket
 
-def is_system_manager(user):
-    User = get_user_model()
-    return user.is_authenticated and user.user_type == User.UserType.SYSTEM_MANAGER
+# Orderings for the asset list's sort menu; the ticket ones use with_ticket_counts()
+ASSET_SORTS = {
+    'inventory_number': ['inventory_number'],
+    '-inventory_number': ['-inventory_number'],
+    'name': ['name'],
+    '-name': ['-name'],
+    'type': ['type'],
+    '-type': ['-type'],
+    'location': ['location'],
+    '-location': ['-location'],
+    'troublesome': [
+        F('open_tickets').desc(), F('total_tickets').desc(),
+        F('last_ticket_at').desc(nulls_last=True), 'inventory_number',
+    ],
+    'recent_tickets': [F('last_ticket_at').desc(nulls_last=True), 'inventory_number'],
+}
+
+def with_ticket_counts(assets):
+    """
+    Annotate total_tickets, open_tickets and last_ticket_at. Correlated
+    subqueries on the ticket-asset links rather than a join and GROUP BY, so
+    a page sorted by another column only counts the rows it shows.
+    """
+    links = Ticket.assets.through.objects.filter(asset_id=OuterRef('pk')).order_by().values('asset_id')
+    total = links.annotate(count=Count('pk')).values('count')
+    open_ = links.filter(ticket__status__in=OPEN_STATUSES).annotate(count=Count('pk')).values('count')
+    last = links.annotate(latest=Max('ticket__time_created')).values('latest')
+    return assets.annotate(
+        total_tickets=Coalesce(Subquery(total), Value(0)),
+        open_tickets=Coalesce(Subquery(open_), Value(0)),
+        last_ticket_at=Subquery(last),
+    )
 
 @login_required
 def asset_list(request):
     """View for listing assets with search and filtering"""
     # Get system settings
-    settings = Settings.objects.first()
+    settings = get_settings(request)
     
-    # Check permission based on settings - Sys Manager should see all
-    if (settings and settings.asset_visibility) or is_system_manager(request.user):
-        assets = Asset.objects.all()
-    else:
-        # Get assets linked to tickets assigned to the user
-        assets = Asset.objects.filter(ticket__assigned_to=request.user).distinct()
+    # All assets, or those linked to tickets assigned to the user
+    assets = with_ticket_counts(visible_assets(request))
     
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -48,14 +81,9 @@ def asset_list(request):
     
     # Sort functionality
     sort_by = request.GET.get('sort', 'inventory_number')
-    valid_sort_fields = [
-        'inventory_number', '-inventory_number',
-        'name', '-name',
-        'type', '-type',
-        'location', '-location'
-    ]
-    if sort_by in valid_sort_fields:
-        assets = assets.order_by(sort_by)
+    if sort_by not in ASSET_SORTS:
+        sort_by = 'inventory_number'
+    assets = assets.order_by(*ASSET_SORTS[sort_by])
     
     # Pagination
     paginator = Paginator(assets, 20)  # 20 assets per page
@@ -77,38 +105,34 @@ def asset_list(request):
 def asset_detail(request, inventory_number):
     """View for viewing asset details"""
     asset = get_object_or_404(Asset, inventory_number=inventory_number)
-    settings = Settings.objects.first()
-    User = get_user_model()
+    settings = get_settings(request)
     
     # Check if user has permission to view this asset
-    has_permission = False
-    if (settings and settings.asset_visibility) or is_system_manager(request.user):
-        has_permission = True
-    elif settings and settings.can_modify_assigned_assets:
-        # Check if asset is linked to any ticket assigned to the user
-        has_permission = asset.ticket_set.filter(assigned_to=request.user).exists()
-    
-    if not has_permission:
+    if not can_view_asset(request, asset):
         messages.error(request, "You don't have permission to view this asset.")
         return redirect('asset_list')
     
-    # Get related tickets
-    related_tickets = asset.ticket_set.all()
+    # Related tickets a page at a time, newest first. Paging the links walks
+    # the (asset_id, ticket_id) index, so busy assets render as fast as new ones.
+    links = Ticket.assets.through.objects.filter(asset=asset).select_related('ticket').order_by('-ticket_id')
+    paginator = Paginator(links, 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    related_tickets = [link.ticket for link in page_obj]
     
     context = {
         'asset': asset,
+        'page_obj': page_obj,
         'related_tickets': related_tickets,
         'settings': settings,
     }
     return render(request, 'assets/asset_detail.html', context)
 
 @login_required
+@retry_on_locked
 def asset_create(request):
     """View for creating new assets"""
-    settings = Settings.objects.first()
-    
     # Check if user has permission to create assets
-    if not ((settings and settings.can_modify_all_assets) or (is_system_manager(request.user))):
+    if not can_modify_all_assets(request):
         messages.error(request, "You don't have permission to create assets.")
         return redirect('asset_list')
     
@@ -128,21 +152,13 @@ def asset_create(request):
     return render(request, 'assets/asset_form.html', context)
 
 @login_required
+@retry_on_locked
 def asset_update(request, inventory_number, back_to_asset_detail=1):
     """View for updating existing assets"""
     asset = get_object_or_404(Asset, inventory_number=inventory_number)
-    settings = Settings.objects.first()
-    User = get_user_model()
 
     # Check if user has permission to update this asset
-    has_permission = False
-    if (settings and settings.can_modify_all_assets) or (is_system_manager(request.user)):
-        has_permission = True
-    elif settings and settings.can_modify_assigned_assets:
-        # Check if asset is linked to any ticket assigned to the user
-        has_permission = asset.ticket_set.filter(assigned_to=request.user).exists()
-    
-    if not has_permission:
+    if not can_modify_asset(request, asset):
         messages.error(request, "You don't have permission to update this asset.")
         return redirect('asset_list')
     
@@ -163,13 +179,13 @@ def asset_update(request, inventory_number, back_to_asset_detail=1):
     return render(request, 'assets/asset_form.html', context)
 
 @login_required
+@retry_on_locked
 def asset_delete(request, inventory_number):
     """View for deleting assets"""
     asset = get_object_or_404(Asset, inventory_number=inventory_number)
-    settings = Settings.objects.first()
-    
+
     # Check if user has permission to delete assets
-    if not ((settings and settings.can_modify_all_assets) or (is_system_manager(request.user))):
+    if not can_modify_all_assets(request):
         messages.error(request, "You don't have permission to delete assets.")
         return redirect('asset_list')
     
@@ -188,3 +204,18 @@ def asset_delete(request, inventory_number):
         'asset': asset,
     }
     return render(request, 'assets/asset_confirm_delete.html', context)
+
+def asset_lookup(request):
+    """Inventory number typeahead for the ticket forms (public, details for staff only)"""
+    query = request.GET.get('q', '')
+    if request.user.is_authenticated:
+        # Names and locations only of the assets the asset list would show
+        assets = None if can_view_all_assets(request) else visible_assets(request)
+        results = lookup_assets(query, include_details=True, assets=assets)
+    else:
+        results = lookup_assets(query)
+    response = JsonResponse({'results': results})
+    # Browsers reuse the answer while the user types, backspaces and retypes
+    patch_cache_control(response, private=True, max_age=60)
+    patch_vary_headers(response, ['Cookie'])
+    return response
@@ -0,0 +1,98 @@
+"""
+Brotli or gzip compression of HTML responses, whichever the browser
+prefers (Brotli when it accepts both and Brotli is installed).
+
+Static files are compressed ahead of time by helpdesk.storage; this covers
+the pages rendered per request. Like Django's GZipMiddleware, gzip output
+carries random padding against BREACH-style attacks. Pages' CSRF tokens
+are masked differently on every response, for the same reason.
+"""
+import re
+
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+# Dynamic pages: a fast setting, unlike the maximum used for static files
+BROTLI_QUALITY = 5
+MIN_LENGTH = 200
+COMPRESSED_TYPES = ('text/html', 'application/json')
+_CODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?\s*')
+
+
+def accepted_encodings(header):
+    """The content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = set()
+    for part in header.split(','):
+        match = _CODING.fullmatch(part)
+        if match:
+            try:
+                quality = float(match.group(2) or 1)
+            except ValueError:
+                continue
+            if quality > 0:
+                accepted.add(match.group(1).lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """Place it early in MIDDLEWARE, after anything that only times or routes requests."""
+
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if content_type not in COMPRESSED_TYPES or response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = self._brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content, max_random_bytes=self.max_random_bytes,
+                )
+            del response['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed bytes differ from the uncompressed ones (RFC 9110 8.8.1)
+        if response.has_header('ETag'):
+            response.headers['ETag'] = re.sub(r'^"', 'W/"', response.headers['ETag'])
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    @staticmethod
+    def _brotli_sequence(sequence):
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in sequence:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
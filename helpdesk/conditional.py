@@ -0,0 +1,88 @@
+"""
+Conditional GET for pages that are reloaded to check for changes.
+
+conditional_page(version_func) gives a view an ETag and Last-Modified
+header built from version_func: typically one narrow query for a version
+stamp such as Ticket.updated_at. When the browser's copy is still current,
+the view answers 304 Not Modified without running itself or its template.
+Responses are marked private, must-revalidate (no-cache), so browsers ask
+every time and shared caches keep nothing.
+
+A page also depends on more than its data. The ETag therefore also covers:
+* the release: the modification time of the code and templates, which changes on deploy;
+* the signed-in user, who is shown in the navigation bar;
+* the CSRF cookie, so that a form in the browser's copy still carries a
+  token that its next POST will be accepted with.
+Pages with flash messages waiting are always rendered, as the messages
+are shown once.
+"""
+import functools
+import hashlib
+import os
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# Not part of the release
+SKIP_DIRECTORIES = {'__pycache__', 'node_modules', 'venv', 'media', 'staticfiles', 'migrations'}
+
+
+@functools.cache
+def release_stamp():
+    """The newest modification time of the project's Python files and templates."""
+    newest = 0
+    for root, directories, files in os.walk(settings.BASE_DIR):
+        directories[:] = [d for d in directories if not d.startswith('.') and d not in SKIP_DIRECTORIES]
+        for name in files:
+            if name.endswith(('.py', '.html')):
+                try:
+                    newest = max(newest, os.stat(os.path.join(root, name)).st_mtime_ns)
+                except FileNotFoundError:
+                    pass
+    return newest
+
+
+def conditional_page(version_func):
+    """
+    Answer GET and HEAD requests with 304 when the page is unchanged.
+
+    version_func(request, *args, **kwargs) returns (parts, last_modified)
+    for the page's data, where parts is a tuple of values that change with
+    it, or None to always render the page (e.g. for a missing object).
+    """
+    def state(request, *args, **kwargs):
+        if not hasattr(request, '_conditional_page'):
+            request._conditional_page = None
+            if request.method in ('GET', 'HEAD') and not len(get_messages(request)):
+                version = version_func(request, *args, **kwargs)
+                if version is not None:
+                    parts, last_modified = version
+                    key = repr((
+                        release_stamp(), request.user.pk, request.COOKIES.get(settings.CSRF_COOKIE_NAME), parts,
+                    ))
+                    request._conditional_page = (
+                        hashlib.blake2b(key.encode(), digest_size=16).hexdigest(), last_modified,
+                    )
+        return request._conditional_page
+
+    def etag(request, *args, **kwargs):
+        page = state(request, *args, **kwargs)
+        return page and page[0]
+
+    def last_modified(request, *args, **kwargs):
+        page = state(request, *args, **kwargs)
+        return page and page[1]
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view_func)
+
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.has_header('ETag'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
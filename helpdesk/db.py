@@ -0,0 +1,114 @@
+"""
+Lock-aware write transactions for SQLite.
+
+SQLite allows a single writer at a time. With WAL journaling and
+transaction_mode IMMEDIATE (see DATABASES in settings) a write transaction
+takes the write lock at BEGIN and waits up to busy_timeout for it, so lock
+errors surface before any work has been done and the whole transaction can
+simply be run again. retry_on_locked does that for the write views.
+
+Only the database is rolled back before a retry. Work done outside it, such
+as files written to storage or flash messages queued, registers an
+on_rollback callback to undo itself, so a retried request doesn't leave
+orphaned uploads or show its messages twice.
+"""
+import functools
+import random
+import threading
+import time
+
+from django.db import OperationalError, connection, transaction
+
+from monitoring.metrics import registry
+
+# Attempts per write transaction, and the first backoff delay in seconds
+LOCK_RETRY_ATTEMPTS = 4
+LOCK_RETRY_DELAY = 0.05
+
+lock_retries = registry.counter(
+    'helpdesk_db_lock_retries_total', 'Write transactions retried after a database lock error.',
+)
+lock_failures = registry.counter(
+    'helpdesk_db_lock_failures_total', 'Write transactions abandoned after exhausting lock retries.',
+)
+
+
+def is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database table is locked' in message
+
+
+_state = threading.local()
+
+
+def on_rollback(callback):
+    """
+    Call callback() if the write transaction run_in_write_transaction is
+    running rolls back, before any retry. Outside one it is never called.
+    """
+    callbacks = getattr(_state, 'rollback_callbacks', None)
+    if callbacks is not None:
+        callbacks.append(callback)
+
+
+def run_in_write_transaction(func, *args, **kwargs):
+    """
+    Run func(*args, **kwargs) in a transaction, retrying with jittered
+    exponential backoff while the database is locked by another writer.
+    """
+    if connection.in_atomic_block:
+        # An outer transaction owns the lock; only it could be retried
+        with transaction.atomic():
+            return func(*args, **kwargs)
+
+    for attempt in range(LOCK_RETRY_ATTEMPTS):
+        _state.rollback_callbacks = []
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except Exception as e:
+            callbacks, _state.rollback_callbacks = _state.rollback_callbacks, None
+            for callback in reversed(callbacks):
+                callback()
+            if not isinstance(e, OperationalError) or not is_lock_error(e):
+                raise
+            if attempt == LOCK_RETRY_ATTEMPTS - 1:
+                registry.inc(lock_failures)
+                raise
+            registry.inc(lock_retries)
+            time.sleep(LOCK_RETRY_DELAY * 2 ** attempt * random.uniform(0.5, 1.5))
+        finally:
+            _state.rollback_callbacks = None
+
+
+def retry_on_locked(view=None, *, methods=('POST',)):
+    """
+    Run a view's write requests in a retried write transaction.
+
+    Only requests whose method is in `methods` are wrapped, so page loads
+    don't queue behind writers. Use methods=('GET', 'POST') for views that
+    write on GET.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return view_func(request, *args, **kwargs)
+            return run_in_write_transaction(_forget_messages_on_rollback(view_func), request, *args, **kwargs)
+        return wrapper
+
+    if view is not None:
+        return decorator(view)
+    return decorator
+
+
+def _forget_messages_on_rollback(view_func):
+    """Drop the flash messages an attempt queued when it is rolled back."""
+    @functools.wraps(view_func)
+    def attempt(request, *args, **kwargs):
+        queued = getattr(getattr(request, '_messages', None), '_queued_messages', None)
+        if queued is not None:
+            mark = len(queued)
+            on_rollback(lambda: queued.__delitem__(slice(mark, None)))
+        return view_func(request, *args, **kwargs)
+    return attempt
@@ -0,0 +1,104 @@
+"""
+Read-replica routing.
+
+When DATABASE_REPLICA_ALIAS names a second DATABASES entry, reads made by
+read-only requests (GET/HEAD/OPTIONS) go to it and everything else goes to
+the primary ('default'). A request that writes, and the same browser for
+DATABASE_REPLICA_STICKY_SECONDS afterwards, reads from the primary, so
+people always see their own changes even when the replica lags.
+
+Outside of requests (management commands, shell) reads use the primary
+unless wrapped in use_replica(), e.g. for reports and exports.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'helpdesk_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_from_replica = contextvars.ContextVar('read_from_replica', default=False)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Send reads in this block to the replica (if one is configured)."""
+    read_token = _read_from_replica.set(enabled)
+    wrote_token = _wrote.set(False)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(read_token)
+        _wrote.reset(wrote_token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if not alias or not _read_from_replica.get() or _wrote.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # Reads inside a transaction must see its own uncommitted writes
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Later reads in this request must see the write, and so must the
+        # browser's next requests (ReplicaRoutingMiddleware sets a cookie)
+        _wrote.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives its schema from the primary
+        return db != replica_alias()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decides per request whether reads may use the replica, and pins a
+    browser to the primary for a few seconds after it wrote something.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replica_alias():
+            return self.get_response(request)
+
+        sticky = self._sticky(request)
+        read_token = _read_from_replica.set(request.method in SAFE_METHODS and not sticky)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote.get() or request.method not in SAFE_METHODS
+        finally:
+            _read_from_replica.reset(read_token)
+            _wrote.reset(wrote_token)
+
+        if wrote:
+            window = settings.DATABASE_REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + window:.0f}', max_age=window,
+                httponly=True, samesite='Lax', secure=request.is_secure(),
+            )
+        return response
+
+    @staticmethod
+    def _sticky(request):
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -49,9 +49,13 @@ INSTALLED_APPS = [
     'tickets.apps.TicketsConfig',
     'assets.apps.AssetsConfig',
     'accounts.apps.AccountsConfig',
+    'monitoring.apps.MonitoringConfig',
 ]
 
 MIDDLEWARE = [
+    'monitoring.middleware.PerformanceMiddleware',  # First, so its timings cover everything below
+    'helpdesk.routers.ReplicaRoutingMiddleware',  # Before sessions, so session saves count as writes
+    'helpdesk.compression.CompressionMiddleware',  # Before anything that reads or changes response bodies
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,10 +63,103 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',  # Last, as it calls the view itself when profiling
 ]
 
 ROOT_URLCONF = 'helpdesk.urls'
 
+# Hosts allowed to scrape /metrics without signing in (system managers always can)
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Where requests profiled with ?profile=1 (system managers only) are saved, and how many are kept
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILE_KEEP = 50
+
+# Queries taking at least this many milliseconds during a request are logged with their
+# origin and EXPLAIN plan (None turns the slow query log off); the newest SLOW_QUERY_KEEP
+# are kept for the Slow Queries page
+SLOW_QUERY_MS = 100
+SLOW_QUERY_KEEP = 5000
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': 5 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        # One JSON object per slow query
+        'monitoring.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Closed tickets with no activity for this long are moved to the archive by archive_tickets
+TICKET_ARCHIVE_AFTER_DAYS = 365
+
+# How long another process's asset changes can take to show up in the inventory number typeahead
+ASSET_LOOKUP_CACHE_SECONDS = 60
+
+# Notification events for the same recipient and ticket within this many seconds
+# are sent as one email by send_notifications (0 sends each one immediately)
+NOTIFICATION_COALESCE_SECONDS = 0
+
+# Automatic assignment recounts technicians' open tickets when its counts are older than this
+ASSIGNMENT_COUNT_MAX_AGE = 60
+
+CACHES = {
+    # Per process; use a shared cache (Redis, Memcached) to apply THROTTLE_RATES, sessions
+    # and user invalidation across processes
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Sessions are read from the cache and only from django_session on a miss, and
+# written there only when they change (logging in or out). For no session
+# table at all use 'django.contrib.sessions.backends.signed_cookies'; sessions
+# then live in the browser and signing out elsewhere can't end them early.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+# Signed-in users are kept in memory between requests (see accounts/backends.py)
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+# At most this long per user; 0 loads the user on every request
+AUTH_USER_CACHE_SECONDS = 300
+# Cache holding the user versions that invalidate those copies; must be shared by all processes
+AUTH_USER_CACHE = 'default'
+
+# The ticket catalog is kept in memory (see tickets/catalog.py) and its version, stored in
+# the database so every process sees edits, checked this often
+TICKET_CATALOG_CHECK_SECONDS = 5
+
+# Flood control for the public ticket pages (see helpdesk/throttle.py)
+THROTTLE_ENABLED = True
+THROTTLE_CACHE = 'default'
+# Per endpoint, per key: (requests, seconds). Buckets refill evenly over the period.
+THROTTLE_RATES = {
+    'submit_ticket': {'ip': (10, 3600), 'email': (5, 3600)},
+    'access_ticket': {'ip': (30, 600)},
+    'view_ticket': {'ip': (300, 300)},
+    # Wrong ticket numbers or access codes, on access_ticket and view_ticket together.
+    # An empty IP bucket refuses guesses; an empty ticket bucket only requires the challenge.
+    'access_code_failures': {'ip': (20, 3600), 'ticket': (10, 3600)},
+}
+# Wrong access codes from an IP or for a ticket before each further try needs a proof-of-work challenge
+THROTTLE_CHALLENGE_AFTER = 3
+# Difficulty of the challenge: about 2**bits hashes, around a second in a browser at 16
+THROTTLE_CHALLENGE_BITS = 16
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -91,9 +188,35 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests; checked before reuse
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN so lock waits happen before any work
+            # and helpdesk.db.retry_on_locked can safely rerun the transaction
+            'transaction_mode': 'IMMEDIATE',
+            # Run on every new connection. WAL lets readers continue while one
+            # connection writes; synchronous=NORMAL is durable enough with WAL.
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY'
+            ),
+        },
     }
 }
 
+# Read-only requests read from this alias (see helpdesk/routers.py). In
+# development a second connection to the same file stands in for a replica.
+DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+DATABASE_ROUTERS = ['helpdesk.routers.ReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'
+# After a write, the same browser reads from the primary for this long
+DATABASE_REPLICA_STICKY_SECONDS = 10
+
 # Custom user model
 AUTH_USER_MODEL = 'accounts.User'
 
@@ -118,6 +241,10 @@ STATIC_ROOT = '/static'
 
 STATICFILES_DIRS = (BASE_DIR / 'static', )
 
+# Serve collected files from STATIC_ROOT through helpdesk.static.serve_static.
+# Off in development, where runserver serves files straight from STATICFILES_DIRS.
+SERVE_STATIC_FILES = False
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -0,0 +1,66 @@
+import mimetypes
+import posixpath
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .storage import encoded_variants
+
+# ManifestStaticFilesStorage inserts a 12 character md5 fragment before the extension
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^/.]+$')
+
+# One year; hashed file names change whenever their content changes
+FAR_FUTURE_MAX_AGE = 60 * 60 * 24 * 365
+
+
+def _accepted_encodings(request):
+    header = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip().lower() for part in header.split(',')}
+
+
+def serve_static(request, path):
+    """
+    Serve a collected static file from STATIC_ROOT.
+
+    Prefers the .br/.gz variants written by PrecompressedManifestStaticFilesStorage
+    when the client accepts them, and marks content-hashed files as immutable
+    so browsers never revalidate them.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = Path(safe_join(settings.STATIC_ROOT, path))
+    except ValueError:
+        raise Http404('Invalid static path')
+    if not fullpath.is_file():
+        raise Http404('Static file not found')
+
+    statobj = fullpath.stat()
+    if not was_modified_since(request.headers.get('If-Modified-Since'), statobj.st_mtime):
+        return HttpResponseNotModified()
+
+    content_type, _ = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or 'application/octet-stream'
+
+    served_path, content_encoding = fullpath, None
+    accepted = _accepted_encodings(request)
+    for encoding, variant in encoded_variants(str(fullpath)).items():
+        if encoding in accepted:
+            served_path, content_encoding = Path(variant), encoding
+            break
+
+    response = FileResponse(served_path.open('rb'), content_type=content_type)
+    response['Last-Modified'] = http_date(statobj.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = f'public, max-age={FAR_FUTURE_MAX_AGE}, immutable'
+    else:
+        response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
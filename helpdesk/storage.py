@@ -0,0 +1,118 @@
+import gzip
+import io
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always produced
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional, images are copied as-is without it
+    Image = None
+
+# Text formats worth compressing. Images and fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.xml', '.ico', '.map')
+OPTIMIZABLE_IMAGE_EXTENSIONS = ('.png', '.gif')
+
+# Files smaller than this are not worth the extra request negotiation
+MIN_COMPRESS_SIZE = 256
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest (content-hashed) static storage that also optimizes images and
+    writes .gz/.br siblings during collectstatic so they can be served
+    pre-encoded by helpdesk.static.serve_static.
+
+    always_hash: use hashed URLs even when DEBUG is on. Production runs with
+    DEBUG enabled (media files are served through django.conf.urls.static),
+    so without this option the manifest would never be used.
+    """
+
+    def __init__(self, *args, always_hash=False, **kwargs):
+        self.always_hash = always_hash
+        super().__init__(*args, **kwargs)
+
+    def url(self, name, force=False):
+        return super().url(name, force=force or self.always_hash)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+
+        # Optimize the collected copies of images before hashing, and hash
+        # from those copies instead of the source files so the hash matches
+        # the bytes that are actually served.
+        paths = dict(paths)
+        for name in paths:
+            if name.lower().endswith(OPTIMIZABLE_IMAGE_EXTENSIONS) and Image is not None:
+                self._optimize_image(name)
+                paths[name] = (self, name)
+
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                self._compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def _optimize_image(self, name):
+        """
+        Losslessly re-encode a collected PNG/GIF, keeping the result only if
+        it is smaller. Returns True if the file was replaced.
+        """
+        with self.open(name) as f:
+            original = f.read()
+
+        try:
+            image = Image.open(io.BytesIO(original))
+            buffer = io.BytesIO()
+            if image.format == 'PNG':
+                image.save(buffer, 'PNG', optimize=True)
+            elif image.format == 'GIF':
+                image.save(buffer, 'GIF', save_all=True, optimize=True)
+            else:
+                return False
+        except (OSError, ValueError):
+            return False  # Leave unreadable images untouched
+
+        optimized = buffer.getvalue()
+        if len(optimized) < len(original):
+            self.delete(name)
+            self._save(name, ContentFile(optimized))
+            return True
+        return False
+
+    def _compress(self, name):
+        """Write gzip and brotli variants next to a hashed file."""
+        if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+            return
+
+        with self.open(name) as f:
+            content = f.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content, quality=11)
+
+        for suffix, compressed in variants.items():
+            if len(compressed) >= len(content):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+
+
+def encoded_variants(path):
+    """Return {encoding: path} for the precompressed files available for path."""
+    variants = {}
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if os.path.exists(path + suffix):
+            variants[encoding] = path + suffix
+    return variants
@@ -0,0 +1,217 @@
+"""
+Flood control for the public, unauthenticated endpoints.
+
+Each endpoint (scope) has token buckets in THROTTLE_RATES, keyed by client
+IP and, where the request carries them, by requestor email and ticket
+number. A request takes one token from each of its buckets. Buckets live
+in the THROTTLE_CACHE cache, so a rejected request is answered before the
+view runs: no database query, no transaction and no upload saved.
+
+Wrong access codes also take a token from the 'access_code_failures'
+buckets for the IP and ticket. Once an IP or ticket has THROTTLE_CHALLENGE_AFTER
+recent failures, every further guess must carry a solved proof-of-work
+challenge. Browsers solve it with a little JavaScript in about a second;
+an enumerator pays that for every guess. When an IP's failure bucket is
+empty, its guesses are refused outright until it refills. A ticket's
+bucket only ever leads to the challenge: ticket numbers are sequential, so
+refusing on it would let anyone lock the requestor out of their ticket.
+
+The buckets are read and written without a lock, so concurrent requests
+can overshoot a limit slightly. With the default local-memory cache each
+server process counts separately; point THROTTLE_CACHE at a shared cache
+(Redis, Memcached) to count across processes.
+"""
+import functools
+import hashlib
+import math
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.http import Http404, HttpResponse
+from django.template.loader import render_to_string
+
+from monitoring.metrics import registry
+
+FAILURES = 'access_code_failures'
+# Failure buckets that refuse guesses once empty; the others only trigger the challenge
+REFUSE_ON_FAILURES = ('ip',)
+CHALLENGE_SALT = 'helpdesk.throttle.challenge'
+# How long a challenge may take to solve, and how long a solved one is remembered
+CHALLENGE_MAX_AGE = 300
+
+throttled_requests = registry.counter(
+    'helpdesk_throttled_requests_total',
+    'Public requests refused (limit) or challenged (challenge) by flood control.',
+    ('scope', 'reason'),
+)
+
+
+def _cache():
+    return caches[settings.THROTTLE_CACHE]
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def request_keys(request, ticket_number=None, read_body=True):
+    """
+    The values a request is limited by: {'ip': ..., 'email': ..., 'ticket': ...}.
+    Without `read_body` only the IP and URL are used, so a multipart body
+    (and its uploads) is not parsed.
+    """
+    keys = {'ip': client_ip(request)}
+    if ticket_number:
+        keys['ticket'] = ticket_number
+    if read_body and request.method == 'POST':
+        email = request.POST.get('requestor_email') or request.POST.get('email')
+        if email:
+            keys['email'] = email.strip().lower()
+        if not ticket_number and request.POST.get('ticket_number'):
+            keys['ticket'] = request.POST['ticket_number'].strip()
+    return keys
+
+
+class TokenBucket:
+    """`capacity` tokens, refilled evenly over `period` seconds, stored in the cache."""
+
+    def __init__(self, scope, kind, value, capacity, period):
+        digest = hashlib.blake2b(value.encode(), digest_size=12).hexdigest()
+        self.key = f'throttle:{scope}:{kind}:{digest}'
+        self.kind = kind
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.period = period
+
+    def tokens(self, now=None):
+        now = now or time.time()
+        state = _cache().get(self.key)
+        if state is None:
+            return self.capacity
+        tokens, updated = state
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def take(self, amount=1):
+        now = time.time()
+        tokens = max(0, self.tokens(now) - amount)
+        _cache().set(self.key, (tokens, now), timeout=math.ceil(self.period))
+        return tokens
+
+    def retry_after(self):
+        """Seconds until a token is available again."""
+        return max(1, math.ceil((1 - self.tokens()) / self.rate))
+
+
+def buckets(scope, keys):
+    limits = settings.THROTTLE_RATES.get(scope, {})
+    return [
+        TokenBucket(scope, kind, keys[kind], capacity, period)
+        for kind, (capacity, period) in limits.items() if keys.get(kind)
+    ]
+
+
+def record_failure(request):
+    """Count a wrong ticket number or access code against the request's IP and ticket."""
+    for bucket in getattr(request, 'throttle_failure_buckets', ()):
+        bucket.take()
+
+
+def new_challenge():
+    return signing.dumps(
+        {'nonce': secrets.token_hex(8), 'bits': settings.THROTTLE_CHALLENGE_BITS}, salt=CHALLENGE_SALT,
+    )
+
+
+def solved(request):
+    """Whether the request carries a fresh, unused, correctly solved challenge."""
+    data = request.POST if request.method == 'POST' else request.GET
+    token, solution = data.get('challenge', ''), data.get('solution', '')
+    try:
+        challenge = signing.loads(token, salt=CHALLENGE_SALT, max_age=CHALLENGE_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    digest = int.from_bytes(hashlib.sha256(f'{token}:{solution}'.encode()).digest(), 'big')
+    if digest >> (256 - challenge['bits']):
+        return False
+    # Each solution is good for one request
+    return _cache().add(f'throttle:solved:{challenge["nonce"]}', True, timeout=CHALLENGE_MAX_AGE)
+
+
+def _refused(scope, reason, retry_after):
+    registry.inc(throttled_requests, (scope, reason))
+    response = HttpResponse(
+        # Rendered without the request: no context processors, so no session or user lookups
+        render_to_string('throttled.html', {'retry_after': retry_after}), status=429,
+    )
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def _challenge(request, scope):
+    registry.inc(throttled_requests, (scope, 'challenge'))
+    data = request.POST if request.method == 'POST' else request.GET
+    fields = [
+        (name, value) for name, values in data.lists() if name not in ('challenge', 'solution')
+        for value in values
+    ]
+    response = HttpResponse(render_to_string('throttle_challenge.html', {
+        'challenge': new_challenge(),
+        'bits': settings.THROTTLE_CHALLENGE_BITS,
+        'method': request.method.lower(),
+        'action': request.path,
+        'fields': fields,
+    }), status=429)
+    response['Retry-After'] = '1'
+    return response
+
+
+def throttle(scope, methods=('POST',), guards_access_code=False):
+    """
+    Limit a public view to THROTTLE_RATES[scope]. Only requests whose method
+    is in `methods` are counted. With `guards_access_code`, the view is
+    also subject to the access code failure limits and challenge; a 404
+    from it, or a call to record_failure, counts as a failed guess.
+
+    Apply it outside retry_on_locked, so refused requests never begin a
+    transaction.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not settings.THROTTLE_ENABLED or request.method not in methods:
+                return view_func(request, *args, **kwargs)
+            # Refuse on the IP alone before the body is parsed
+            for bucket in buckets(scope, request_keys(request, read_body=False)):
+                if bucket.tokens() < 1:
+                    return _refused(scope, 'limit', bucket.retry_after())
+            keys = request_keys(request, kwargs.get('ticket_number'))
+
+            if guards_access_code:
+                failure_buckets = buckets(FAILURES, keys)
+                request.throttle_failure_buckets = failure_buckets
+                for bucket in failure_buckets:
+                    if bucket.kind in REFUSE_ON_FAILURES and bucket.tokens() < 1:
+                        return _refused(scope, 'failures', bucket.retry_after())
+                if any(
+                    bucket.capacity - bucket.tokens() >= settings.THROTTLE_CHALLENGE_AFTER for bucket in failure_buckets
+                ) and not solved(request):
+                    return _challenge(request, scope)
+
+            limits = buckets(scope, keys)
+            for bucket in limits:
+                if bucket.tokens() < 1:
+                    return _refused(scope, 'limit', bucket.retry_after())
+            for bucket in limits:
+                bucket.take()
+
+            try:
+                return view_func(request, *args, **kwargs)
+            except Http404:
+                if guards_access_code:
+                    record_failure(request)
+                raise
+        return wrapper
+    return decorator
@@ -1,9 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from .static import serve_static
 
 def root_redirect(request):
     """Redirect root URL based on authentication status"""
@@ -21,5 +22,14 @@ urlpatterns = [
     # Include app URLs
     path('', include('tickets.urls')),
     path('accounts/', include('accounts.urls')),
-    path('assets/', include('assets.urls'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path('assets/', include('assets.urls')),
+    path('', include('monitoring.urls')),
+]
+
+if settings.SERVE_STATIC_FILES:
+    # Must come before the media pattern below, which matches every path
+    urlpatterns.append(
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static, name='static')
+    )
+
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -0,0 +1,286 @@
+"""
+In-process request metrics.
+
+Each request gets a RequestTimings collector (stored in a context variable)
+that the database wrapper, template instrumentation and NotificationManager
+add to. When the request finishes the totals are folded into histograms,
+which the /metrics view renders in the Prometheus text format.
+
+Counters are per process too, except SharedCounters, which add to a
+CounterTotal row so that every process's counts (including management
+commands that serve no /metrics) show up in every process's /metrics.
+"""
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from . import slow_queries
+
+# Upper bounds, in seconds, for duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds for the per-request query count histogram
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    """Accumulates where the time of a single request went."""
+
+    __slots__ = (
+        'start', 'db_queries', 'db_time', 'template_time', 'template_depth',
+        'email_time', 'email_count', 'slow_query_seconds', 'slow_queries',
+    )
+
+    def __init__(self, slow_query_seconds=None):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.email_time = 0.0
+        self.email_count = 0
+        # Queries taking at least this long are captured for the slow query log (None: none are)
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_queries = []
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.start
+
+
+def start_request(slow_query_seconds=None):
+    timings = RequestTimings(slow_query_seconds)
+    token = _current.set(timings)
+    return timings, token
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_timings():
+    return _current.get()
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper hook that times every query of the request and captures slow ones."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        result = execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        timings.db_time += elapsed
+        timings.db_queries += 1
+    if timings.slow_query_seconds is not None and elapsed >= timings.slow_query_seconds:
+        timings.slow_queries.append(slow_queries.capture(sql, params, many, context, elapsed))
+    return result
+
+
+@contextmanager
+def timer(kind):
+    """
+    Time a block and add it to the current request, e.g.
+    `with metrics.timer('email'): send_mail(...)`.
+    """
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            elapsed = time.perf_counter() - start
+            setattr(timings, f'{kind}_time', getattr(timings, f'{kind}_time') + elapsed)
+            if kind == 'email':
+                timings.email_count += 1
+
+
+def instrument_templates():
+    """Wrap the Django template backend so render time is attributed to the request."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, '_instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None or timings.template_depth:
+            # Nested renders are already covered by the outer one
+            return original_render(self, context, request)
+        timings.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            timings.template_time += time.perf_counter() - start
+            timings.template_depth -= 1
+
+    render._instrumented = True
+    Template.render = render
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}  # labels tuple -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        # Counts are stored per bucket and accumulated when rendered
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, label_names):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for labels, series in sorted(self.series.items()):
+            label_text = ','.join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{label_text}}} {series[-1]}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.series = {}
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self, label_names):
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} counter',
+        ]
+        for labels, value in sorted(self.series.items()):
+            if labels:
+                label_text = ','.join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+                lines.append(f'{self.name}{{{label_text}}} {value}')
+            else:
+                lines.append(f'{self.name} {value}')
+        return lines
+
+
+class SharedCounter(Counter):
+    """A counter kept in the database (CounterTotal), summed over every process."""
+
+    def inc(self, labels, amount=1):
+        from django.db import DatabaseError
+        from django.db.models import F
+
+        from helpdesk.db import run_in_write_transaction
+
+        from .models import CounterTotal
+
+        def add():
+            key = ','.join(labels)
+            if not CounterTotal.objects.filter(name=self.name, labels=key).update(value=F('value') + amount):
+                CounterTotal.objects.create(name=self.name, labels=key, value=amount)
+
+        try:
+            run_in_write_transaction(add)
+        except DatabaseError:
+            # Whatever was counted has already happened (an email went out); don't fail or repeat it
+            logger.exception('Could not add to %s', self.name)
+
+    def render(self, label_names):
+        from .models import CounterTotal
+
+        self.series = {
+            tuple(labels.split(',')) if labels else (): value
+            for labels, value in CounterTotal.objects.filter(name=self.name).values_list('labels', 'value')
+        }
+        return super().render(label_names)
+
+
+class Registry:
+    """Process-wide metric store. All updates happen under one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.request_metrics = (
+            Histogram('helpdesk_request_duration_seconds', 'Total request latency.', DURATION_BUCKETS),
+            Histogram('helpdesk_request_db_seconds', 'Time spent in SQL queries per request.', DURATION_BUCKETS),
+            Histogram('helpdesk_request_db_queries', 'SQL queries issued per request.', QUERY_COUNT_BUCKETS),
+            Histogram('helpdesk_request_template_seconds', 'Template render time per request.', DURATION_BUCKETS),
+            Histogram('helpdesk_request_email_seconds', 'Email send time per request.', DURATION_BUCKETS),
+        )
+        self.requests_total = Counter('helpdesk_requests_total', 'Requests served.')
+        # Counters registered by other parts of the app: name -> (Counter, label names)
+        self.counters = {}
+
+    def observe_request(self, view, status, timings, total):
+        duration, db_time, db_queries, template_time, email_time = self.request_metrics
+        labels = (view,)
+        with self.lock:
+            duration.observe(labels, total)
+            db_time.observe(labels, timings.db_time)
+            db_queries.observe(labels, timings.db_queries)
+            template_time.observe(labels, timings.template_time)
+            if timings.email_count:
+                email_time.observe(labels, timings.email_time)
+            self.requests_total.inc((view, str(status)))
+
+    def counter(self, name, documentation, label_names=(), shared=False):
+        """
+        Get or create an application counter, e.g. throttled requests. A
+        shared counter (SharedCounter) also counts what other processes add.
+        """
+        with self.lock:
+            if name not in self.counters:
+                counter = (SharedCounter if shared else Counter)(name, documentation)
+                self.counters[name] = (counter, tuple(label_names))
+            return self.counters[name][0]
+
+    def inc(self, counter, labels=(), amount=1):
+        if isinstance(counter, SharedCounter):
+            # A database write: not under the lock
+            counter.inc(tuple(labels), amount)
+            return
+        with self.lock:
+            counter.inc(tuple(labels), amount)
+
+    def render(self):
+        with self.lock:
+            counters = list(self.counters.values())
+            lines = []
+            for histogram in self.request_metrics:
+                lines += histogram.render(('view',))
+            lines += self.requests_total.render(('view', 'status'))
+            for counter, label_names in counters:
+                if not isinstance(counter, SharedCounter):
+                    lines += counter.render(label_names)
+        for counter, label_names in counters:
+            if isinstance(counter, SharedCounter):
+                lines += counter.render(label_names)
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
@@ -0,0 +1,51 @@
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics, slow_queries
+
+
+class PerformanceMiddleware:
+    """
+    Records SQL, template, email and total time for every request, tagged
+    with the URL name, and reports them in a Server-Timing header to
+    signed-in staff. Queries slower than SLOW_QUERY_MS go to the slow query
+    log. Place it first in MIDDLEWARE so the total covers the rest of the
+    stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings, token = metrics.start_request(slow_queries.threshold_seconds())
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.db_execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+
+        total = timings.total_time
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unresolved'
+        metrics.registry.observe_request(view, response.status_code, timings, total)
+        if timings.slow_queries:
+            slow_queries.save(timings.slow_queries, view, request.get_full_path())
+
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            response['Server-Timing'] = self.server_timing(timings, total)
+        return response
+
+    @staticmethod
+    def server_timing(timings, total):
+        entries = [
+            f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_queries} queries"',
+            f'tpl;dur={timings.template_time * 1000:.1f};desc="Template render"',
+        ]
+        if timings.email_count:
+            entries.append(f'email;dur={timings.email_time * 1000:.1f};desc="{timings.email_count} emails"')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 19:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('view', models.CharField(help_text='URL name of the request that ran it', max_length=200)),
+                ('path', models.CharField(max_length=500)),
+                ('alias', models.CharField(help_text='Database alias it ran on', max_length=50)),
+                ('fingerprint', models.CharField(db_index=True, help_text='Hash of the normalized SQL', max_length=16)),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('many', models.BooleanField(default=False, help_text='Run with executemany')),
+                ('duration_ms', models.FloatField()),
+                ('origin', models.CharField(blank=True, help_text='Line of tickets, assets or accounts code that ran it', max_length=500)),
+                ('template', models.CharField(blank=True, help_text='Template line being rendered, if any', max_length=500)),
+                ('plan', models.TextField(blank=True, help_text='EXPLAIN output')),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
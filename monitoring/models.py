@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SlowQuery(models.Model):
+    """A query that took at least SLOW_QUERY_MS, as saved by the slow query log (see slow_queries.py)"""
+    created = models.DateTimeField(default=timezone.now)
+    view = models.CharField(max_length=200, help_text='URL name of the request that ran it')
+    path = models.CharField(max_length=500)
+    alias = models.CharField(max_length=50, help_text='Database alias it ran on')
+    fingerprint = models.CharField(max_length=16, db_index=True, help_text='Hash of the normalized SQL')
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    many = models.BooleanField(default=False, help_text='Run with executemany')
+    duration_ms = models.FloatField()
+    origin = models.CharField(max_length=500, blank=True, help_text='Line of tickets, assets or accounts code that ran it')
+    template = models.CharField(max_length=500, blank=True, help_text='Template line being rendered, if any')
+    plan = models.TextField(blank=True, help_text='EXPLAIN output')
+
+    class Meta:
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.duration_ms:.0f} ms in {self.view}: {self.sql[:80]}'
+
+
+class CounterTotal(models.Model):
+    """
+    One series of a counter kept in the database rather than in a process,
+    so that /metrics includes counts made by workers such as send_notifications
+    (see SharedCounter in metrics.py)
+    """
+    name = models.CharField(max_length=100)
+    labels = models.CharField(max_length=200, blank=True, help_text='Label values, comma-separated')
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['name', 'labels'], name='unique_counter_series')]
+
+    def __str__(self):
+        return f'{self.name}{{{self.labels}}} {self.value}'
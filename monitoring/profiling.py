@@ -0,0 +1,247 @@
+"""
+On-demand request profiling for system managers.
+
+A system manager adds `?profile=1` to a URL, or sends an `X-Profile: 1`
+header, and ProfilingMiddleware runs cProfile around the view: its
+queries, template rendering and any NotificationManager emails. The profile is saved under PROFILE_DIR as a standard .prof file
+(readable by pstats, snakeviz, ...) next to a small JSON summary, keeping
+the newest PROFILE_KEEP. Requests without the flag only pay for the check.
+"""
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import time
+import uuid
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.permissions import is_system_manager
+
+from . import metrics
+
+PROFILE_ID = re.compile(r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+
+SORT_KEYS = {
+    'cumulative': 'Cumulative time',
+    'tottime': 'Own time',
+    'ncalls': 'Calls',
+}
+
+
+def profile_dir():
+    return str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def requested(request):
+    """Whether the request asks to be profiled (by anyone; ProfilingMiddleware checks who)."""
+    return request.META.get('HTTP_X_PROFILE') == '1' or request.GET.get('profile') == '1'
+
+
+class ProfilingMiddleware:
+    """
+    Profiles the views of requests from system managers that ask for it.
+    Place it last in MIDDLEWARE: it calls the view itself from process_view,
+    after the other middleware (authentication, CSRF) has had its say.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not requested(request) or not is_system_manager(request.user):
+            return None
+
+        timings = metrics.current_timings()
+        queries_before = timings.db_queries if timings else 0
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        response = profiler.runcall(render_view, request, view_func, view_args, view_kwargs)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        profile_id = save_profile(profiler, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.url_name or match.view_name,
+            'status': response.status_code,
+            'milliseconds': round(elapsed * 1000, 1),
+            'queries': timings.db_queries - queries_before if timings else None,
+            'user': request.user.get_username(),
+        })
+        response['X-Profile'] = reverse('profile_detail', args=[profile_id])
+        return response
+
+
+def render_view(request, view_func, view_args, view_kwargs):
+    """The profiled call: the view, and rendering its template if it returned an unrendered TemplateResponse."""
+    response = view_func(request, *view_args, **view_kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response = response.render()
+    return response
+
+
+def save_profile(profiler, summary):
+    """Write the profile and its summary to PROFILE_DIR, drop the oldest beyond PROFILE_KEEP; returns the id."""
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    created = timezone.now()
+    # Ids sort by time, which is what rotation and the list rely on
+    profile_id = f'{created:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    profiler.dump_stats(os.path.join(directory, f'{profile_id}.prof'))
+    with open(os.path.join(directory, f'{profile_id}.json'), 'w') as file:
+        json.dump(dict(summary, created=created.isoformat()), file)
+    for old_id in list_profile_ids()[getattr(settings, 'PROFILE_KEEP', 50):]:
+        delete_profile(old_id)
+    return profile_id
+
+
+def list_profile_ids():
+    """Ids of the saved profiles, newest first."""
+    try:
+        names = os.listdir(profile_dir())
+    except FileNotFoundError:
+        return []
+    ids = (name[:-len('.prof')] for name in names if name.endswith('.prof'))
+    return sorted((profile_id for profile_id in ids if PROFILE_ID.match(profile_id)), reverse=True)
+
+
+def profile_path(profile_id, extension='prof'):
+    if not PROFILE_ID.match(profile_id):
+        raise FileNotFoundError(profile_id)
+    return os.path.join(profile_dir(), f'{profile_id}.{extension}')
+
+
+def load_summary(profile_id):
+    try:
+        with open(profile_path(profile_id, 'json')) as file:
+            summary = json.load(file)
+    except (FileNotFoundError, ValueError):
+        summary = {}
+    summary['id'] = profile_id
+    summary['created'] = parse_datetime(summary.get('created', ''))
+    return summary
+
+
+def delete_profile(profile_id):
+    for extension in ('prof', 'json'):
+        try:
+            os.remove(profile_path(profile_id, extension))
+        except FileNotFoundError:
+            pass
+
+
+def load_stats(profile_id):
+    """The pstats.Stats of a saved profile; raises FileNotFoundError."""
+    path = profile_path(profile_id)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return pstats.Stats(path)
+
+
+def function_label(func):
+    """'tickets/views.py:12(view_ticket)', with the project or site-packages prefix removed."""
+    filename, lineno, name = func
+    if filename == '~':  # Built-ins
+        return name
+    for prefix in [str(settings.BASE_DIR)] + [path for path in sys.path if path.endswith('-packages')]:
+        if filename.startswith(prefix + os.sep):
+            filename = filename[len(prefix) + 1:]
+            break
+    return f'{filename}:{lineno}({name})'
+
+
+def function_kind(func):
+    """'project', 'django' or 'other', to color the flame graph by."""
+    filename = func[0]
+    if filename.startswith(str(settings.BASE_DIR) + os.sep) and '-packages' not in filename:
+        return 'project'
+    if f'{os.sep}django{os.sep}' in filename:
+        return 'django'
+    return 'other'
+
+
+def call_table(stats, sort='cumulative', search='', limit=100):
+    """Rows for the sorted call table: label, calls, own and cumulative milliseconds."""
+    index = {'ncalls': 1, 'tottime': 2, 'cumulative': 3}[sort]
+    rows = []
+    for func, (primitive_calls, calls, own, cumulative, callers) in stats.stats.items():
+        label = function_label(func)
+        if search and search.lower() not in label.lower():
+            continue
+        rows.append({
+            'label': label,
+            'calls': calls if calls == primitive_calls else f'{calls}/{primitive_calls}',
+            'own_ms': own * 1000,
+            'cumulative_ms': cumulative * 1000,
+            'own_per_call_ms': own * 1000 / calls if calls else 0,
+            'key': (primitive_calls, calls, own, cumulative)[index],
+        })
+    rows.sort(key=lambda row: row['key'], reverse=True)
+    return rows[:limit]
+
+
+def flame_graph(stats, min_fraction=0.005, max_depth=40):
+    """
+    Bars of an icicle-style flame graph, as rows from the outermost call
+    down: {'label', 'title', 'kind', 'left', 'width'} with left and width in
+    percent of the total. cProfile keeps caller/callee pairs rather than
+    whole stacks, so this is an approximation: a function's time is split
+    between its callees in proportion to what it spent in each overall.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, caller_stats in callers.items():
+            callees.setdefault(caller, []).append((func, caller_stats[3]))
+    roots = [
+        (func, entry[3]) for func, entry in stats.stats.items()
+        if not entry[4] and func[2] != "<method 'disable' of '_lsprof.Profiler' objects>"
+    ]
+    total = sum(seconds for _, seconds in roots)
+    if not total:
+        return []
+
+    rows = []
+
+    def place(func, depth, left, spent):
+        if depth == len(rows):
+            rows.append([])
+        width = spent / total * 100
+        rows[depth].append({
+            'label': func[2] if func[0] == '~' else f'{os.path.basename(func[0])}:{func[2]}',
+            'title': f'{function_label(func)}: {spent * 1000:.1f} ms ({width:.1f}%)',
+            'kind': function_kind(func),
+            'left': left,
+            'width': width,
+        })
+        if depth + 1 >= max_depth:
+            return
+        cumulative = stats.stats[func][3]
+        # Functions may re-enter through others (template nodes render nested nodes); direct
+        # recursion is already part of func's own time
+        children = [(callee, seconds) for callee, seconds in callees.get(func, ()) if callee != func]
+        # Share of this call path in func's overall time, capped so children never overflow their parent
+        scale = spent / cumulative if cumulative else 0
+        scale = min(scale, spent / (sum(seconds for _, seconds in children) or 1))
+        offset = left
+        for callee, seconds in sorted(children, key=lambda child: -child[1]):
+            child_spent = seconds * scale
+            if child_spent < total * min_fraction:
+                continue
+            place(callee, depth + 1, offset, child_spent)
+            offset += child_spent / total * 100
+
+    left = 0
+    for func, seconds in sorted(roots, key=lambda root: -root[1]):
+        if seconds >= total * min_fraction:
+            place(func, 0, left, seconds)
+        left += seconds / total * 100
+    return rows
@@ -0,0 +1,108 @@
+"""
+Recording SQL queries together with where they came from.
+
+query_origin() names the template line being rendered when a query runs
+(the usual source of N+1 queries, e.g. `ticket.assets.all` in a loop), or
+else the innermost line of project code. QueryRecorder collects every
+query run on any database connection inside a `with` block, with its
+duration and origin.
+"""
+import os
+import sys
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+def query_origin():
+    """'template.html:LINE' or 'app/module.py:LINE in function' for the running query."""
+    template, code = query_origins()
+    return template or code or 'unknown'
+
+
+def query_origins(apps=None):
+    """
+    (template line, code line) of the running query, either None if not
+    found. With `apps`, only code in those top-level packages counts, e.g.
+    ('tickets', 'assets') skips monitoring and helpdesk frames.
+    """
+    base_dir = str(settings.BASE_DIR) + os.sep
+    template = code = None
+    frame = sys._getframe(1)
+    while frame is not None and (template is None or code is None):
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            # django.template.base.Node.render_annotated; the innermost is the node being rendered
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            # Skipping Django's own form widget templates
+            if token is not None and origin is not None and not str(origin.template_name).startswith('django/'):
+                template = f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (code is None and filename.startswith(base_dir) and filename != _THIS_FILE
+                and 'site-packages' not in filename):
+            path = os.path.relpath(filename, base_dir)
+            if apps is None or path.split(os.sep)[0] in apps:
+                code = f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return template, code
+
+
+class RecordedQuery:
+    __slots__ = ('alias', 'sql', 'duration', 'origin')
+
+    def __init__(self, alias, sql, duration, origin):
+        self.alias = alias
+        self.sql = sql
+        self.duration = duration
+        self.origin = origin
+
+    def __str__(self):
+        return f'[{self.alias}] {self.origin}: {self.sql}'
+
+
+class QueryRecorder:
+    """
+    `with QueryRecorder() as recorder:` keeps every query run inside the
+    block, on every connection (reads may go to a replica), in
+    recorder.queries.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self._wrapper(connection.alias)))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _wrapper(self, alias):
+        def record(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                self.queries.append(RecordedQuery(alias, sql, time.perf_counter() - start, query_origin()))
+        return record
+
+    def __len__(self):
+        return len(self.queries)
+
+    def report(self, limit=None):
+        """The queries, one per line, grouped by origin with the most frequent first."""
+        by_origin = {}
+        for query in self.queries:
+            by_origin.setdefault(query.origin, []).append(query)
+        lines = []
+        for origin, queries in sorted(by_origin.items(), key=lambda entry: -len(entry[1])):
+            lines.append(f'{len(queries):>4} x {origin}')
+            for query in queries[:3]:
+                lines.append(f'         {query.sql[:300]}')
+        return '\n'.join(lines[:limit])
@@ -0,0 +1,158 @@
+"""
+The slow query log.
+
+The request database wrapper (metrics.db_execute_wrapper) hands every query
+that takes at least SLOW_QUERY_MS to capture(), which notes where it came
+from and asks the database for its plan while the request runs.
+PerformanceMiddleware saves them once the response is ready: to the
+`monitoring.slow_queries` logger (a rotating file, see LOGGING) and to the
+SlowQuery table, keeping the newest SLOW_QUERY_KEEP. Queries are grouped
+by fingerprint, their SQL with literals and IN lists collapsed, so the
+manager page can show how often each shape is slow.
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+
+from django.conf import settings
+from django.db import DatabaseError
+
+from .queries import query_origins
+
+logger = logging.getLogger('monitoring.slow_queries')
+
+# Packages whose frames name the ORM call that issued a query
+ORIGIN_APPS = ('tickets', 'assets', 'accounts')
+
+# Statements whose plan EXPLAIN can show without running them
+EXPLAINABLE = re.compile(r'^\s*(SELECT|WITH|UPDATE|DELETE)\b', re.IGNORECASE)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+_SPACE = re.compile(r'\s+')
+
+
+def threshold_seconds():
+    """SLOW_QUERY_MS in seconds, or None when the log is off."""
+    milliseconds = getattr(settings, 'SLOW_QUERY_MS', None)
+    return None if milliseconds is None else milliseconds / 1000
+
+
+def normalize(sql):
+    """The shape of a query: literals become ?, IN (%s, %s, ...) lists one entry."""
+    sql = _SAVEPOINT.sub('"savepoint"', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('%s, ...', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:16]
+
+
+class CapturedQuery:
+    __slots__ = ('alias', 'sql', 'params', 'many', 'seconds', 'origin', 'template', 'plan')
+
+    def __init__(self, alias, sql, params, many, seconds, origin, template, plan):
+        self.alias = alias
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.seconds = seconds
+        self.origin = origin
+        self.template = template
+        self.plan = plan
+
+
+def capture(sql, params, many, context, seconds):
+    """A slow query, with its origin and plan, from inside connection.execute_wrapper."""
+    connection = context['connection']
+    template, origin = query_origins(ORIGIN_APPS)
+    plan = '' if many else explain(connection, sql, params)
+    return CapturedQuery(
+        connection.alias, sql, repr(params)[:2000], many, seconds, origin or '', template or '', plan,
+    )
+
+
+def explain(connection, sql, params):
+    """The database's plan for a query, or '' if it can't give one."""
+    if not EXPLAINABLE.match(sql):
+        return ''
+    # A cursor of its own: the query's cursor may still have rows to read, and
+    # the connection's cursors would run this through the execute wrappers again
+    try:
+        cursor = connection.create_cursor()
+        try:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    except DatabaseError as error:
+        return f'EXPLAIN failed: {error}'
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail): indent each step under its parent
+        depths, lines = {0: -1}, []
+        for step_id, parent, _, detail in rows:
+            depths[step_id] = depths.get(parent, -1) + 1
+            lines.append('  ' * depths[step_id] + detail)
+        return '\n'.join(lines)
+    return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+
+def save(captured, view, path):
+    """Log the request's slow queries and store them in SlowQuery."""
+    from .models import SlowQuery
+
+    records = []
+    for query in captured:
+        record = SlowQuery(
+            view=view[:200], path=path[:500], alias=query.alias, fingerprint=fingerprint(query.sql),
+            sql=query.sql, params=query.params, many=query.many, duration_ms=query.seconds * 1000,
+            origin=query.origin[:500], template=query.template[:500], plan=query.plan,
+        )
+        records.append(record)
+        logger.warning('%s', json.dumps({
+            'view': record.view, 'path': record.path, 'duration_ms': round(record.duration_ms, 1),
+            'fingerprint': record.fingerprint, 'origin': record.origin, 'template': record.template,
+            'sql': record.sql, 'params': record.params, 'plan': record.plan,
+        }))
+    try:
+        SlowQuery.objects.bulk_create(records)
+        keep = getattr(settings, 'SLOW_QUERY_KEEP', 5000)
+        newest = SlowQuery.objects.order_by('-pk').values_list('pk', flat=True).first()
+        SlowQuery.objects.filter(pk__lte=newest - keep).delete()
+    except DatabaseError:
+        # The log file still has them; a busy database shouldn't fail the request
+        logger.exception('Could not store slow queries')
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(len(sorted_values) * fraction) - 1)]
+
+
+def fingerprint_summary(queryset):
+    """
+    One row per fingerprint in `queryset`, slowest in total first: count,
+    total, p95 and max milliseconds, and the latest record as a sample.
+    """
+    durations, latest = {}, {}
+    for pk, shape, duration in queryset.order_by('-pk').values_list('pk', 'fingerprint', 'duration_ms'):
+        durations.setdefault(shape, []).append(duration)
+        latest.setdefault(shape, pk)
+    samples = queryset.model.objects.in_bulk(latest.values())
+    rows = []
+    for shape, values in durations.items():
+        values.sort()
+        sample = samples[latest[shape]]
+        rows.append({
+            'fingerprint': shape, 'sample': sample, 'shape': normalize(sample.sql), 'count': len(values),
+            'total_ms': sum(values), 'p95_ms': percentile(values, 0.95), 'max_ms': values[-1],
+        })
+    rows.sort(key=lambda row: -row['total_ms'])
+    return rows
@@ -0,0 +1,484 @@
+"""
+Query and latency budgets for every page, request profiling and the slow
+query log.
+
+Each URL named in tickets/urls.py, assets/urls.py and accounts/urls.py is
+requested as each role (anonymous, technician, system manager) against
+seeded data of two sizes. Every request must stay within its page's
+query budget (BUDGETS) and run the same number of queries at both sizes,
+so an N+1 shows up even while it is still under budget. With the
+HELPDESK_TIME_BUDGETS environment variable set, it must also take no
+longer than the page's time budget times that factor, measured as the
+best of TIMED_RUNS; wall-clock times depend on the machine, so they are
+not checked by default. Failures list the queries, grouped by the
+template line or code that ran them.
+
+When a change legitimately needs more queries, raise the page's budget in
+the same commit. A new URL without a budget fails test_every_url_has_a_budget.
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.tokens import default_token_generator
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from accounts.models import Settings
+from assets.models import Asset, AssetType
+from tickets import catalog
+from tickets.archive import archive_batch
+from tickets.models import ArchivedTicket, Ticket, TicketAttachment, TicketMessage, TicketStatus
+from tickets.seeding import seed
+
+from . import profiling, slow_queries
+from .models import SlowQuery
+from .queries import QueryRecorder
+
+User = get_user_model()
+
+SIZES = (40, 400)  # Seeded tickets
+ROLES = ('anonymous', 'technician', 'manager')
+TIMED_RUNS = 3
+# Factor applied to the time budgets (e.g. 1, or 2 on a slow machine); unset skips them
+TIME_BUDGET_FACTOR = float(os.environ.get('HELPDESK_TIME_BUDGETS') or 0)
+APPS = ('tickets', 'assets', 'accounts')
+
+# Case name (the URL name, plus ':post' for form submissions): (queries, milliseconds).
+# The query budget is the most any role may run; the time budget is for the larger data set.
+BUDGETS = {
+    # Public
+    'submit_ticket': (3, 150),
+    'submit_ticket:post': (25, 400),
+    'ticket_confirmation': (3, 150),
+    'access_ticket': (1, 150),
+    'view_ticket': (8, 250),
+    'view_ticket_messages': (4, 150),
+    'ticket_catalog': (1, 100),
+    'asset_lookup': (5, 150),
+    'login': (1, 150),
+    'logout': (3, 150),
+    'password_reset': (1, 150),
+    'password_reset_done': (1, 150),
+    'password_reset_confirm': (2, 150),
+    'password_reset_complete': (1, 150),
+    # Technicians
+    'technician_dashboard': (5, 400),
+    'create_ticket': (3, 250),
+    'manage_ticket': (15, 400),
+    'manage_ticket:post': (24, 400),
+    'self_assign_ticket': (4, 150),
+    'add_asset_to_ticket': (3, 150),
+    'ticket_messages': (5, 150),
+    'archive_list': (4, 250),
+    'archived_ticket': (7, 250),
+    'asset_list': (4, 400),
+    'asset_create': (2, 150),
+    'asset_detail': (6, 250),
+    'asset_update': (4, 150),
+    'asset_delete': (3, 150),
+    # System managers
+    'manage_users': (4, 250),
+    'add_technician': (1, 150),
+    'add_system_manager': (1, 150),
+    'toggle_user_active': (4, 150),
+    'delete_user': (4, 150),
+    'rebalance_workload': (4, 250),
+    'technician_skills': (3, 150),
+    'manage_settings': (2, 150),
+    'manage_catalog': (5, 400),
+}
+
+
+def app_url_names():
+    """Names of the URLs in the tickets, assets and accounts URLconfs."""
+    names = set()
+
+    def collect(patterns, in_app):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_module, '__name__', '')
+                collect(pattern.url_patterns, in_app or module.split('.')[0] in APPS)
+            elif isinstance(pattern, URLPattern) and pattern.name and in_app:
+                names.add(pattern.name)
+
+    collect(get_resolver().url_patterns, False)
+    return names
+
+
+class Probes:
+    """
+    Objects the pages are requested for. Everything a page lists grows
+    with the data size, so a per-row query shows up as growth.
+    """
+
+    def __init__(self, size, technician, manager):
+        rows = size // 10
+        now = timezone.now()
+        self.asset = Asset.objects.create(
+            inventory_number=f'PROBE{size}', name='Probe Projector', type=AssetType.PROJECTOR, location='Lamb Hall 101',
+        )
+        self.ticket = self._ticket(f'Probe {size}', technician, TicketStatus.IN_PROGRESS)
+        self.ticket.assets.add(self.asset, *Asset.objects.exclude(pk=self.asset.pk)[:rows // 4])
+        for number in range(rows + 20):  # More than one message window either way
+            from_requestor = number % 2 == 0
+            TicketMessage.objects.create(
+                ticket=self.ticket, content=f'Message {number}', is_from_requestor=from_requestor,
+                sender=None if from_requestor else technician,
+                sender_email=self.ticket.requestor_email if from_requestor else technician.email,
+            )
+        for number in range(rows // 4):
+            TicketAttachment.objects.create(ticket=self.ticket, file=f'ticket_attachments/seed/screenshot-{number % 5}.txt')
+        self.newest_message = self.ticket.messages.order_by('-created_at', '-id').first()
+        for other in Ticket.objects.exclude(pk=self.ticket.pk).order_by('pk')[:rows]:
+            other.assets.add(self.asset)
+
+        self.unassigned = self._ticket(f'Unassigned {size}', None, TicketStatus.NEW)
+
+        closed = self._ticket(f'Closed {size}', technician, TicketStatus.CLOSED)
+        closed.assets.add(self.asset)
+        for number in range(rows):
+            TicketMessage.objects.create(ticket=closed, content=f'Message {number}', sender_email=closed.requestor_email)
+        Ticket.objects.filter(pk=closed.pk).update(last_activity_at=now - timezone.timedelta(days=400))
+        archive_batch([closed.pk], now)
+        self.archived = ArchivedTicket.objects.get(ticket_number=closed.ticket_number)
+
+        # Toggled back and forth by toggle_user_active, so it has no tickets
+        self.toggled = User.objects.create_user(
+            f'probe-toggle-{size}', f'probe-toggle-{size}@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN,
+        )
+        self.technician = technician
+        self.manager = manager
+
+    def _ticket(self, title, technician, status):
+        return Ticket.objects.create(
+            requestor_email='probe@etsu.edu', requestor_name='Probe Requestor', title=title,
+            description='The projector in Lamb Hall 101 will not turn on.', type='INC', subtype='LAB',
+            item='projector', assigned_to=technician, status=status,
+        )
+
+    def cases(self):
+        """(case name, method, url, data) for every request the suite makes."""
+        ticket, asset = self.ticket, self.asset
+        public = [ticket.ticket_number, ticket.access_code]
+        uid = urlsafe_base64_encode(force_bytes(self.technician.pk))
+        return [
+            ('submit_ticket', 'get', reverse('submit_ticket'), None),
+            ('submit_ticket:post', 'post', reverse('submit_ticket'), {
+                'requestor_email': 'budget@etsu.edu', 'requestor_name': 'Budget Test', 'title': 'Projector is dim',
+                'description': 'The projector in Brown Hall 200 is very dim.', 'type': 'INC', 'subtype': 'LAB',
+                'item': 'projector', 'inventory_number': asset.inventory_number, 'asset_type': asset.type,
+            }),
+            ('ticket_confirmation', 'get', reverse('ticket_confirmation', args=[ticket.ticket_number]), None),
+            ('access_ticket', 'get', reverse('access_ticket'), None),
+            ('view_ticket', 'get', reverse('view_ticket', args=public), None),
+            ('view_ticket_messages', 'get', reverse('view_ticket_messages', args=public),
+             {'before': self.newest_message.pk}),
+            ('ticket_catalog', 'get', reverse('ticket_catalog'), None),
+            # Few matches at either size, so a restricted technician's uncached
+            # lookup takes every fallback query both times
+            ('asset_lookup', 'get', reverse('asset_lookup'), {'q': 'PROBE'}),
+            ('login', 'get', reverse('login'), None),
+            ('logout', 'get', reverse('logout'), None),
+            ('password_reset', 'get', reverse('password_reset'), None),
+            ('password_reset_done', 'get', reverse('password_reset_done'), None),
+            ('password_reset_confirm', 'get', reverse('password_reset_confirm', args=[
+                uid, default_token_generator.make_token(self.technician),
+            ]), None),
+            ('password_reset_complete', 'get', reverse('password_reset_complete'), None),
+            ('technician_dashboard', 'get', reverse('technician_dashboard'), None),
+            ('create_ticket', 'get', reverse('create_ticket'), None),
+            ('manage_ticket', 'get', reverse('manage_ticket', args=[ticket.ticket_number]), None),
+            ('manage_ticket:post', 'post', reverse('manage_ticket', args=[ticket.ticket_number]), {
+                'action': 'add_message', 'content': 'Checked the bulb.',
+            }),
+            ('self_assign_ticket', 'get', reverse('self_assign_ticket', args=[self.unassigned.ticket_number]), None),
+            ('add_asset_to_ticket', 'get', reverse('add_asset_to_ticket', args=[ticket.ticket_number]), None),
+            ('ticket_messages', 'get', reverse('ticket_messages', args=[ticket.ticket_number]),
+             {'before': self.newest_message.pk}),
+            ('archive_list', 'get', reverse('archive_list'), None),
+            ('archived_ticket', 'get', reverse('archived_ticket', args=[self.archived.ticket_number]), None),
+            ('asset_list', 'get', reverse('asset_list'), None),
+            ('asset_create', 'get', reverse('asset_create'), None),
+            ('asset_detail', 'get', reverse('asset_detail', args=[asset.inventory_number]), None),
+            ('asset_update', 'get', reverse('asset_update', args=[asset.inventory_number]), None),
+            ('asset_delete', 'get', reverse('asset_delete', args=[asset.inventory_number]), None),
+            ('manage_users', 'get', reverse('manage_users'), None),
+            ('add_technician', 'get', reverse('add_technician'), None),
+            ('add_system_manager', 'get', reverse('add_system_manager'), None),
+            ('toggle_user_active', 'get', reverse('toggle_user_active', args=[self.toggled.pk]), None),
+            ('delete_user', 'get', reverse('delete_user', args=[self.technician.pk]), None),
+            ('rebalance_workload', 'get', reverse('rebalance_workload', args=[self.technician.pk]), None),
+            ('technician_skills', 'get', reverse('technician_skills', args=[self.technician.pk]), None),
+            ('manage_settings', 'get', reverse('manage_settings'), None),
+            ('manage_catalog', 'get', reverse('manage_catalog'), None),
+        ]
+
+
+class Measurement:
+    def __init__(self, status, queries, milliseconds, recorder):
+        self.status = status
+        self.queries = queries
+        self.milliseconds = milliseconds
+        self.recorder = recorder
+
+
+def measure(probes):
+    """{(case, role): Measurement} with the most queries and the best time of TIMED_RUNS."""
+    users = {'anonymous': None, 'technician': probes.technician, 'manager': probes.manager}
+    results = {}
+    for name, method, url, data in probes.cases():
+        for role in ROLES:
+            client = Client()
+            worst, best = None, None
+            for run in range(TIMED_RUNS + 1):  # The first warms caches up
+                if users[role]:
+                    client.force_login(users[role])  # Again, in case the request signed out
+                with QueryRecorder() as recorder:
+                    start = time.perf_counter()
+                    response = getattr(client, method)(url, data)
+                    elapsed = (time.perf_counter() - start) * 1000
+                if run == 0:
+                    continue
+                if worst is None or len(recorder) > len(worst.recorder):
+                    worst = Measurement(response.status_code, len(recorder), elapsed, recorder)
+                best = elapsed if best is None else min(best, elapsed)
+            worst.milliseconds = best
+            results[name, role] = worst
+    return results
+
+
+# The catalog's periodic version check would land in a random request
+@override_settings(
+    THROTTLE_ENABLED=False, AUTH_USER_CACHE_SECONDS=300, TICKET_CATALOG_CHECK_SECONDS=3600, SLOW_QUERY_MS=None,
+)
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.media = tempfile.mkdtemp(prefix='helpdesk-budget-')
+        media = override_settings(MEDIA_ROOT=cls.media)
+        media.enable()
+        try:
+            catalog.clear()
+            Settings.objects.create()
+            technician = User.objects.create_user(
+                'budget-tech', 'budget-tech@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN,
+                first_name='Budget', last_name='Technician',
+            )
+            manager = User.objects.create_user(
+                'budget-manager', 'budget-manager@etsu.edu', 'pw', user_type=User.UserType.SYSTEM_MANAGER,
+            )
+            cls.results = {}
+            seeded = 0
+            for size in SIZES:
+                seed(tickets=size - seeded, technicians=3, random_seed=size)
+                seeded = size
+                cls.results[size] = measure(Probes(size, technician, manager))
+        finally:
+            media.disable()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        catalog.clear()
+        shutil.rmtree(cls.media, ignore_errors=True)
+
+    def test_every_url_has_a_budget(self):
+        cases = {name.split(':')[0] for name in BUDGETS}
+        self.assertEqual(app_url_names() - cases, set(), 'URLs without a query budget')
+        self.assertEqual(cases - app_url_names(), set(), 'Budgets for URLs that no longer exist')
+
+    def test_pages_respond(self):
+        for (name, role), result in self.results[SIZES[-1]].items():
+            with self.subTest(name, role=role):
+                self.assertLess(result.status, 400 if role != 'anonymous' else 500)
+
+    def test_query_budgets(self):
+        for size, results in self.results.items():
+            for (name, role), result in results.items():
+                with self.subTest(name, role=role, size=size):
+                    budget = BUDGETS[name][0]
+                    self.assertLessEqual(
+                        result.queries, budget,
+                        f'{name} as {role} ran {result.queries} queries, over its budget of {budget}:\n'
+                        f'{result.recorder.report()}',
+                    )
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small, large = (self.results[size] for size in SIZES)
+        for (name, role), result in large.items():
+            with self.subTest(name, role=role):
+                before = small[name, role]
+                self.assertEqual(
+                    result.queries, before.queries,
+                    f'{name} as {role} ran {before.queries} queries with {SIZES[0]} tickets '
+                    f'and {result.queries} with {SIZES[-1]}:\n{result.recorder.report()}',
+                )
+
+    @unittest.skipUnless(TIME_BUDGET_FACTOR, 'set HELPDESK_TIME_BUDGETS to check wall-clock budgets')
+    def test_time_budgets(self):
+        for (name, role), result in self.results[SIZES[-1]].items():
+            with self.subTest(name, role=role):
+                budget = BUDGETS[name][1] * TIME_BUDGET_FACTOR
+                self.assertLessEqual(
+                    result.milliseconds, budget,
+                    f'{name} as {role} took {result.milliseconds:.0f} ms, over its budget of {budget:.0f} ms:\n'
+                    f'{result.recorder.report()}',
+                )
+
+
+@override_settings(THROTTLE_ENABLED=False)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix='helpdesk-profiles-')
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        profiles = override_settings(PROFILE_DIR=directory, PROFILE_KEEP=2)
+        profiles.enable()
+        self.addCleanup(profiles.disable)
+        self.directory = directory
+        Settings.objects.create()
+        self.manager = User.objects.create_user(
+            'profile-manager', 'profile-manager@etsu.edu', 'pw', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        self.technician = User.objects.create_user(
+            'profile-tech', 'profile-tech@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN,
+        )
+
+    def test_manager_profiles_a_request(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('technician_dashboard'), {'profile': '1', 'status': 'NEW'})
+        self.assertEqual(response.status_code, 200)
+        [profile_id] = profiling.list_profile_ids()
+        self.assertEqual(response['X-Profile'], reverse('profile_detail', args=[profile_id]))
+        summary = profiling.load_summary(profile_id)
+        self.assertEqual(summary['view'], 'technician_dashboard')
+        self.assertEqual(summary['path'], '/dashboard/?profile=1&status=NEW')
+        self.assertEqual(summary['user'], 'profile-manager')
+
+        response = self.client.get(reverse('profile_detail', args=[profile_id]), {'search': 'views_technician'})
+        self.assertContains(response, 'tickets/views_technician.py')
+        self.assertContains(response, 'flame-bar')
+        self.assertContains(self.client.get(reverse('profile_list')), reverse('profile_detail', args=[profile_id]))
+        download = self.client.get(reverse('profile_download', args=[profile_id]))
+        self.assertEqual(download.status_code, 200)
+        download.close()
+
+    def test_header_also_triggers(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('technician_dashboard'), headers={'X-Profile': '1'})
+        self.assertIn('X-Profile', response)
+
+    def test_only_system_managers_are_profiled(self):
+        self.client.force_login(self.technician)
+        response = self.client.get(reverse('technician_dashboard'), {'profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(profiling.list_profile_ids(), [])
+        self.assertEqual(self.client.get(reverse('profile_list')).status_code, 302)
+
+        self.client.logout()
+        self.client.get(reverse('submit_ticket'), {'profile': '1'})
+        self.assertEqual(profiling.list_profile_ids(), [])
+
+    def test_only_the_newest_are_kept(self):
+        self.client.force_login(self.manager)
+        for _ in range(3):
+            self.client.get(reverse('technician_dashboard'), {'profile': '1'})
+        self.assertEqual(len(profiling.list_profile_ids()), 2)
+        self.assertEqual(len(os.listdir(self.directory)), 4)  # .prof and .json each
+
+    def test_delete_and_unknown_profiles(self):
+        self.client.force_login(self.manager)
+        self.client.get(reverse('technician_dashboard'), {'profile': '1'})
+        [profile_id] = profiling.list_profile_ids()
+        self.client.post(reverse('profile_delete', args=[profile_id]))
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(self.client.get(reverse('profile_detail', args=[profile_id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('profile_detail', args=['..%2Fsettings'])).status_code, 404)
+
+
+@override_settings(THROTTLE_ENABLED=False, SLOW_QUERY_MS=0)
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        Settings.objects.create()
+        self.manager = User.objects.create_user(
+            'slow-manager', 'slow-manager@etsu.edu', 'pw', user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        self.technician = User.objects.create_user(
+            'slow-tech', 'slow-tech@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN,
+        )
+        Ticket.objects.create(
+            requestor_email='slow@etsu.edu', requestor_name='Slow Requestor', title='Slow projector',
+            description='It takes a while to warm up.', type='INC', subtype='LAB', item='projector',
+            assigned_to=self.technician,
+        )
+
+    def get(self, user, url):
+        self.client.force_login(user)
+        with self.assertLogs('monitoring.slow_queries', 'WARNING') as logs:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_queries_are_logged_with_origin_and_plan(self):
+        logged = self.get(self.technician, reverse('technician_dashboard'))
+        records = list(SlowQuery.objects.filter(view='technician_dashboard'))
+        self.assertEqual(len(records), len(logged))
+        self.assertEqual({entry['fingerprint'] for entry in logged}, {record.fingerprint for record in records})
+
+        listed = [record for record in records if record.template.startswith('tickets/technician/dashboard.html:')]
+        self.assertTrue(listed)
+        self.assertTrue(all(record.origin.startswith('tickets/views_technician.py:') for record in listed))
+        self.assertIn('tickets_ticket', listed[0].plan)
+        self.assertIn(str(self.technician.pk), listed[0].params)
+        self.assertTrue(any(record.origin.startswith('accounts/') for record in records))
+
+    def test_off_without_a_threshold(self):
+        self.client.force_login(self.technician)
+        with self.settings(SLOW_QUERY_MS=None), self.assertNoLogs('monitoring.slow_queries'):
+            self.client.get(reverse('technician_dashboard'))
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_only_the_newest_are_kept(self):
+        with self.settings(SLOW_QUERY_KEEP=3):
+            self.get(self.technician, reverse('technician_dashboard'))
+        self.assertEqual(SlowQuery.objects.count(), 3)
+
+    def test_fingerprints_group_query_shapes(self):
+        self.assertEqual(
+            slow_queries.fingerprint('SELECT * FROM "t" WHERE "id" IN (%s, %s) AND "n" = 5'),
+            slow_queries.fingerprint('SELECT  *  FROM "t" WHERE "id" IN (%s, %s, %s) AND "n" = 12'),
+        )
+        self.assertNotEqual(
+            slow_queries.fingerprint('SELECT * FROM "t" WHERE "id" = %s'),
+            slow_queries.fingerprint('SELECT * FROM "u" WHERE "id" = %s'),
+        )
+        self.get(self.technician, reverse('technician_dashboard'))
+        self.get(self.technician, reverse('technician_dashboard'))
+        SlowQuery.objects.update(duration_ms=10)
+        SlowQuery.objects.filter(pk=SlowQuery.objects.latest('pk').pk).update(duration_ms=50)
+        rows = slow_queries.fingerprint_summary(SlowQuery.objects.all())
+        self.assertEqual(rows[0]['count'], 2)
+        self.assertEqual((rows[0]['total_ms'], rows[0]['p95_ms'], rows[0]['max_ms']), (60, 50, 50))
+
+    def test_manager_pages(self):
+        self.get(self.technician, reverse('technician_dashboard'))
+        fingerprint = SlowQuery.objects.filter(view='technician_dashboard').first().fingerprint
+        self.client.force_login(self.manager)
+        with self.settings(SLOW_QUERY_MS=None):
+            response = self.client.get(reverse('slow_query_list'), {'view': 'technician_dashboard'})
+            self.assertContains(response, reverse('slow_query_detail', args=[fingerprint]))
+            self.assertContains(self.client.get(reverse('slow_query_detail', args=[fingerprint])), 'Plan')
+            self.assertEqual(self.client.get(reverse('slow_query_detail', args=['0' * 16])).status_code, 404)
+            self.client.post(reverse('slow_query_list'))
+            self.assertFalse(SlowQuery.objects.exists())
+
+            self.client.force_login(self.technician)
+            self.assertEqual(self.client.get(reverse('slow_query_list')).status_code, 302)
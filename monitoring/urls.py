@@ -0,0 +1,12 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics', views.metrics_view, name='metrics'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:profile_id>/', views.profile_detail, name='profile_detail'),
+    path('profiles/<str:profile_id>/download/', views.profile_download, name='profile_download'),
+    path('profiles/<str:profile_id>/delete/', views.profile_delete, name='profile_delete'),
+    path('slow-queries/', views.slow_query_list, name='slow_query_list'),
+    path('slow-queries/<str:fingerprint>/', views.slow_query_detail, name='slow_query_detail'),
+]
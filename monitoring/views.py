@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.paginator import Paginator
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from accounts.permissions import is_system_manager
+
+from . import profiling, slow_queries
+from .metrics import registry
+from .models import SlowQuery
+
+
+def _client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def metrics_view(request):
+    """Prometheus text exposition of the in-process request metrics."""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if _client_ip(request) not in allowed_ips and not is_system_manager(request.user):
+        return HttpResponseForbidden('Metrics are only available to allowed hosts.')
+
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+@user_passes_test(is_system_manager)
+def profile_list(request):
+    """Saved request profiles, newest first"""
+    return render(request, 'monitoring/profile_list.html', {
+        'profiles': [profiling.load_summary(profile_id) for profile_id in profiling.list_profile_ids()],
+        'keep': getattr(settings, 'PROFILE_KEEP', 50),
+    })
+
+
+@login_required
+@user_passes_test(is_system_manager)
+def profile_detail(request, profile_id):
+    """A saved profile as a flame graph and a sorted call table"""
+    try:
+        stats = profiling.load_stats(profile_id)
+    except FileNotFoundError:
+        raise Http404('No such profile')
+    sort = request.GET.get('sort')
+    if sort not in profiling.SORT_KEYS:
+        sort = 'cumulative'
+    search = request.GET.get('search', '')
+    return render(request, 'monitoring/profile_detail.html', {
+        'summary': profiling.load_summary(profile_id),
+        'flame_rows': profiling.flame_graph(stats),
+        'calls': profiling.call_table(stats, sort, search),
+        'total_ms': stats.total_tt * 1000,
+        'sort': sort,
+        'sort_keys': profiling.SORT_KEYS,
+        'search': search,
+    })
+
+
+@login_required
+@user_passes_test(is_system_manager)
+def profile_download(request, profile_id):
+    """The raw .prof file, for pstats, snakeviz and the like"""
+    try:
+        return FileResponse(open(profiling.profile_path(profile_id), 'rb'), as_attachment=True)
+    except FileNotFoundError:
+        raise Http404('No such profile')
+
+
+@login_required
+@user_passes_test(is_system_manager)
+@require_POST
+def profile_delete(request, profile_id):
+    profiling.delete_profile(profile_id)
+    messages.success(request, 'Profile deleted.')
+    return redirect('profile_list')
+
+
+@login_required
+@user_passes_test(is_system_manager)
+def slow_query_list(request):
+    """Slow queries grouped by fingerprint, the most time spent first"""
+    if request.method == 'POST':
+        SlowQuery.objects.all().delete()
+        messages.success(request, 'Slow query log cleared.')
+        return redirect('slow_query_list')
+
+    records = SlowQuery.objects.all()
+    view_filter = request.GET.get('view', '')
+    if view_filter:
+        records = records.filter(view=view_filter)
+    return render(request, 'monitoring/slow_query_list.html', {
+        'fingerprints': slow_queries.fingerprint_summary(records),
+        'views': SlowQuery.objects.order_by('view').values_list('view', flat=True).distinct(),
+        'view_filter': view_filter,
+        'threshold_ms': getattr(settings, 'SLOW_QUERY_MS', None),
+        'keep': getattr(settings, 'SLOW_QUERY_KEEP', 5000),
+    })
+
+
+@login_required
+@user_passes_test(is_system_manager)
+def slow_query_detail(request, fingerprint):
+    """Every logged run of one query shape, with origins and plans"""
+    records = SlowQuery.objects.filter(fingerprint=fingerprint).order_by('-pk')
+    summary = slow_queries.fingerprint_summary(records)
+    if not summary:
+        raise Http404('No such query')
+    page_obj = Paginator(records, 20).get_page(request.GET.get('page'))
+    return render(request, 'monitoring/slow_query_detail.html', {'summary': summary[0], 'page_obj': page_obj})
@@ -0,0 +1,64 @@
+// Inventory number typeahead for inputs with data-asset-lookup (assets/lookup.py)
+document.addEventListener('DOMContentLoaded', function() {
+    const DEBOUNCE_MS = 150;
+    const MIN_LENGTH = 2;
+
+    document.querySelectorAll('input[data-asset-lookup]').forEach(function(input, index) {
+        const datalist = document.createElement('datalist');
+        datalist.id = (input.id || 'asset-lookup-' + index) + '-options';
+        input.insertAdjacentElement('afterend', datalist);
+        input.setAttribute('list', datalist.id);
+
+        const assetTypeField = input.form ? input.form.querySelector('select[name="asset_type"]') : null;
+        let results = [];
+        let timer = null;
+        let controller = null;
+
+        function showResults(data) {
+            results = data.results;
+            datalist.innerHTML = '';
+            results.forEach(function(asset) {
+                const label = asset.name ? asset.name + (asset.location ? ' (' + asset.location + ')' : '') : '';
+                datalist.appendChild(new Option(label, asset.inventory_number));
+            });
+        }
+
+        function lookup() {
+            const query = input.value.trim();
+            if (controller) {
+                controller.abort();
+            }
+            if (query.length < MIN_LENGTH) {
+                showResults({results: []});
+                return;
+            }
+            controller = new AbortController();
+            const url = input.dataset.assetLookup + '?q=' + encodeURIComponent(query);
+            fetch(url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin', signal: controller.signal})
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(showResults)
+                .catch(function(error) {
+                    if (error.name !== 'AbortError') {
+                        showResults({results: []});
+                    }
+                });
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(lookup, DEBOUNCE_MS);
+
+            // Picking a suggestion also fills in its asset type
+            const picked = results.find(function(asset) { return asset.inventory_number === input.value; });
+            if (picked && assetTypeField && !assetTypeField.disabled) {
+                assetTypeField.value = picked.type;
+                assetTypeField.dispatchEvent(new Event('change'));
+            }
+        });
+    });
+});
@@ -0,0 +1,41 @@
+// "Load earlier messages" for ticket threads (templates/tickets/includes/message_thread.html)
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.message-thread').forEach(function(thread) {
+        const container = thread.querySelector('.load-earlier');
+        if (!container) {
+            return;
+        }
+        const button = container.querySelector('button');
+        const list = thread.querySelector('.message-list');
+
+        button.addEventListener('click', function() {
+            button.disabled = true;
+            const url = thread.dataset.messagesUrl + '?before=' + encodeURIComponent(button.dataset.before);
+            fetch(url, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function(data) {
+                    // Keep the messages that were on screen in the same place
+                    const previousHeight = thread.scrollHeight;
+                    if (data.html.trim()) {
+                        list.insertAdjacentHTML('afterbegin', data.html + '<hr>');
+                    }
+                    thread.scrollTop += thread.scrollHeight - previousHeight;
+
+                    if (data.has_earlier) {
+                        button.dataset.before = data.before;
+                        button.disabled = false;
+                    } else {
+                        container.remove();
+                    }
+                })
+                .catch(function() {
+                    button.disabled = false;
+                });
+        });
+    });
+});
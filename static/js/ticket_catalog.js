@@ -0,0 +1,37 @@
+// Item dropdown that follows the subtype, for selects with data-catalog (tickets/catalog.py)
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('select[data-catalog]').forEach(function(subtypeSelect) {
+        const itemSelect = subtypeSelect.form ? subtypeSelect.form.querySelector('select[name="item"]') : null;
+        if (!itemSelect) {
+            return;
+        }
+        let items = null;
+
+        function updateItemChoices() {
+            // Keep the chosen item (e.g. after a validation error) when the new subtype has it
+            const current = itemSelect.value;
+            itemSelect.innerHTML = '<option value="">Select an item...</option>';
+            (items[subtypeSelect.value] || []).forEach(function([value, label]) {
+                itemSelect.add(new Option(label, value, false, value === current));
+            });
+            itemSelect.disabled = !subtypeSelect.value;
+        }
+
+        // The URL carries the catalog version, so browsers keep the answer until it changes
+        fetch(subtypeSelect.dataset.catalog, {headers: {'Accept': 'application/json'}, credentials: 'same-origin'})
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error('HTTP ' + response.status);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                items = data.items;
+                updateItemChoices();
+                subtypeSelect.addEventListener('change', updateItemChoices);
+            })
+            .catch(function() {
+                // The server-rendered list of every item stays usable
+            });
+    });
+});
@@ -0,0 +1,130 @@
+"""
+Moves old closed tickets out of the hot Ticket table.
+
+Dashboard queries, searches and status counts all run against Ticket, so
+years of closed tickets slow down every page. archive_closed_tickets copies
+them, with their messages, attachment metadata and asset links, into the
+Archived* tables and deletes the originals, one batch per transaction.
+Attachment files stay where they are; only the rows move.
+
+A ticket merged into another (see tickets/merge.py) has no thread of its
+own, and its link shows the target's. It stays hot as long as its target
+does and is archived in the same batch, with a copy of the part of the
+target's thread its requestor could see.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedTicket, ArchivedTicketAttachment, ArchivedTicketMessage,
+    Ticket, TicketAttachment, TicketMessage, TicketStatus,
+)
+
+TICKET_FIELDS = [
+    'ticket_number', 'access_code', 'time_created', 'requestor_email', 'requestor_phone',
+    'requestor_name', 'title', 'description', 'type', 'subtype', 'item', 'category',
+    'subcategory', 'status', 'assigned_to_id',
+]
+MESSAGE_FIELDS = ['sender_id', 'sender_email', 'content', 'created_at', 'is_from_requestor']
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.TICKET_ARCHIVE_AFTER_DAYS
+    return timezone.now() - datetime.timedelta(days=days)
+
+
+def archivable_tickets(cutoff):
+    """
+    Closed tickets with no activity (creation or messages) since the cutoff.
+    Merged tickets go by their target's activity instead, and a target waits
+    while any ticket merged into it has been reopened.
+    """
+    reopened = Ticket.objects.exclude(status=TicketStatus.CLOSED)
+    return Ticket.objects.filter(status=TicketStatus.CLOSED).filter(
+        Q(merged_into__isnull=True, last_activity_at__lt=cutoff)
+        & ~Exists(reopened.filter(merged_into=OuterRef('pk')))
+        | Q(merged_into__status=TicketStatus.CLOSED, merged_into__last_activity_at__lt=cutoff)
+        & ~Exists(reopened.filter(merged_into=OuterRef('merged_into'))),
+    )
+
+
+def archive_batch(ticket_ids, cutoff):
+    """
+    Archive one batch of tickets in a single transaction, together with the
+    tickets merged into them and the targets of those merged. Returns the
+    number moved.
+    """
+    with transaction.atomic():
+        # Re-check inside the transaction so a ticket reopened meanwhile stays hot
+        targets = Ticket.objects.filter(id__in=ticket_ids, merged_into__isnull=False).values('merged_into')
+        tickets = list(archivable_tickets(cutoff).filter(
+            Q(id__in=ticket_ids) | Q(id__in=targets) | Q(merged_into__in=ticket_ids) | Q(merged_into__in=targets),
+        ).order_by('id'))
+        if not tickets:
+            return 0
+        hot_ids = [ticket.id for ticket in tickets]
+
+        numbers = {ticket.id: ticket.ticket_number for ticket in tickets}
+        archived = ArchivedTicket.objects.bulk_create([
+            ArchivedTicket(merged_into_number=numbers.get(ticket.merged_into_id, ''),
+                           **{field: getattr(ticket, field) for field in TICKET_FIELDS})
+            for ticket in tickets
+        ])
+        archived_ids = {ticket.id: copy.id for ticket, copy in zip(tickets, archived)}
+
+        # A merged ticket's requestor sees the support team's messages on the target and their own
+        readers = {}
+        for ticket in tickets:
+            if ticket.merged_into_id:
+                readers.setdefault(ticket.merged_into_id, []).append(ticket)
+        messages = []
+        for message in TicketMessage.objects.filter(ticket_id__in=hot_ids).order_by('id'):
+            fields = {field: getattr(message, field) for field in MESSAGE_FIELDS}
+            messages.append(ArchivedTicketMessage(ticket_id=archived_ids[message.ticket_id], **fields))
+            for source in readers.get(message.ticket_id, ()):
+                if not message.is_from_requestor or message.sender_email.lower() == source.requestor_email.lower():
+                    messages.append(ArchivedTicketMessage(ticket_id=archived_ids[source.id], **fields))
+        ArchivedTicketMessage.objects.bulk_create(messages)
+        ArchivedTicketAttachment.objects.bulk_create([
+            ArchivedTicketAttachment(ticket_id=archived_ids[attachment.ticket_id],
+                                     file=attachment.file.name, uploaded_at=attachment.uploaded_at)
+            for attachment in TicketAttachment.objects.filter(ticket_id__in=hot_ids)
+        ])
+        ArchivedTicket.assets.through.objects.bulk_create([
+            ArchivedTicket.assets.through(archivedticket_id=archived_ids[ticket_id], asset_id=asset_id)
+            for ticket_id, asset_id in Ticket.assets.through.objects.filter(
+                ticket_id__in=hot_ids).values_list('ticket_id', 'asset_id')
+        ])
+
+        # Deleting the children first keeps each delete a single statement
+        TicketMessage.objects.filter(ticket_id__in=hot_ids).delete()
+        TicketAttachment.objects.filter(ticket_id__in=hot_ids).delete()
+        Ticket.assets.through.objects.filter(ticket_id__in=hot_ids).delete()
+        Ticket.objects.filter(id__in=hot_ids).delete()
+        return len(tickets)
+
+
+def archive_closed_tickets(days=None, batch_size=500, limit=None, dry_run=False):
+    """
+    Archive closed tickets older than `days` (TICKET_ARCHIVE_AFTER_DAYS by default).
+    Yields the running total after each batch so callers can report progress.
+    """
+    cutoff = archive_cutoff(days)
+    candidates = archivable_tickets(cutoff).order_by('id').values_list('id', flat=True)
+    if limit:
+        candidates = candidates[:limit]
+    ticket_ids = list(candidates)
+    if dry_run:
+        yield len(ticket_ids)
+        return
+
+    total = 0
+    for start in range(0, len(ticket_ids), batch_size):
+        total += archive_batch(ticket_ids[start:start + batch_size], cutoff)
+        yield total
+
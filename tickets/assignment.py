@@ -0,0 +1,145 @@
+"""
+Automatic assignment of new tickets to technicians.
+
+With Settings.auto_assignment on, submit_ticket and create_ticket hand
+each new, unassigned ticket to an active technician:
+* Round robin: whoever was auto-assigned a ticket longest ago.
+* Fewest open tickets: whoever has the fewest tickets not yet resolved.
+* By skill: technicians with a TechnicianSkill for the ticket's subtype
+  and item, else for its subtype, else anyone; then fewest open tickets.
+
+Open ticket counts come from TechnicianWorkload rather than a count per
+decision. The rows are recounted with one grouped query once they are
+older than ASSIGNMENT_COUNT_MAX_AGE, and each automatic assignment bumps
+its technician's row, so tickets assigned in between are not missed.
+Tickets resolved or reassigned by hand show up at the next recount;
+bulk moves (tickets/reassignment.py) call forget_workloads to force one.
+
+Decisions are made in the caller's write transaction with the workload
+rows locked (the SQLite write lock, or SELECT ... FOR UPDATE elsewhere),
+so concurrent submissions see each other's assignments.
+
+pick_technician holds the policy itself, free of the database, so that
+simulate_assignment can replay past tickets through it.
+"""
+import datetime
+
+from django.conf import settings as django_settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from accounts.models import Settings
+
+from .models import TechnicianSkill, TechnicianWorkload, Ticket, TicketStatus
+
+Strategy = Settings.AutoAssignment
+OPEN_STATUSES = [TicketStatus.NEW, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS, TicketStatus.WAITING]
+_NEVER = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+
+
+def pick_technician(strategy, subtype, item, workloads, skills=None):
+    """
+    The id of the technician `strategy` gives a ticket to, or None.
+
+    `workloads` maps technician ids to objects with open_tickets and
+    last_assigned_at (TechnicianWorkload rows); `skills` maps them to sets
+    of (subtype, item) pairs, item '' meaning the whole subtype.
+    """
+    candidates = list(workloads)
+    if strategy == Strategy.SKILLS and skills:
+        for skill in ((subtype, item), (subtype, '')):
+            skilled = [technician for technician in candidates if skill in skills.get(technician, ())]
+            if skilled:
+                candidates = skilled
+                break
+    if not candidates:
+        return None
+
+    def last_assigned(technician):
+        return workloads[technician].last_assigned_at or _NEVER
+
+    if strategy == Strategy.ROUND_ROBIN:
+        return min(candidates, key=lambda technician: (last_assigned(technician), technician))
+    return min(candidates, key=lambda technician: (
+        workloads[technician].open_tickets, last_assigned(technician), technician,
+    ))
+
+
+def eligible_technicians():
+    User = get_user_model()
+    return User.objects.filter(is_active=True, user_type=User.UserType.TECHNICIAN)
+
+
+def technician_skills():
+    skills = {}
+    for technician_id, subtype, item in TechnicianSkill.objects.values_list('technician_id', 'subtype', 'item'):
+        skills.setdefault(technician_id, set()).add((subtype, item))
+    return skills
+
+
+def current_workloads(now=None):
+    """Locked workload rows of the eligible technicians, recounted if stale. Call in a transaction."""
+    now = now or timezone.now()
+    technician_ids = list(eligible_technicians().values_list('pk', flat=True))
+    workloads = {
+        workload.technician_id: workload
+        for workload in TechnicianWorkload.objects.select_for_update().filter(technician_id__in=technician_ids)
+    }
+    cutoff = now - datetime.timedelta(seconds=django_settings.ASSIGNMENT_COUNT_MAX_AGE)
+    if len(workloads) == len(technician_ids) and all(w.counted_at >= cutoff for w in workloads.values()):
+        return workloads
+
+    counts = dict(
+        Ticket.objects.filter(assigned_to__in=technician_ids, status__in=OPEN_STATUSES)
+        .values('assigned_to').order_by().annotate(open=Count('id')).values_list('assigned_to', 'open')
+    )
+    missing = [
+        TechnicianWorkload(technician_id=technician_id, open_tickets=counts.get(technician_id, 0), counted_at=now)
+        for technician_id in technician_ids if technician_id not in workloads
+    ]
+    TechnicianWorkload.objects.bulk_create(missing)
+    for workload in workloads.values():
+        workload.open_tickets = counts.get(workload.technician_id, 0)
+        workload.counted_at = now
+    TechnicianWorkload.objects.bulk_update(workloads.values(), ['open_tickets', 'counted_at'])
+    workloads.update((workload.technician_id, workload) for workload in missing)
+    return workloads
+
+
+def forget_workloads(technician_ids):
+    """Have the next decision recount these technicians, e.g. after tickets were moved in bulk."""
+    TechnicianWorkload.objects.filter(technician_id__in=technician_ids).update(counted_at=_NEVER)
+
+
+def auto_assign(ticket, strategy=None):
+    """
+    Assign a new, unassigned ticket with `strategy` (default:
+    Settings.auto_assignment). Returns the technician, or None.
+    """
+    if strategy is None:
+        settings = Settings.objects.first()
+        strategy = settings.auto_assignment if settings else Strategy.OFF
+    if not strategy or ticket.assigned_to_id:
+        return None
+
+    with transaction.atomic():
+        now = timezone.now()
+        workloads = current_workloads(now)
+        skills = technician_skills() if strategy == Strategy.SKILLS else None
+        technician_id = pick_technician(strategy, ticket.subtype, ticket.item, workloads, skills)
+        if technician_id is None:
+            return None
+        # Leave it alone if someone assigned it meanwhile
+        if not Ticket.objects.filter(pk=ticket.pk, assigned_to__isnull=True).update(
+            assigned_to_id=technician_id, status=TicketStatus.ASSIGNED, updated_at=now,
+        ):
+            return None
+        TechnicianWorkload.objects.filter(pk=technician_id).update(
+            open_tickets=F('open_tickets') + 1, last_assigned_at=now,
+        )
+
+    ticket.assigned_to = get_user_model().objects.get(pk=technician_id)
+    ticket.status = TicketStatus.ASSIGNED
+    return ticket.assigned_to
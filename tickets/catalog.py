@@ -0,0 +1,205 @@
+"""
+The ticket taxonomy: types, subtypes and the items within each subtype.
+
+It lives in CatalogType, CatalogSubtype and CatalogItem and is edited from
+Administration > Ticket Catalog, without a deploy. Tickets store codes,
+so a code never changes once created: labels, order and whether an entry
+is offered on the forms do. Retired entries stay, so older tickets keep
+their labels. remap_ticket_items moves tickets off renamed or merged items.
+
+Each process keeps the whole catalog in memory, built by three queries.
+Every TICKET_CATALOG_CHECK_SECONDS at most, it compares the catalog's
+version with the one stored in CatalogVersion and reloads when they
+differ. Saving or deleting an entry sets a new version from a signal, in
+the same transaction as the change, so every process sharing the database
+picks it up within the check interval and they all agree on the version.
+QuerySet.update() sends no signals: call invalidate_catalog after using it
+on the catalog.
+"""
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from helpdesk.db import run_in_write_transaction
+
+from .models import (
+    ArchivedTicket, CatalogItem, CatalogSubtype, CatalogType, CatalogVersion, TechnicianSkill, Ticket,
+)
+
+REMAP_BATCH_SIZE = 500
+
+_catalog = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+class Catalog:
+    """One version of the catalog. Read-only: it is shared by every request in the process."""
+
+    def __init__(self, version, types, subtypes, items):
+        # types and subtypes: [(code, label, active)]; items: [(subtype, code, label, active)], all in order
+        self.version = version
+        self.type_labels = {code: label for code, label, active in types}
+        self.subtype_labels = {code: label for code, label, active in subtypes}
+        self.item_labels = {(subtype, code): label for subtype, code, label, active in items}
+
+        # What the forms offer
+        self.type_choices = [(code, label) for code, label, active in types if active]
+        self.subtype_choices = [(code, label) for code, label, active in subtypes if active]
+        self.item_choices = {code: [] for code, label in self.subtype_choices}
+        for subtype, code, label, active in items:
+            if active and subtype in self.item_choices:
+                self.item_choices[subtype].append((code, label))
+        # Every offered item code once, for fields that don't know the subtype yet
+        first = {}
+        for choices in self.item_choices.values():
+            for code, label in choices:
+                first.setdefault(code, (code, label))
+        self.all_item_choices = list(first.values())
+
+        self.json = json.dumps({
+            'version': version,
+            'types': self.type_choices,
+            'subtypes': self.subtype_choices,
+            'items': self.item_choices,
+        }).encode()
+
+    def offers_item(self, subtype, item):
+        return any(code == item for code, label in self.item_choices.get(subtype, ()))
+
+
+def current_version():
+    # From the primary, like the catalog itself
+    version = CatalogVersion.objects.using(DEFAULT_DB_ALIAS).filter(pk=1).values_list('version', flat=True).first()
+    # The migrations create the row; only a flushed database lacks it
+    return version or 0
+
+
+def load_catalog(version):
+    # From the primary: a lagging replica could return old rows under the new version
+    using = DEFAULT_DB_ALIAS
+    return Catalog(
+        version,
+        list(CatalogType.objects.using(using).values_list('code', 'label', 'active')),
+        list(CatalogSubtype.objects.using(using).values_list('code', 'label', 'active')),
+        list(CatalogItem.objects.using(using).order_by('subtype__position', 'subtype__code', 'position', 'code')
+             .values_list('subtype__code', 'code', 'label', 'active')),
+    )
+
+
+def get_catalog():
+    """The current Catalog, checking for changes at most every TICKET_CATALOG_CHECK_SECONDS."""
+    global _catalog, _checked_at
+    now = time.monotonic()
+    with _lock:
+        catalog, checked_at = _catalog, _checked_at
+    if catalog is not None and now < checked_at + settings.TICKET_CATALOG_CHECK_SECONDS:
+        return catalog
+    version = current_version()
+    if catalog is None or catalog.version != version:
+        catalog = load_catalog(version)
+    with _lock:
+        _catalog, _checked_at = catalog, now
+    return catalog
+
+
+def invalidate_catalog():
+    """
+    Make every process reload the catalog on its next check once the current
+    transaction commits. A new version rather than an incremented one, so
+    one rolled back in between is never reused.
+    """
+    global _catalog
+    version = time.time_ns()
+    if not CatalogVersion.objects.filter(pk=1).update(version=version):
+        CatalogVersion.objects.create(pk=1, version=version)
+    with _lock:
+        _catalog = None
+
+
+def clear():
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def _catalog_changed(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_catalog()
+
+
+def connect_signals():
+    for model in (CatalogType, CatalogSubtype, CatalogItem):
+        post_save.connect(_catalog_changed, sender=model, dispatch_uid='ticket_catalog')
+        post_delete.connect(_catalog_changed, sender=model, dispatch_uid='ticket_catalog')
+
+
+def _matching(mapping, subtype_field='subtype', item_field='item'):
+    condition = Q(pk__in=[])
+    for subtype, item in mapping:
+        condition |= Q(**{subtype_field: subtype, item_field: item})
+    return condition
+
+
+def _remap_batch(model, mapping, after, batch_size):
+    batch = list(
+        model.objects.filter(_matching(mapping), pk__gt=after).order_by('pk').only('pk', 'subtype', 'item')[:batch_size]
+    )
+    fields = ['subtype', 'item']
+    if model is Ticket:
+        fields.append('updated_at')
+        now = timezone.now()
+    for row in batch:
+        row.subtype, row.item = mapping[row.subtype, row.item]
+        if model is Ticket:
+            row.updated_at = now
+    model.objects.bulk_update(batch, fields)
+    return batch
+
+
+def remap_ticket_items(mapping, batch_size=REMAP_BATCH_SIZE, retire=True):
+    """
+    Move tickets, archived tickets and technician skills from each
+    (subtype, item) in `mapping` to the (subtype, item) it maps to, then
+    stop offering the old items unless retire is False.
+
+    Tickets are updated batch_size at a time with bulk_update, each batch
+    in its own short write transaction, so submissions are not held up
+    behind one long one. Returns {'tickets': n, 'archived': n, 'skills': n}.
+    Every row moves once, from its original value: mappings are not chained.
+    """
+    moved = {}
+    for name, model in (('tickets', Ticket), ('archived', ArchivedTicket)):
+        moved[name] = after = 0
+        while True:
+            batch = run_in_write_transaction(_remap_batch, model, mapping, after, batch_size)
+            if not batch:
+                break
+            moved[name] += len(batch)
+            after = batch[-1].pk
+
+    def remap_skills():
+        count = 0
+        for skill in TechnicianSkill.objects.filter(_matching(mapping)).order_by('pk'):
+            subtype, item = mapping[skill.subtype, skill.item]
+            if TechnicianSkill.objects.filter(technician_id=skill.technician_id, subtype=subtype, item=item).exists():
+                skill.delete()
+            else:
+                skill.subtype, skill.item = subtype, item
+                skill.save(update_fields=['subtype', 'item'])
+            count += 1
+        if retire:
+            CatalogItem.objects.filter(_matching(mapping, 'subtype__code', 'code')).exclude(
+                _matching(mapping.values(), 'subtype__code', 'code')
+            ).update(active=False)
+            invalidate_catalog()
+        return count
+
+    moved['skills'] = run_in_write_transaction(remap_skills)
+    return moved
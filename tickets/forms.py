@@ -1,8 +1,8 @@
 from django import forms
 from django.core.validators import FileExtensionValidator
+from django.urls import reverse, reverse_lazy
 from .models import Ticket, TicketAttachment, TicketMessage
-from .choices import TicketItemChoices
-from .models import Ticket, TicketType, TicketSubType
+from .catalog import get_catalog
 from assets.models import AssetType
 
 class MultipleFileInput(forms.ClearableFileInput):
@@ -21,6 +21,21 @@ class MultipleFileField(forms.FileField):
             result = single_file_clean(data, initial)
         return result
 
+def set_catalog_choices(form):
+    """Offer the catalog's active types, subtypes and items; the subtype select says where to fetch items by subtype."""
+    catalog = get_catalog()
+    form.catalog = catalog
+    form.fields['type'].choices = [('', 'Select a type...')] + catalog.type_choices
+    form.fields['subtype'].choices = [('', 'Select a subtype...')] + catalog.subtype_choices
+    form.fields['item'].choices = [('', 'Select an item...')] + catalog.all_item_choices
+    # Versioned, so browsers can keep the catalog until it changes
+    form.fields['subtype'].widget.attrs['data-catalog'] = f"{reverse('ticket_catalog')}?v={catalog.version}"
+
+def check_catalog_item(form, cleaned_data):
+    subtype, item = cleaned_data.get('subtype'), cleaned_data.get('item')
+    if subtype and item and not form.catalog.offers_item(subtype, item):
+        form.add_error('item', 'Select an item for the chosen subtype.')
+
 class TicketSubmissionForm(forms.ModelForm):
     description = forms.CharField(
         widget=forms.Textarea(attrs={
@@ -30,20 +45,10 @@ class TicketSubmissionForm(forms.ModelForm):
         })
     )
 
-    type = forms.ChoiceField(
-        choices = [('', 'Select a type...')] + [(t.value, t.label) for t in TicketType],
-        widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'})
-    )
-
-    subtype = forms.ChoiceField(
-        choices = [('', 'Select a subtype...')] + [(t.value, t.label) for t in TicketSubType],
-        widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'})
-    )
-
-    item = forms.ChoiceField(
-        choices=[('', 'Select an item...')] + TicketItemChoices.ALL_ITEM_CHOICES,
-        widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'})
-    )
+    # Choices come from the ticket catalog, see set_catalog_choices
+    type = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'}))
+    subtype = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'}))
+    item = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control shadow-none color-666'}))
 
     attachments = MultipleFileField(
         required=False,
@@ -55,7 +60,9 @@ class TicketSubmissionForm(forms.ModelForm):
         max_length=50,
         widget=forms.TextInput(attrs={
             'class': 'form-control shadow-none color-666',
-            'placeholder': 'Optional: Enter asset inventory number if relevant'
+            'placeholder': 'Optional: Enter asset inventory number if relevant',
+            'autocomplete': 'off',
+            'data-asset-lookup': reverse_lazy('asset_lookup'),
         }),
     )
     
@@ -96,8 +103,13 @@ class TicketSubmissionForm(forms.ModelForm):
             }),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        set_catalog_choices(self)
+
     def clean(self):
         cleaned_data = super().clean()
+        check_catalog_item(self, cleaned_data)
         inventory_number = cleaned_data.get('inventory_number')
         asset_type = cleaned_data.get('asset_type')
         
@@ -129,27 +141,18 @@ class TechnicianTicketForm(forms.ModelForm):
         })
     )
 
-    type = forms.ChoiceField(
-        choices=[('', 'Select a type...')] + [(t.value, t.label) for t in TicketType],
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
-
-    subtype = forms.ChoiceField(
-        choices=[('', 'Select a subtype...')] + [(t.value, t.label) for t in TicketSubType],
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
-
-    item = forms.ChoiceField(
-        choices=[('', 'Select an item...')],
-        widget=forms.Select(attrs={'class': 'form-control'})
-    )
+    type = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control'}))
+    subtype = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control'}))
+    item = forms.ChoiceField(widget=forms.Select(attrs={'class': 'form-control'}))
 
     inventory_number = forms.CharField(
         required=False,
         max_length=50,
         widget=forms.TextInput(attrs={
             'class': 'form-control',
-            'placeholder': 'Optional: Enter asset inventory number if relevant'
+            'placeholder': 'Optional: Enter asset inventory number if relevant',
+            'autocomplete': 'off',
+            'data-asset-lookup': reverse_lazy('asset_lookup'),
         }),
         help_text='If this ticket relates to a specific asset, enter its inventory number'
     )
@@ -199,13 +202,7 @@ class TechnicianTicketForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-
-        # Get all item choices for form validation
-        all_items = []
-        for subtype_choices in TicketItemChoices.SUBTYPE_TO_ITEMS.values():
-            all_items.extend(subtype_choices)
-
-        self.fields['item'].choices = [('', 'Select an item...')] + list(set(all_items))
+        set_catalog_choices(self)
 
     def clean_requestor_email(self):
         email = self.cleaned_data.get('requestor_email')
@@ -215,6 +212,7 @@ class TechnicianTicketForm(forms.ModelForm):
 
     def clean(self):
         cleaned_data = super().clean()
+        check_catalog_item(self, cleaned_data)
         inventory_number = cleaned_data.get('inventory_number')
         asset_type = cleaned_data.get('asset_type')
 
@@ -0,0 +1,293 @@
+"""
+Replies to notification emails, read from a local mailbox into ticket threads.
+
+ingest_mailbox reads new mail from a Maildir directory or an mbox file one
+message at a time; neither is ever loaded whole. The ticket number is
+taken from the subject and quoted text is stripped from the body. Replies
+from the ticket's requestor (or the requestor of a ticket merged into it)
+become TicketMessages, and their attachments TicketAttachments, inserted
+with bulk_create one batch per transaction.
+
+Progress is checkpointed so a restart never adds a reply twice:
+* mbox: the byte offset of the next unread message is stored in
+  MailboxCheckpoint in the same transaction as the batch.
+* Maildir: read messages are moved from new/ to cur/ and marked seen once
+  their batch has committed. The email's Message-ID is stored on the
+  TicketMessage, so a message read again after a crash between the two
+  steps is recognised and skipped.
+ingest_mail should be the only reader of the mailbox; a mail client
+marking messages read would hide them from it.
+"""
+import email.utils
+import html
+import os
+import re
+from collections import Counter
+from email import policy
+from email.parser import BytesFeedParser, BytesParser
+
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils.html import strip_tags
+from django.utils.text import get_valid_filename
+
+from helpdesk.db import run_in_write_transaction
+
+from . import similarity
+from .models import MailboxCheckpoint, Ticket, TicketAttachment, TicketMessage, record_new_messages
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+BATCH_SIZE = 200
+# Same limit as attachments uploaded through the submission form
+MAX_ATTACHMENT_SIZE = 5 * 1024 * 1024
+
+# Ticket numbers look like 2025-1042; the look-arounds skip dates such as 2025-10-19
+TICKET_NUMBER = re.compile(r'(?<![\d-])(\d{4}-\d{4,})(?![\d-])')
+# Lines where a mail client starts quoting the message being replied to
+QUOTE_HEADERS = [
+    re.compile(r'^On .*wrote:$'),
+    re.compile(r'^-+\s*Original Message\s*-+$', re.IGNORECASE),
+    re.compile(r'^_{10,}$'),
+]
+SIGNATURE_DELIMITER = '-- '
+
+
+class InboundMail:
+    """One email, parsed and reduced to what a TicketMessage needs."""
+
+    def __init__(self, message_id, ticket_number, sender, content, attachments, automatic):
+        self.message_id = message_id
+        self.ticket_number = ticket_number
+        self.sender = sender
+        self.content = content
+        self.attachments = attachments  # [(filename, bytes)]
+        self.automatic = automatic
+
+
+def strip_quoted(text):
+    """The new part of a reply: everything above the quoted message, less quote lines and signature."""
+    lines = text.replace('\r\n', '\n').split('\n')
+    kept = []
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        following = lines[i + 1].strip() if i + 1 < len(lines) else ''
+        if (
+            line == SIGNATURE_DELIMITER
+            or any(pattern.match(stripped) for pattern in QUOTE_HEADERS)
+            # "On <date>, <name>" wrapped before "wrote:"
+            or (stripped.startswith('On ') and following.endswith('wrote:'))
+            # Outlook's header block
+            or (stripped.startswith('From: ') and following.split(':')[0] in ('Sent', 'Date'))
+        ):
+            break
+        if not stripped.startswith('>'):
+            kept.append(line.rstrip())
+    return '\n'.join(kept).strip()
+
+
+def parse_mail(message, fallback_id):
+    """Reduce an email.message.EmailMessage to an InboundMail."""
+    message_id = (message.get('Message-ID') or '').strip() or fallback_id
+    subject = str(message.get('Subject') or '')
+    match = TICKET_NUMBER.search(subject)
+    sender = email.utils.parseaddr(str(message.get('From') or ''))[1].lower()
+    auto_submitted = str(message.get('Auto-Submitted') or 'no').lower()
+    precedence = str(message.get('Precedence') or '').lower()
+
+    content = ''
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is not None:
+        try:
+            content = body.get_content()
+        except (LookupError, UnicodeError):
+            content = body.get_payload(decode=True).decode('utf-8', 'replace')
+        if body.get_content_subtype() == 'html':
+            content = html.unescape(strip_tags(content))
+        content = strip_quoted(content)
+
+    attachments = []
+    for part in message.iter_attachments():
+        filename = part.get_filename()
+        payload = part.get_payload(decode=True)
+        if filename and payload and len(payload) <= MAX_ATTACHMENT_SIZE:
+            attachments.append((get_valid_filename(os.path.basename(filename)) or 'attachment', payload))
+
+    return InboundMail(
+        message_id=message_id[:255],
+        ticket_number=match.group(1) if match else None,
+        sender=sender,
+        content=content,
+        attachments=attachments,
+        automatic=auto_submitted != 'no' or precedence in ('bulk', 'junk', 'list', 'auto_reply'),
+    )
+
+
+def _store_batch(mails, checkpoint, position=None):
+    """Add one batch of parsed mails to their tickets. Runs in a write transaction."""
+    batch = Counter(read=len(mails))
+    seen = set(TicketMessage.objects.filter(
+        email_message_id__in=[mail.message_id for mail in mails],
+    ).values_list('email_message_id', flat=True))
+    tickets = {
+        ticket.ticket_number: ticket
+        for ticket in Ticket.objects.filter(
+            ticket_number__in={mail.ticket_number for mail in mails if mail.ticket_number},
+        ).select_related('merged_into')
+    }
+    # Requestors of merged tickets may reply to the ticket they were merged into
+    requestors = {}
+    for ticket in tickets.values():
+        target = ticket.merged_into or ticket
+        requestors.setdefault(target.pk, {target.requestor_email.lower()}).add(ticket.requestor_email.lower())
+    for target_id, requestor_email in Ticket.objects.filter(
+        merged_into__in=list(requestors),
+    ).values_list('merged_into_id', 'requestor_email'):
+        requestors[target_id].add(requestor_email.lower())
+
+    new_messages, attachments = [], []
+    for mail in mails:
+        ticket = tickets.get(mail.ticket_number)
+        if mail.message_id in seen:
+            batch['duplicate'] += 1
+        elif mail.automatic:
+            batch['automatic'] += 1
+        elif ticket is None:
+            batch['unmatched'] += 1
+        elif mail.sender not in requestors[(ticket.merged_into or ticket).pk]:
+            batch['rejected'] += 1
+        elif not mail.content and not mail.attachments:
+            batch['empty'] += 1
+        else:
+            seen.add(mail.message_id)
+            target = ticket.merged_into or ticket
+            content = mail.content or 'Sent attachments: ' + ', '.join(name for name, data in mail.attachments)
+            new_messages.append(TicketMessage(
+                ticket=target, sender_email=mail.sender, content=content,
+                is_from_requestor=True, email_message_id=mail.message_id,
+            ))
+            attachments.extend(
+                TicketAttachment(ticket=target, file=ContentFile(data, name=name))
+                for name, data in mail.attachments
+            )
+
+    if new_messages:
+        TicketMessage.objects.bulk_create(new_messages)
+        latest = {}
+        for message in new_messages:
+            count, created_at = latest.get(message.ticket_id, (0, message.created_at))
+            latest[message.ticket_id] = (count + 1, max(created_at, message.created_at))
+        for ticket_id, (count, created_at) in latest.items():
+            record_new_messages(ticket_id, count, created_at, from_requestor=True)
+        similarity.add_messages(new_messages)
+        # FileField.pre_save writes each file to storage during the insert
+        TicketAttachment.objects.bulk_create(attachments)
+    batch['added'] = len(new_messages)
+    batch['attachments'] = len(attachments)
+
+    updates = {'messages_read': F('messages_read') + len(mails), 'messages_added': F('messages_added') + len(new_messages)}
+    if position is not None:
+        updates['offset'], updates['inode'] = position
+    MailboxCheckpoint.objects.filter(pk=checkpoint.pk).update(**updates)
+    return batch
+
+
+def _maildir_messages(path):
+    """(filename, parsed message) for each file in the Maildir's new/ directory, oldest first."""
+    new = os.path.join(path, 'new')
+    for name in sorted(entry.name for entry in os.scandir(new) if entry.is_file() and not entry.name.startswith('.')):
+        try:
+            with open(os.path.join(new, name), 'rb') as fp:
+                message = BytesParser(policy=policy.default).parse(fp)
+        except FileNotFoundError:
+            continue  # Taken by another reader
+        yield name, message
+
+
+def _mark_seen(path, names):
+    for name in names:
+        unique = name.split(':')[0]
+        try:
+            os.rename(os.path.join(path, 'new', name), os.path.join(path, 'cur', unique + ':2,S'))
+        except FileNotFoundError:
+            pass
+
+
+def _ingest_maildir(path, checkpoint, batch_size):
+    stats = Counter()
+    names, mails = [], []
+    for name, message in _maildir_messages(path):
+        names.append(name)
+        mails.append(parse_mail(message, f'<maildir.{name.split(":")[0]}@helpdesk>'))
+        if len(mails) >= batch_size:
+            stats += run_in_write_transaction(_store_batch, mails, checkpoint)
+            _mark_seen(path, names)
+            names, mails = [], []
+            yield stats
+    if mails:
+        stats += run_in_write_transaction(_store_batch, mails, checkpoint)
+        _mark_seen(path, names)
+        yield stats
+
+
+def _mbox_messages(fp, offset):
+    """
+    Stream-parse an mbox file from `offset`, yielding (end offset, parsed
+    message). A message is only yielded once the blank line that ends it
+    has been written, so one being delivered right now is left for later.
+    """
+    fp.seek(offset)
+    parser = None
+    position = offset
+    previous_blank = True
+    for line in fp:
+        if line.startswith(b'From ') and previous_blank:
+            if parser is not None:
+                yield position, parser.close()
+            parser = BytesFeedParser(policy=policy.default)
+        elif parser is not None:
+            # mboxrd escapes body lines starting with "From " as ">From "
+            parser.feed(line[1:] if re.match(rb'>+From ', line) else line)
+        previous_blank = line in (b'\n', b'\r\n')
+        position += len(line)
+    if parser is not None and previous_blank:
+        yield position, parser.close()
+
+
+def _ingest_mbox(path, checkpoint, batch_size):
+    stats = Counter()
+    with open(path, 'rb') as fp:
+        if fcntl is not None:
+            # Delivery agents lock the mbox while appending to it
+            fcntl.flock(fp, fcntl.LOCK_SH)
+        inode = os.fstat(fp.fileno()).st_ino
+        offset = checkpoint.offset
+        if checkpoint.inode != inode or os.fstat(fp.fileno()).st_size < offset:
+            offset = 0  # Rotated or truncated: start over (Message-IDs catch repeats)
+
+        mails = []
+        for end, message in _mbox_messages(fp, offset):
+            mails.append(parse_mail(message, f'<mbox.{inode}.{end}@helpdesk>'))
+            if len(mails) >= batch_size:
+                stats += run_in_write_transaction(_store_batch, mails, checkpoint, (end, inode))
+                mails = []
+                yield stats
+        if mails:
+            stats += run_in_write_transaction(_store_batch, mails, checkpoint, (end, inode))
+            yield stats
+
+
+def ingest_mailbox(path, batch_size=BATCH_SIZE):
+    """
+    Add new replies from a Maildir directory or mbox file to their tickets.
+    Yields running totals (a Counter: read, added, attachments, duplicate,
+    automatic, unmatched, rejected, empty) after each batch.
+    """
+    path = os.path.abspath(path)
+    checkpoint, created = MailboxCheckpoint.objects.get_or_create(path=path)
+    if os.path.isdir(path):
+        return _ingest_maildir(path, checkpoint, batch_size)
+    return _ingest_mbox(path, checkpoint, batch_size)
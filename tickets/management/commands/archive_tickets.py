@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tickets.archive import archive_closed_tickets
+
+
+class Command(BaseCommand):
+    help = 'Moves closed tickets older than TICKET_ARCHIVE_AFTER_DAYS into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.TICKET_ARCHIVE_AFTER_DAYS,
+            help=f'Archive closed tickets with no activity for this many days '
+                 f'(default: {settings.TICKET_ARCHIVE_AFTER_DAYS})',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Tickets per transaction (default: 500)')
+        parser.add_argument('--limit', type=int, help='Archive at most this many tickets')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the tickets that would be archived')
+
+    def handle(self, *args, **options):
+        progress = archive_closed_tickets(
+            days=options['days'],
+            batch_size=options['batch_size'],
+            limit=options['limit'],
+            dry_run=options['dry_run'],
+        )
+        if options['dry_run']:
+            self.stdout.write(f'{next(progress)} tickets would be archived')
+            return
+
+        total = 0
+        for total in progress:
+            self.stdout.write(f'Archived {total} tickets...')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} closed tickets'))
@@ -0,0 +1,115 @@
+import random
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from accounts.models import User
+from assets import lookup
+from assets.models import Asset, AssetType
+from assets.views import asset_lookup
+
+PREFIXES = ['ETSU-', 'CS-', 'LAB-', 'AV-', 'NET-']
+MODELS = ['Dell OptiPlex 7090', 'HP LaserJet M404', 'Epson PowerLite', 'Cisco Catalyst 9300', 'Dell P2422H']
+
+
+class Command(BaseCommand):
+    help = 'Times the inventory number typeahead (assets.lookup) against a throwaway database of many assets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--assets', type=int, default=100_000, help='Assets to create (default: 100000)')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups per phase (default: 500)')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        for alias in connections:
+            test_settings = connections[alias].settings_dict.setdefault('TEST', {})
+            if connections[alias].vendor == 'sqlite' and not test_settings.get('NAME'):
+                # Measure a file on disk, as in production, not an in-memory database
+                test_settings['NAME'] = tempfile.mktemp(prefix=f'helpdesk-lookup-{alias}-', suffix='.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            rng = random.Random(options['seed'])
+            numbers = self._create_assets(options['assets'])
+            queries = self._queries(rng, numbers, options['lookups'])
+            staff = User.objects.create_user(username='lookup-bench', password=None, department='IT')
+
+            self.stdout.write(f'{"Phase":<18} {"Median ms":>10} {"p95 ms":>8} {"Max ms":>8} {"Avg results":>12}')
+            for name, user, warm in (
+                ('public, cold', AnonymousUser(), False),
+                ('staff, cold', staff, False),
+                ('staff, warm', staff, True),
+            ):
+                self._report(name, self._time(queries, user, warm))
+        finally:
+            connections.close_all()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def _create_assets(self, count):
+        types = [t.value for t in AssetType]
+        numbers = [f'{PREFIXES[i % len(PREFIXES)]}{i:06d}' for i in range(count)]
+        Asset.objects.bulk_create(
+            (
+                Asset(
+                    inventory_number=number,
+                    name=f'{MODELS[i % len(MODELS)]} #{i}',
+                    type=types[i % len(types)],
+                    location=f'Nicks Hall {100 + i % 300}',
+                    details='',
+                )
+                for i, number in enumerate(numbers)
+            ),
+            batch_size=5000,
+        )
+        lookup.cache.clear()
+        return numbers
+
+    def _queries(self, rng, numbers, count):
+        queries = []
+        for _ in range(count):
+            number = rng.choice(numbers)
+            kind = rng.random()
+            if kind < 0.5:
+                # Someone partway through typing a number
+                queries.append(number[:rng.randint(2, len(number))].lower())
+            elif kind < 0.8:
+                # A typo in the last digits
+                queries.append(number[:-2] + str(rng.randint(0, 9)) + number[-2])
+            else:
+                queries.append(rng.choice(MODELS)[:rng.randint(2, 10)])
+        return queries
+
+    def _time(self, queries, user, warm):
+        factory = RequestFactory()
+        durations, result_counts = [], []
+        for query in queries:
+            request = factory.get('/assets/lookup/', {'q': query})
+            request.user = user
+            if warm:
+                asset_lookup(request)
+            else:
+                lookup.cache.clear()
+            start = time.perf_counter()
+            response = asset_lookup(request)
+            durations.append(time.perf_counter() - start)
+            result_counts.append(response.content.count(b'"inventory_number"'))
+        return durations, result_counts
+
+    def _report(self, name, measurements):
+        durations, result_counts = measurements
+        durations = sorted(d * 1000 for d in durations)
+        p95 = durations[int(len(durations) * 0.95)]
+        style = self.style.SUCCESS if p95 < 10 else self.style.WARNING
+        self.stdout.write(style(
+            f'{name:<18} {statistics.median(durations):>10.2f} {p95:>8.2f} {durations[-1]:>8.2f} '
+            f'{statistics.mean(result_counts):>12.1f}'
+        ))
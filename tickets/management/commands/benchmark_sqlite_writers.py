@@ -0,0 +1,157 @@
+import json
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, OperationalError, connection, connections, transaction
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from helpdesk.db import is_lock_error, lock_retries, run_in_write_transaction
+from tickets.models import Ticket, TicketAttachment, TicketMessage
+from tickets.security import generate_access_code
+from tickets.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent writers (ticket submissions and replies) against a throwaway SQLite '
+        'file with the default configuration, WAL only, and the hardened configuration from settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Concurrent writer threads (default: 8)')
+        parser.add_argument('--transactions', type=int, default=50, help='Transactions per writer (default: 50)')
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark only applies to SQLite')
+        hardened = dict(settings.DATABASES['default'].get('OPTIONS', {}))
+        if hardened.get('transaction_mode') != 'IMMEDIATE':
+            self.stdout.write(self.style.WARNING(
+                'DATABASES["default"]["OPTIONS"] does not set transaction_mode IMMEDIATE; '
+                'the "hardened" run uses it as configured'
+            ))
+        wal_only = {'init_command': hardened.get('init_command', 'PRAGMA journal_mode=WAL')}
+        configurations = [
+            # Rollback journal, deferred transactions, no retries
+            ('default', {'init_command': 'PRAGMA journal_mode=DELETE'}, False),
+            ('wal', wal_only, False),
+            ('hardened', hardened, True),
+        ]
+
+        setup_test_environment()
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        if not test_settings.get('NAME'):
+            # Threads need a shared file, not the in-memory test database
+            test_settings['NAME'] = tempfile.mktemp(prefix='helpdesk-writers-', suffix='.sqlite3')
+        original_options = connection.settings_dict.get('OPTIONS', {})
+        old_config = setup_databases(verbosity=0, interactive=False)
+        results = {}
+        try:
+            seed(tickets=200, attachment_ratio=0)
+            self.ticket_ids = list(Ticket.objects.values_list('id', flat=True))
+            for name, db_options, retry in configurations:
+                connections.close_all()
+                # New connections, including the writer threads', read OPTIONS when they connect
+                connection.settings_dict['OPTIONS'] = db_options
+                results[name] = self._run(options['writers'], options['transactions'], retry)
+                self._print_result(name, results[name])
+        finally:
+            connections.close_all()
+            connection.settings_dict['OPTIONS'] = original_options
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+    def _submit(self, rng):
+        ticket = Ticket.objects.create(
+            requestor_email='writer@etsu.edu',
+            requestor_name='Concurrent Writer',
+            title='Printer is not working',
+            description='The printer in Nicks Hall 100 is not working.',
+            type='INC',
+            subtype='PRT',
+            item='printer',
+        )
+        TicketAttachment.objects.create(ticket=ticket, file='ticket_attachments/seed/screenshot-0.txt')
+
+    def _reply(self, rng):
+        ticket = Ticket.objects.get(id=rng.choice(self.ticket_ids))
+        TicketMessage.objects.create(
+            ticket=ticket, sender_email='writer@etsu.edu', content='Any update on this?', is_from_requestor=True,
+        )
+        ticket.access_code = generate_access_code()
+        ticket.save(update_fields=['access_code'])
+
+    def _run(self, writers, transactions, retry):
+        lock = threading.Lock()
+        durations, errors = [], {'locked': 0, 'duplicate ticket number': 0}
+        retries_before = lock_retries.series.get((), 0)
+
+        def writer(index):
+            rng = random.Random(index)
+            try:
+                for i in range(transactions):
+                    work = self._submit if i % 2 == 0 else self._reply
+                    start = time.perf_counter()
+                    error = None
+                    try:
+                        if retry:
+                            run_in_write_transaction(work, rng)
+                        else:
+                            with transaction.atomic():
+                                work(rng)
+                    except OperationalError as e:
+                        if not is_lock_error(e):
+                            raise
+                        error = 'locked'
+                    except IntegrityError:
+                        error = 'duplicate ticket number'
+                    elapsed = time.perf_counter() - start
+                    with lock:
+                        if error:
+                            errors[error] += 1
+                        else:
+                            durations.append(elapsed)
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            for future in [pool.submit(writer, i) for i in range(writers)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+        durations.sort()
+        attempted = writers * transactions
+        return {
+            'transactions': attempted,
+            'committed': len(durations),
+            'errors': errors,
+            'error_rate': round(sum(errors.values()) / attempted, 4),
+            'retries': lock_retries.series.get((), 0) - retries_before,
+            'throughput_tps': round(len(durations) / elapsed, 1),
+            'median_ms': round(statistics.median(durations) * 1000, 2) if durations else None,
+            'p95_ms': round(durations[int(len(durations) * 0.95)] * 1000, 2) if durations else None,
+        }
+
+    def _print_result(self, name, result):
+        errors = ', '.join(f'{count} {kind}' for kind, count in result['errors'].items() if count) or 'none'
+        style = self.style.ERROR if result['committed'] < result['transactions'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{name:<9} {result["committed"]:>5}/{result["transactions"]} committed  '
+            f'{result["throughput_tps"]:>7} tx/s  median {result["median_ms"]} ms  p95 {result["p95_ms"]} ms  '
+            f'retries {result["retries"]}  errors: {errors}'
+        ))
@@ -0,0 +1,184 @@
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import ExitStack
+
+import django
+from django.contrib.auth import get_user_model
+from django.core import serializers
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases,
+    setup_test_environment, teardown_databases, teardown_test_environment,
+)
+from django.urls import reverse
+
+from assets.models import Asset
+from tickets.catalog import invalidate_catalog
+from tickets.models import CatalogItem, CatalogSubtype, CatalogType, Ticket
+from tickets.seeding import seed
+
+User = get_user_model()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database at each requested size and times the main '
+        'views, writing the results to JSON for comparison across commits'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+            help='Ticket counts to benchmark (default: 1000 10000 100000)',
+        )
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per case (default: 10)')
+        parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON results')
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+
+    def handle(self, *args, **options):
+        results = {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'sizes': {},
+        }
+
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Every request comes from 127.0.0.1; flood control would answer most with 429
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='helpdesk-bench-'), THROTTLE_ENABLED=False)
+        media.enable()
+        # flush also empties the ticket catalog the migrations seeded; seed() needs it
+        catalog = serializers.serialize('json', [
+            *CatalogType.objects.all(), *CatalogSubtype.objects.all(), *CatalogItem.objects.all(),
+        ])
+        try:
+            for size in options['sizes']:
+                call_command('flush', verbosity=0, interactive=False)
+                for row in serializers.deserialize('json', catalog):
+                    row.save()
+                invalidate_catalog()
+                start = time.perf_counter()
+                seed(tickets=size)
+                self.stdout.write(f'Seeded {size} tickets in {time.perf_counter() - start:.1f}s')
+                results['sizes'][str(size)] = self._run_cases(options['repeat'])
+        finally:
+            media.disable()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {options["output"]}'))
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self._print_comparison(json.load(f), results)
+
+    def _cases(self):
+        """(name, method, url, data) for every benchmarked request."""
+        busiest = Ticket.objects.annotate(message_total=Count('messages')).order_by('-message_total').first()
+        asset = Asset.objects.filter(ticket__isnull=False).order_by('id').first()
+        dashboard = reverse('technician_dashboard')
+        # The manager's dashboard lists every ticket, 20 per page; get_page() reads 'last' as page 1
+        last_page = Paginator(Ticket.objects.order_by('pk'), 20).num_pages
+        return [
+            ('dashboard', 'get', dashboard, None),
+            ('dashboard_search', 'get', dashboard, {'search': 'projector'}),
+            ('dashboard_status_filter', 'get', dashboard, {'status': 'PRG'}),
+            ('dashboard_type_filter', 'get', dashboard, {'type': 'INC'}),
+            ('dashboard_sort_title', 'get', dashboard, {'sort': 'title'}),
+            ('dashboard_sort_status_desc', 'get', dashboard, {'sort': '-status'}),
+            ('dashboard_last_page', 'get', dashboard, {'page': last_page}),
+            ('manage_ticket', 'get', reverse('manage_ticket', args=[busiest.ticket_number]), None),
+            ('asset_list', 'get', reverse('asset_list'), None),
+            ('asset_list_search', 'get', reverse('asset_list'), {'search': 'Projector'}),
+            ('asset_detail', 'get', reverse('asset_detail', args=[asset.inventory_number]), None),
+            ('submit_ticket_form', 'get', reverse('submit_ticket'), None),
+            ('submit_ticket', 'post', reverse('submit_ticket'), {
+                'requestor_email': 'bench@etsu.edu',
+                'requestor_name': 'Bench Mark',
+                'title': 'Projector is not working',
+                'description': 'The projector in Nicks Hall 100 will not turn on.',
+                'type': 'INC',
+                'subtype': 'LAB',
+                'item': 'projector',
+            }),
+        ]
+
+    def _run_cases(self, repeat):
+        manager = User.objects.create_user(
+            username='bench-manager', password=None, user_type=User.UserType.SYSTEM_MANAGER,
+        )
+        staff_client = Client()
+        staff_client.force_login(manager)
+        public_client = Client()
+
+        timings = {}
+        for name, method, url, data in self._cases():
+            client = public_client if name.startswith('submit_ticket') else staff_client
+            request = getattr(client, method)
+
+            request(url, data)  # Warm up caches and the connection
+            durations, query_counts = [], []
+            for _ in range(repeat):
+                with ExitStack() as stack:
+                    # Reads may go to the replica alias, so count queries on every connection
+                    captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+                    start = time.perf_counter()
+                    response = request(url, data)
+                    durations.append((time.perf_counter() - start) * 1000)
+                query_counts.append(sum(len(queries) for queries in captured))
+                if response.status_code >= 400:
+                    self.stderr.write(f'{name} returned HTTP {response.status_code}')
+
+            durations.sort()
+            timings[name] = {
+                'min_ms': round(durations[0], 2),
+                'median_ms': round(statistics.median(durations), 2),
+                'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 2),
+                'queries': max(query_counts),
+            }
+            self.stdout.write(
+                f'  {name:<28} median {timings[name]["median_ms"]:>8.2f} ms   '
+                f'p95 {timings[name]["p95_ms"]:>8.2f} ms   {timings[name]["queries"]:>4} queries'
+            )
+        return timings
+
+    def _print_comparison(self, before, after):
+        self.stdout.write('')
+        self.stdout.write(f'Compared with {before.get("commit") or "previous run"} (median ms, queries):')
+        for size, cases in after['sizes'].items():
+            old_cases = before.get('sizes', {}).get(size)
+            if not old_cases:
+                continue
+            self.stdout.write(f'{size} tickets')
+            for name, result in cases.items():
+                old = old_cases.get(name)
+                if not old:
+                    continue
+                change = (result['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0
+                self.stdout.write(
+                    f'  {name:<28} {old["median_ms"]:>8.2f} -> {result["median_ms"]:>8.2f} '
+                    f'({change:+.0f}%)   {old["queries"]:>4} -> {result["queries"]:>4}'
+                )
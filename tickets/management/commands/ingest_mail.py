@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.inbound_mail import BATCH_SIZE, ingest_mailbox
+
+
+class Command(BaseCommand):
+    help = 'Adds replies to notification emails from a local Maildir or mbox to their ticket threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('mailboxes', nargs='+', help='Maildir directories or mbox files to read')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Emails per transaction (default: {BATCH_SIZE})')
+        parser.add_argument('--watch', action='store_true', help='Keep running, checking for new mail every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between checks with --watch (default: 30)')
+
+    def handle(self, *args, **options):
+        while True:
+            for path in options['mailboxes']:
+                self._ingest(path, options['batch_size'], quiet=options['watch'])
+            if not options['watch']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
+
+    def _ingest(self, path, batch_size, quiet):
+        totals = {}
+        for totals in ingest_mailbox(path, batch_size=batch_size):
+            if not quiet:
+                self.stdout.write(f'{path}: read {totals["read"]} emails...')
+        if totals or not quiet:
+            skipped = ', '.join(
+                f'{totals.get(reason, 0)} {reason}'
+                for reason in ('duplicate', 'automatic', 'unmatched', 'rejected', 'empty')
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{path}: added {totals.get("added", 0)} messages and {totals.get("attachments", 0)} '
+                f'attachments from {totals.get("read", 0)} emails (skipped {skipped})'
+            ))
@@ -0,0 +1,445 @@
+import json
+import logging
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urlsplit
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.urls import Resolver404, resolve, reverse
+
+from tickets.models import Ticket
+from tickets.seeding import SEED_PASSWORD, seed
+
+User = get_user_model()
+
+request_logger = logging.getLogger('django.request')
+
+CSRF_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+TITLE_RE = re.compile(r'<title>([^<]*)</title>')
+
+DEFAULT_MIX = 'submit=4,view=3,dashboard=2,reply=1'
+
+MANAGER_USERNAME = 'load-manager'
+
+
+class QuietLiveServerThread(LiveServerThread):
+    """Live server that neither logs requests nor shares the main thread's connections."""
+
+    def _create_server(self, connections_override=None):
+        return self.server_class(
+            (self.host, self.port),
+            QuietWSGIRequestHandler,
+            allow_reuse_address=False,
+            connections_override=connections_override,
+        )
+
+
+class NoRedirect(HTTPRedirectHandler):
+    """Redirects are followed by VirtualUser so each hop is timed separately."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class VirtualUser:
+    """One simulated browser: its own cookie jar, CSRF token and timings."""
+
+    def __init__(self, base_url, stats):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        # One cookie jar per account, like separate browser profiles, so switching
+        # scenarios does not pay for a fresh password hash every time
+        self.openers = {None: self._new_opener()}
+        self.opener = self.openers[None]
+
+    @staticmethod
+    def _new_opener():
+        return build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect)
+
+    def anonymous(self):
+        self.opener = self.openers[None]
+
+    def request(self, method, path, data=None, files=None):
+        """Send a request, record its latency and return (status, body, location)."""
+        headers = {}
+        body = None
+        if files:
+            body, content_type = self._multipart(data or {}, files)
+            headers['Content-Type'] = content_type
+        elif data is not None:
+            body = urlencode(data, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if method == 'POST':
+            headers['Referer'] = self.base_url + path  # Required by CSRF checks over HTTPS
+
+        request = Request(self.base_url + path, data=body, headers=headers, method=method)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                status, content, location = response.status, response.read(), None
+        except HTTPError as e:
+            status, content, location = e.code, e.read(), e.headers.get('Location')
+        except (OSError, HTTPException) as e:
+            # Refused or reset connections, timeouts and truncated responses from an
+            # overloaded server are errors of this scenario, not of the whole run
+            self.stats.record(method, path, time.perf_counter() - start, 0)
+            reason = e.reason if isinstance(e, URLError) else e
+            raise ScenarioError(f'{method} {path}: {str(reason) or type(reason).__name__}')
+        self.stats.record(method, path, time.perf_counter() - start, status)
+
+        if status >= 400:
+            title = TITLE_RE.search(content.decode(errors='replace'))
+            raise ScenarioError(f'{method} {path}: HTTP {status}' + (f" ({' '.join(title.group(1).split())})" if title else ''))
+        return status, content.decode(errors='replace'), location
+
+    def get(self, path):
+        return self.request('GET', path)
+
+    def post(self, path, data, files=None):
+        """POST and follow a redirect, like a browser submitting a form."""
+        status, body, location = self.request('POST', path, data, files)
+        if location:
+            return self.get(urlsplit(location).path)
+        return status, body, location
+
+    def csrf_token(self, html):
+        match = CSRF_RE.search(html)
+        if not match:
+            raise ScenarioError('No CSRF token in page')
+        return match.group(1)
+
+    def login(self, username, password):
+        if username in self.openers:
+            self.opener = self.openers[username]
+            return
+        self.opener = self.openers[username] = self._new_opener()
+        _, html, _ = self.get(reverse('login'))
+        _, html, _ = self.post(reverse('login'), {
+            'csrfmiddlewaretoken': self.csrf_token(html),
+            'username': username,
+            'password': password,
+        })
+        if 'name="password"' in html:
+            del self.openers[username]
+            raise ScenarioError(f'Login failed for {username}')
+
+    @staticmethod
+    def _multipart(fields, files):
+        boundary = uuid.uuid4().hex
+        lines = []
+        for name, value in fields.items():
+            lines += [f'--{boundary}', f'Content-Disposition: form-data; name="{name}"', '', str(value)]
+        parts = '\r\n'.join(lines).encode() + b'\r\n'
+        for name, (filename, content, content_type) in files.items():
+            parts += (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n'
+            ).encode() + content + b'\r\n'
+        parts += f'--{boundary}--\r\n'.encode()
+        return parts, f'multipart/form-data; boundary={boundary}'
+
+
+class ScenarioError(Exception):
+    pass
+
+
+class Stats:
+    """Thread-safe latency and error bookkeeping, per endpoint and per scenario."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = defaultdict(list)  # (method, url name) -> [seconds]
+        self.endpoint_errors = defaultdict(int)
+        self.scenarios = defaultdict(lambda: {'runs': 0, 'errors': 0, 'seconds': []})
+        self.error_samples = []
+
+    def record(self, method, path, seconds, status):
+        try:
+            name = resolve(urlsplit(path).path).url_name or path
+        except Resolver404:
+            name = path
+        key = (method, name)
+        with self.lock:
+            self.endpoints[key].append(seconds)
+            if status == 0 or status >= 400:
+                self.endpoint_errors[key] += 1
+
+    def record_scenario(self, scenario, seconds, error=None):
+        with self.lock:
+            result = self.scenarios[scenario]
+            result['runs'] += 1
+            result['seconds'].append(seconds)
+            if error:
+                result['errors'] += 1
+                if len(self.error_samples) < 20:
+                    self.error_samples.append(f'{scenario}: {error}')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs concurrent virtual users against a live test server (or --url) and reports '
+        'throughput, p50/p95/p99 latency per endpoint and error rates per scenario'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users (default: 20)')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default: 30)')
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help=f'Scenario weights, from submit, view, dashboard and reply (default: "{DEFAULT_MIX}")',
+        )
+        parser.add_argument('--tickets', type=int, default=1000, help='Tickets to seed the test server with')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Pause between scenarios, in seconds')
+        parser.add_argument(
+            '--url',
+            help='Drive an already running server instead of starting one. It must contain '
+                 f'seed_helpdesk data and a system manager "{MANAGER_USERNAME}" using the seed password.',
+        )
+        parser.add_argument('--output', help='Also write the report as JSON to this file')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for scenario selection')
+
+    def handle(self, *args, **options):
+        mix = self._parse_mix(options['mix'])
+
+        if options['url']:
+            self._prepare_pools()
+            report = self._run(options['url'], mix, options)
+        else:
+            report = self._run_with_live_server(mix, options)
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+
+    def _parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            name, _, weight = part.partition('=')
+            name = name.strip()
+            if name not in ('submit', 'view', 'dashboard', 'reply'):
+                raise CommandError(f'Unknown scenario "{name}"')
+            try:
+                mix[name] = float(weight or 1)
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}": {weight}')
+        return mix
+
+    def _run_with_live_server(self, mix, options):
+        setup_test_environment()
+        # A file-backed test database lets every server thread use its own connection
+        for alias in connections:
+            test_settings = connections[alias].settings_dict.setdefault('TEST', {})
+            if connections[alias].vendor == 'sqlite' and not test_settings.get('NAME'):
+                test_settings['NAME'] = tempfile.mktemp(prefix='helpdesk-load-', suffix='.sqlite3')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        # Every request comes from 127.0.0.1; flood control would answer most with 429
+        media = override_settings(MEDIA_ROOT=tempfile.mkdtemp(prefix='helpdesk-load-media-'), THROTTLE_ENABLED=False)
+        media.enable()
+        server = None
+        try:
+            seed(tickets=options['tickets'])
+            User.objects.create_user(
+                username=MANAGER_USERNAME, password=SEED_PASSWORD,
+                email=f'{MANAGER_USERNAME}@etsu.edu', user_type=User.UserType.SYSTEM_MANAGER,
+            )
+            self._prepare_pools()
+
+            connections.close_all()
+            server = QuietLiveServerThread('localhost', static_handler=lambda handler: handler)
+            server.daemon = True
+            server.start()
+            server.is_ready.wait()
+            if server.error:
+                raise server.error
+            self.stdout.write(f'Live server on port {server.port} with {options["tickets"]} tickets')
+            # Server errors are counted and sampled in the report instead of logged as tracebacks
+            request_logger.disabled = True
+            return self._run(f'http://localhost:{server.port}', mix, options)
+        finally:
+            request_logger.disabled = False
+            if server is not None:
+                server.terminate()
+            media.disable()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def _prepare_pools(self):
+        """
+        Load the tickets and technicians the scenarios pick from. Replies give
+        a ticket a new access code, so requestors view other tickets than the
+        manager replies to, and their cached codes stay valid.
+        """
+        tickets = list(Ticket.objects.order_by('pk').values_list('ticket_number', 'access_code')[:5000])
+        self.view_tickets = tickets[::2]
+        self.reply_tickets = [ticket_number for ticket_number, _ in tickets[1::2]]
+        self.technicians = list(
+            User.objects.filter(username__startswith='seed-tech-', is_active=True).values_list('username', flat=True)
+        )
+        if len(tickets) < 2 or not self.technicians:
+            raise CommandError('No seeded tickets or technicians found. Run seed_helpdesk first.')
+
+    def _run(self, base_url, mix, options):
+        stats = Stats()
+        deadline = time.monotonic() + options['duration']
+        scenarios = list(mix)
+        weights = list(mix.values())
+
+        def virtual_user(index):
+            rng = random.Random(options['seed'] + index)
+            user = VirtualUser(base_url, stats)
+            while time.monotonic() < deadline:
+                scenario = rng.choices(scenarios, weights)[0]
+                start = time.perf_counter()
+                error = None
+                try:
+                    getattr(self, f'scenario_{scenario}')(user, rng)
+                except ScenarioError as e:
+                    error = str(e)
+                stats.record_scenario(scenario, time.perf_counter() - start, error)
+                if options['think_time']:
+                    time.sleep(options['think_time'])
+
+        self.stdout.write(f'Running {options["users"]} virtual users for {options["duration"]:.0f}s...')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['users']) as pool:
+            for future in [pool.submit(virtual_user, i) for i in range(options['users'])]:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        return self._summarize(stats, elapsed, options)
+
+    # Scenarios ------------------------------------------------------------
+
+    def scenario_submit(self, user, rng):
+        """Fill in the public form and submit a ticket with an attachment."""
+        user.anonymous()
+        _, html, _ = user.get(reverse('submit_ticket'))
+        user.post(reverse('submit_ticket'), {
+            'csrfmiddlewaretoken': user.csrf_token(html),
+            'requestor_email': f'load{rng.randint(1, 500)}@etsu.edu',
+            'requestor_name': 'Load Test',
+            'title': 'Projector will not turn on',
+            'description': 'The projector in Nicks Hall 100 will not turn on.',
+            'type': 'INC',
+            'subtype': 'LAB',
+            'item': 'projector',
+        }, files={
+            'attachments': ('screenshot.txt', b'x' * rng.randint(1024, 64 * 1024), 'text/plain'),
+        })
+
+    def scenario_view(self, user, rng):
+        """A requestor opens their ticket from the link in an email."""
+        user.anonymous()
+        ticket_number, access_code = rng.choice(self.view_tickets)
+        user.get(reverse('view_ticket', args=[ticket_number, access_code]))
+
+    def scenario_dashboard(self, user, rng):
+        """A technician signs in and browses the dashboard."""
+        user.login(rng.choice(self.technicians), SEED_PASSWORD)
+        path = reverse('technician_dashboard')
+        user.get(path)
+        query = rng.choice([
+            {'status': rng.choice(['NEW', 'ASG', 'PRG', 'WTG'])},
+            {'search': rng.choice(['projector', 'printer', 'wifi', 'smith'])},
+            {'sort': rng.choice(['title', '-status', 'time_created'])},
+            {'page': rng.randint(2, 5)},
+        ])
+        user.get(f'{path}?{urlencode(query)}')
+
+    def scenario_reply(self, user, rng):
+        """A system manager opens a ticket and replies to it."""
+        user.login(MANAGER_USERNAME, SEED_PASSWORD)
+        ticket_number = rng.choice(self.reply_tickets)
+        path = reverse('manage_ticket', args=[ticket_number])
+        _, html, _ = user.get(path)
+        user.post(path, {
+            'csrfmiddlewaretoken': user.csrf_token(html),
+            'action': 'add_message',
+            'content': 'Thanks, we are looking into this.',
+        })
+
+    # Reporting -------------------------------------------------------------
+
+    def _summarize(self, stats, elapsed, options):
+        endpoints = {}
+        total_requests = 0
+        for (method, name), durations in sorted(stats.endpoints.items()):
+            durations = sorted(durations)
+            total_requests += len(durations)
+            endpoints[f'{method} {name}'] = {
+                'requests': len(durations),
+                'errors': stats.endpoint_errors[(method, name)],
+                'throughput_rps': round(len(durations) / elapsed, 2),
+                'p50_ms': round(percentile(durations, 50) * 1000, 1),
+                'p95_ms': round(percentile(durations, 95) * 1000, 1),
+                'p99_ms': round(percentile(durations, 99) * 1000, 1),
+            }
+        scenarios = {}
+        for name, result in sorted(stats.scenarios.items()):
+            scenarios[name] = {
+                'runs': result['runs'],
+                'errors': result['errors'],
+                'error_rate': round(result['errors'] / result['runs'], 4) if result['runs'] else 0,
+                'median_ms': round(statistics.median(result['seconds']) * 1000, 1),
+            }
+        return {
+            'users': options['users'],
+            'duration_s': round(elapsed, 2),
+            'requests': total_requests,
+            'throughput_rps': round(total_requests / elapsed, 2),
+            'endpoints': endpoints,
+            'scenarios': scenarios,
+            'error_samples': stats.error_samples,
+        }
+
+    def _print_report(self, report):
+        self.stdout.write('')
+        self.stdout.write(
+            f'{report["requests"]} requests in {report["duration_s"]}s '
+            f'({report["throughput_rps"]} req/s) with {report["users"]} users'
+        )
+        self.stdout.write('')
+        self.stdout.write(f'{"Endpoint":<36} {"Reqs":>6} {"Err":>5} {"Req/s":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for name, result in report['endpoints'].items():
+            self.stdout.write(
+                f'{name:<36} {result["requests"]:>6} {result["errors"]:>5} {result["throughput_rps"]:>7} '
+                f'{result["p50_ms"]:>8} {result["p95_ms"]:>8} {result["p99_ms"]:>8}'
+            )
+        self.stdout.write('')
+        self.stdout.write(f'{"Scenario":<12} {"Runs":>6} {"Errors":>7} {"Error rate":>11} {"Median ms":>10}')
+        for name, result in report['scenarios'].items():
+            style = self.style.ERROR if result['errors'] else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{name:<12} {result["runs"]:>6} {result["errors"]:>7} '
+                f'{result["error_rate"] * 100:>10.1f}% {result["median_ms"]:>10}'
+            ))
+        for sample in report['error_samples']:
+            self.stderr.write(f'  {sample}')
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.similarity import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the MinHash signatures used to find duplicate and similar tickets'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tickets per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = 0
+        for total in rebuild_index(batch_size=options['batch_size']):
+            self.stdout.write(f'Indexed {total} tickets...')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} tickets in {elapsed:.1f}s'))
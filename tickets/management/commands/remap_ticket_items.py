@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.catalog import REMAP_BATCH_SIZE, get_catalog, remap_ticket_items
+from tickets.models import ArchivedTicket, TechnicianSkill, Ticket
+
+
+def parse_entry(value):
+    subtype, separator, item = value.partition(':')
+    if not separator or not subtype or not item:
+        raise CommandError(f'Expected SUBTYPE:ITEM, got {value!r}')
+    return subtype, item
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves tickets, archived tickets and technician skills from ticket catalog items to others, '
+        'e.g. after renaming or merging items, and retires the old items'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'mappings', nargs='+', metavar='SUBTYPE:ITEM=SUBTYPE:ITEM',
+            help='An item and the item its tickets move to, e.g. NET:wifi=NET:connectivity',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=REMAP_BATCH_SIZE,
+            help=f'Tickets updated per transaction (default: {REMAP_BATCH_SIZE})',
+        )
+        parser.add_argument('--keep-old-items', action='store_true', help='Keep offering the old items on the forms')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would move')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        catalog = get_catalog()
+        mapping = {}
+        for value in options['mappings']:
+            old, separator, new = value.partition('=')
+            if not separator:
+                raise CommandError(f'Expected SUBTYPE:ITEM=SUBTYPE:ITEM, got {value!r}')
+            old, new = parse_entry(old), parse_entry(new)
+            if old == new or old in mapping:
+                raise CommandError(f'{value!r} repeats an item')
+            # Only onto items the forms offer, so the tickets stay editable
+            if not catalog.offers_item(*new):
+                raise CommandError(f'{new[0]}:{new[1]} is not an active item of an active subtype in the catalog')
+            mapping[old] = new
+
+        if options['dry_run']:
+            for old, new in mapping.items():
+                tickets = Ticket.objects.filter(subtype=old[0], item=old[1]).count()
+                archived = ArchivedTicket.objects.filter(subtype=old[0], item=old[1]).count()
+                skills = TechnicianSkill.objects.filter(subtype=old[0], item=old[1]).count()
+                self.stdout.write(
+                    f'{old[0]}:{old[1]} -> {new[0]}:{new[1]}: {tickets} tickets, {archived} archived, {skills} skills'
+                )
+            return
+
+        moved = remap_ticket_items(mapping, options['batch_size'], retire=not options['keep_old_items'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved["tickets"]} tickets, {moved["archived"]} archived tickets and {moved["skills"]} skills'
+        ))
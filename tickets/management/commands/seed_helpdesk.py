@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tickets.seeding import seed, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generates technicians, assets and tickets with messages and attachments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=1000, help='Number of tickets (default: 1000)')
+        parser.add_argument('--technicians', type=int, default=10, help='Number of technicians (default: 10)')
+        parser.add_argument('--assets', type=int, help='Number of assets (default: tickets / 10)')
+        parser.add_argument('--messages', type=int, default=3, help='Average messages per ticket (default: 3)')
+        parser.add_argument(
+            '--attachment-ratio', type=float, default=0.2,
+            help='Fraction of tickets with an attachment (default: 0.2)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data sets')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        seed(
+            tickets=options['tickets'],
+            technicians=options['technicians'],
+            assets=options['assets'],
+            messages_per_ticket=options['messages'],
+            attachment_ratio=options['attachment_ratio'],
+            random_seed=options['seed'],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {options["tickets"]} tickets in {elapsed:.1f}s'
+        ))
+        self.stdout.write(f'Seeded technicians (seed-tech-N) use the password "{SEED_PASSWORD}".')
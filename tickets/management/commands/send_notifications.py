@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tickets.notifications import send_pending_notifications, send_technician_digests
+
+
+class Command(BaseCommand):
+    help = 'Sends queued notifications as one email per recipient and ticket, and technician digests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--digest', action='store_true', help='Send technician digests instead (when enabled in Settings)')
+        parser.add_argument('--watch', action='store_true', help='Keep running, sending every --interval seconds')
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help='Seconds between runs with --watch (default: 10)',
+        )
+        parser.add_argument(
+            '--window', type=float,
+            help=f'Hold events this many seconds after a recipient\'s first one '
+                 f'(default: NOTIFICATION_COALESCE_SECONDS, {settings.NOTIFICATION_COALESCE_SECONDS})',
+        )
+
+    def handle(self, *args, **options):
+        if options['digest']:
+            technicians, tickets = send_technician_digests()
+            self.stdout.write(self.style.SUCCESS(f'Sent digests of {tickets} tickets to {technicians} technicians'))
+            return
+
+        while True:
+            events, emails = send_pending_notifications(window=options['window'])
+            if events or not options['watch']:
+                self.stdout.write(self.style.SUCCESS(f'Sent {emails} emails for {events} notification events'))
+            if not options['watch']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
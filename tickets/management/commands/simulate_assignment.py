@@ -0,0 +1,114 @@
+import datetime
+import heapq
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.assignment import Strategy, eligible_technicians, pick_technician, technician_skills
+from tickets.models import Ticket
+
+
+class SimulatedWorkload:
+    def __init__(self):
+        self.open_tickets = 0
+        self.last_assigned_at = None
+        self.assigned = 0
+        self.finishes = []  # Heap of finish times of the technician's unfinished tickets
+        self.free_at = []  # Heap of times each of the technician's working slots frees up
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays past tickets through each automatic assignment strategy and compares '
+        'how long tickets would have waited for their technician'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Replay tickets created in the last N days (default: 90)')
+        parser.add_argument('--limit', type=int, help='Replay at most this many of the most recent tickets')
+        parser.add_argument(
+            '--technicians', type=int,
+            help='Simulate this many technicians without skills instead of the active technicians',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=3,
+            help='Tickets a technician works on at once (default: 3)',
+        )
+        parser.add_argument(
+            '--max-service-hours', type=float, default=72,
+            help='Cap on the time one ticket takes, in hours (default: 72)',
+        )
+
+    def handle(self, *args, **options):
+        if options['technicians']:
+            technician_ids = list(range(1, options['technicians'] + 1))
+            skills = {}
+        else:
+            technician_ids = list(eligible_technicians().values_list('pk', flat=True))
+            skills = technician_skills()
+        if not technician_ids:
+            raise CommandError('No active technicians; use --technicians to simulate some')
+
+        tickets = self.load_tickets(options)
+        if not tickets:
+            raise CommandError('No tickets to replay')
+        self.stdout.write(
+            f'Replaying {len(tickets)} tickets across {len(technician_ids)} technicians '
+            f'working {options["concurrency"]} tickets at once\n'
+        )
+        self.stdout.write(
+            f'{"strategy":<36} {"mean wait":>10} {"median":>10} {"p95":>10} {"max":>10} {"assigned min-max":>18}'
+        )
+        for strategy in (Strategy.ROUND_ROBIN, Strategy.LEAST_OPEN, Strategy.SKILLS):
+            waits, assigned = self.simulate(strategy, tickets, technician_ids, skills, options['concurrency'])
+            hours = [wait / 3600 for wait in waits]
+            self.stdout.write(
+                f'{strategy.label:<36} {statistics.mean(hours):>9.1f}h {statistics.median(hours):>9.1f}h '
+                f'{percentile(hours, 0.95):>9.1f}h {max(hours):>9.1f}h {min(assigned):>8}-{max(assigned)}'
+            )
+        self.stdout.write(
+            '\nWait is the time from submission until the technician could start on the ticket. '
+            'Service times are taken from how long tickets stayed active, so they include time '
+            'spent waiting on requestors.'
+        )
+
+    def load_tickets(self, options):
+        """(created, service seconds, subtype, item) for each ticket, oldest first."""
+        since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=options['days'])
+        queryset = Ticket.objects.filter(time_created__gte=since).order_by('-time_created').values_list(
+            'time_created', 'last_activity_at', 'subtype', 'item',
+        )
+        if options['limit']:
+            queryset = queryset[:options['limit']]
+        max_service = options['max_service_hours'] * 3600
+        tickets = [
+            (created.timestamp(), min(max_service, max(0, (last_activity - created).total_seconds())), subtype, item)
+            for created, last_activity, subtype, item in queryset.iterator()
+        ]
+        tickets.reverse()
+        return tickets
+
+    def simulate(self, strategy, tickets, technician_ids, skills, concurrency):
+        workloads = {technician_id: SimulatedWorkload() for technician_id in technician_ids}
+        for workload in workloads.values():
+            workload.free_at = [0.0] * concurrency
+        waits = []
+        for created, service, subtype, item in tickets:
+            for workload in workloads.values():
+                while workload.finishes and workload.finishes[0] <= created:
+                    heapq.heappop(workload.finishes)
+                workload.open_tickets = len(workload.finishes)
+            workload = workloads[pick_technician(strategy, subtype, item, workloads, skills)]
+            # Each technician works through their tickets in the order they were assigned
+            start = max(created, heapq.heappop(workload.free_at))
+            heapq.heappush(workload.free_at, start + service)
+            heapq.heappush(workload.finishes, start + service)
+            workload.last_assigned_at = datetime.datetime.fromtimestamp(created, datetime.timezone.utc)
+            workload.assigned += 1
+            waits.append(start - created)
+        return waits, [workload.assigned for workload in workloads.values()]
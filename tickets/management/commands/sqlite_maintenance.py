@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs PRAGMA optimize and checkpoints the WAL of a SQLite database. '
+        'Schedule it (e.g. hourly from cron) or run it with --interval.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias (default: "default")')
+        parser.add_argument(
+            '--checkpoint', default='TRUNCATE', choices=['PASSIVE', 'FULL', 'RESTART', 'TRUNCATE'],
+            help='wal_checkpoint mode; TRUNCATE also shrinks the -wal file (default: TRUNCATE)',
+        )
+        parser.add_argument(
+            '--interval', type=int,
+            help='Keep running and repeat every this many seconds instead of running once',
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'Database "{options["database"]}" is not SQLite')
+
+        while True:
+            self._run(connection, options['checkpoint'])
+            if not options['interval']:
+                break
+            connection.close()  # Don't keep a read snapshot open between runs
+            time.sleep(options['interval'])
+
+    def _run(self, connection, mode):
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA optimize')
+            cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+            busy, wal_frames, checkpointed = cursor.fetchone()
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+
+        elapsed = (time.perf_counter() - start) * 1000
+        if journal_mode != 'wal':
+            self.stdout.write(self.style.WARNING(
+                f'journal_mode is {journal_mode}, not wal; checkpointing has no effect'
+            ))
+        elif busy:
+            self.stdout.write(self.style.WARNING(
+                f'Checkpoint blocked by active readers or writers: {checkpointed} of {wal_frames} frames copied'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Optimized and checkpointed {checkpointed} of {wal_frames} WAL frames in {elapsed:.0f} ms'
+            ))
@@ -0,0 +1,137 @@
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+User = get_user_model()
+
+CSS_URL_RE = re.compile(r'url\(\s*["\']?([^"\')]+)["\']?\s*\)')
+CSS_SRC_RE = re.compile(r'src:[^;}]*')
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Reports the bytes transferred for a cold and a warm technician dashboard load'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--encoding',
+            default='br, gzip',
+            help='Accept-Encoding header the simulated browser sends (default: "br, gzip")',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.SERVE_STATIC_FILES:
+            raise CommandError(
+                'SERVE_STATIC_FILES is off. Run collectstatic and use production '
+                'settings (--settings=helpdesk.settings_prod) to measure served files.'
+            )
+
+        self.client = Client(HTTP_ACCEPT_ENCODING=options['encoding'])
+        self.secure = getattr(settings, 'SECURE_SSL_REDIRECT', False)
+
+        # Log in as a throwaway system manager; everything is rolled back afterwards
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username='static-report', password=None,
+                    user_type=User.UserType.SYSTEM_MANAGER,
+                )
+                self.client.force_login(user)
+                html_bytes, assets = self._load_page(reverse('technician_dashboard'))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f'{"Asset":<80} {"Encoding":<9} {"Bytes":>9}  Warm')
+        cold_total = html_bytes
+        warm_total = html_bytes
+        identity_total = html_bytes
+        revalidations = 0
+        for url, asset in assets.items():
+            cold_total += asset['bytes']
+            identity_total += asset['identity_bytes']
+            if asset['immutable']:
+                warm = 'cached'
+            else:
+                warm = 'revalidate (304)'
+                revalidations += 1
+            self.stdout.write(f'{url:<80} {asset["encoding"]:<9} {asset["bytes"]:>9}  {warm}')
+
+        self.stdout.write('')
+        self.stdout.write(f'HTML document:              {html_bytes:>9} bytes')
+        self.stdout.write(f'Cold load (uncompressed):   {identity_total:>9} bytes, {len(assets) + 1} requests')
+        self.stdout.write(self.style.SUCCESS(
+            f'Cold load (as served):      {cold_total:>9} bytes, {len(assets) + 1} requests'
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Warm load (as served):      {warm_total:>9} bytes, {revalidations + 1} requests '
+            f'({revalidations} static revalidations)'
+        ))
+
+    def _get(self, url, **extra):
+        response = self.client.get(url, secure=self.secure, **extra)
+        if response.streaming:
+            body = b''.join(response.streaming_content)
+        else:
+            body = response.content
+        response.close()
+        return response, body
+
+    def _load_page(self, url):
+        response, body = self._get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned HTTP {response.status_code}')
+
+        html = body.decode()
+        pattern = re.compile(re.escape(settings.STATIC_URL) + r'[^"\'\s)]+')
+        pending = list(dict.fromkeys(pattern.findall(html)))
+        assets = {}
+
+        while pending:
+            asset_url = pending.pop(0)
+            if asset_url in assets:
+                continue
+            response, content = self._get(asset_url)
+            if response.status_code != 200:
+                raise CommandError(f'{asset_url} returned HTTP {response.status_code}')
+            _, identity = self._get(asset_url, HTTP_ACCEPT_ENCODING='identity')
+            assets[asset_url] = {
+                'bytes': len(content),
+                'identity_bytes': len(identity),
+                'encoding': response.get('Content-Encoding', 'identity'),
+                'immutable': 'immutable' in response.get('Cache-Control', ''),
+            }
+            if asset_url.split('?')[0].endswith('.css'):
+                pending.extend(self._css_references(asset_url, identity.decode()))
+
+        return len(body), assets
+
+    def _css_references(self, css_url, css):
+        """
+        Resolve the url() references a browser would fetch from a stylesheet.
+        Only the first source of each @font-face is counted, since browsers
+        stop at the first format they support.
+        """
+        urls = [CSS_URL_RE.findall(src)[:1] for src in CSS_SRC_RE.findall(css)]
+        urls = [found[0] for found in urls if found]
+        urls += CSS_URL_RE.findall(CSS_SRC_RE.sub('', css))
+
+        base = posixpath.dirname(css_url)
+        resolved = []
+        for url in urls:
+            if url.startswith(('data:', 'http:', 'https:', '//')):
+                continue
+            url = url.split('#')[0]
+            if not url.startswith('/'):
+                url = posixpath.normpath(posixpath.join(base, url.split('?')[0]))
+            resolved.append(url)
+        return resolved
@@ -0,0 +1,85 @@
+"""
+Merging duplicate tickets into one.
+
+merge_tickets moves the messages, attachments and asset links of any number
+of source tickets onto a target with set-based UPDATE and INSERT statements.
+The number of queries therefore depends neither on how many tickets are
+merged nor on how long their threads are. The sources stay behind, closed,
+with merged_into pointing at the target, so links to them (emails,
+bookmarks, the access form) keep working. Those links show the target's
+status and only the part of its thread meant for that requestor
+(requestor_messages), never the other requestors' correspondence.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from . import similarity
+from .models import Ticket, TicketAttachment, TicketMessage, TicketStatus, record_new_messages
+
+
+def requestor_messages(target, source):
+    """The messages on `target` the requestor of merged `source` may see: the support team's and their own."""
+    return target.messages.filter(Q(is_from_requestor=False) | Q(sender_email__iexact=source.requestor_email))
+
+
+def merge_tickets(target, sources, merged_by=None):
+    """
+    Merge `sources` into `target` in one transaction and return the merged
+    sources. `merged_by` is recorded as the sender of a note on the target.
+    """
+    sources = [source for source in sources if source.pk != target.pk]
+    if not sources:
+        return []
+    source_ids = [source.pk for source in sources]
+    links = Ticket.assets.through.objects
+
+    with transaction.atomic():
+        totals = Ticket.objects.filter(pk__in=source_ids).aggregate(
+            messages=Sum('message_count'),
+            latest=Max('last_activity_at'),
+            unread=Count('id', filter=Q(has_new_responses=True)),
+        )
+        TicketMessage.objects.filter(ticket_id__in=source_ids).update(ticket=target)
+        TicketAttachment.objects.filter(ticket_id__in=source_ids).update(ticket=target)
+
+        asset_ids = set(links.filter(ticket_id__in=source_ids).values_list('asset_id', flat=True))
+        links.bulk_create(
+            [links.model(ticket_id=target.pk, asset_id=asset_id) for asset_id in asset_ids],
+            ignore_conflicts=True,
+        )
+        links.filter(ticket_id__in=source_ids).delete()
+
+        # Keep every pointer one hop away from a live ticket
+        Ticket.objects.filter(merged_into__in=source_ids).update(merged_into=target, updated_at=timezone.now())
+        Ticket.objects.filter(possible_duplicate_of__in=source_ids).exclude(pk=target.pk).update(
+            possible_duplicate_of=target,
+        )
+        Ticket.objects.filter(pk__in=source_ids).update(
+            merged_into=target,
+            status=TicketStatus.CLOSED,
+            possible_duplicate_of=None,
+            message_count=0,
+            has_new_responses=False,
+            updated_at=timezone.now(),
+        )
+        if target.possible_duplicate_of_id in source_ids:
+            target.possible_duplicate_of = None
+            Ticket.objects.filter(pk=target.pk).update(possible_duplicate_of=None)
+
+        if totals['messages']:
+            record_new_messages(target, totals['messages'], totals['latest'], from_requestor=bool(totals['unread']))
+        similarity.merge_ticket_signatures(target, source_ids)
+
+        numbers = ', '.join(f'#{source.ticket_number}' for source in sources)
+        TicketMessage.objects.create(
+            ticket=target,
+            sender=merged_by,
+            sender_email=merged_by.email if merged_by else '',
+            content=f'Merged {numbers} into this ticket.',
+        )
+
+    for source in sources:
+        source.merged_into = target
+        source.status = TicketStatus.CLOSED
+    return sources
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assets', '0003_asset_bitlocker_key'),
+        ('tickets', '0003_alter_ticket_subtype'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticket_number', models.CharField(max_length=20, unique=True)),
+                ('access_code', models.CharField(max_length=6)),
+                ('time_created', models.DateTimeField()),
+                ('requestor_email', models.EmailField(max_length=254)),
+                ('requestor_phone', models.CharField(blank=True, max_length=20)),
+                ('requestor_name', models.CharField(max_length=100)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('type', models.CharField(choices=[('INC', 'Incident'), ('REQ', 'Request')], max_length=3)),
+                ('subtype', models.CharField(choices=[('ACC', 'Account'), ('LAB', 'Lab'), ('NET', 'Network'), ('WRK', 'Laptop/Workstation'), ('PRT', 'Printer'), ('SRV', 'Server'), ('SFT', 'Software')], max_length=3)),
+                ('item', models.CharField(max_length=50)),
+                ('category', models.CharField(max_length=50)),
+                ('subcategory', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('NEW', 'New'), ('ASG', 'Assigned'), ('PRG', 'In Progress'), ('WTG', 'Waiting for Response'), ('RES', 'Resolved'), ('CLS', 'Closed')], max_length=3)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('assets', models.ManyToManyField(blank=True, related_name='archived_tickets', to='assets.asset')),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_tickets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicketAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to='ticket_attachments/')),
+                ('uploaded_at', models.DateTimeField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attachments', to='tickets.archivedticket')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedTicketMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sender_email', models.EmailField(max_length=254)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('is_from_requestor', models.BooleanField(default=False)),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_messages', to=settings.AUTH_USER_MODEL)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='tickets.archivedticket')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedticket',
+            index=models.Index(fields=['time_created'], name='tickets_arc_time_cr_6d3724_idx'),
+        ),
+    ]
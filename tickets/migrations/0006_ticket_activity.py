@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:55
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_activity(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketMessage = apps.get_model('tickets', 'TicketMessage')
+    messages = TicketMessage.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+    Ticket.objects.update(
+        message_count=Coalesce(Subquery(messages.annotate(total=Count('id')).values('total')), 0),
+        last_activity_at=Coalesce(
+            Subquery(messages.annotate(latest=Max('created_at')).values('latest')),
+            F('time_created'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_message_thread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='last_activity_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='message_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_activity, migrations.RunPython.noop),
+    ]
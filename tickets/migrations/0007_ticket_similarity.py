@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0006_ticket_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSignature',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='tickets.ticket')),
+                ('minhash', models.BinaryField()),
+                ('source_hash', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='possible_duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='possible_duplicates', to='tickets.ticket'),
+        ),
+        migrations.CreateModel(
+            name='TicketSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_bands', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'ticket'], name='tickets_tic_key_358f07_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0008_ticket_merged_into'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailboxCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('offset', models.BigIntegerField(default=0)),
+                ('inode', models.BigIntegerField(blank=True, null=True)),
+                ('messages_read', models.PositiveIntegerField(default=0)),
+                ('messages_added', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticketmessage',
+            name='email_message_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
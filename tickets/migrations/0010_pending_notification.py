@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:20
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0009_inbound_mail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('kind', models.CharField(max_length=20)),
+                ('subject', models.CharField(max_length=200)),
+                ('details', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_notifications', to='tickets.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipient', 'ticket', 'created_at'], name='tickets_pen_recipie_59a64c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:25
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_settings_auto_assignment'),
+        ('tickets', '0010_pending_notification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TechnicianWorkload',
+            fields=[
+                ('technician', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='workload', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_tickets', models.PositiveIntegerField(default=0)),
+                ('last_assigned_at', models.DateTimeField(blank=True, null=True)),
+                ('counted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TechnicianSkill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subtype', models.CharField(choices=[('ACC', 'Account'), ('LAB', 'Lab'), ('NET', 'Network'), ('WRK', 'Laptop/Workstation'), ('PRT', 'Printer'), ('SRV', 'Server'), ('SFT', 'Software')], max_length=3)),
+                ('item', models.CharField(blank=True, max_length=50)),
+                ('technician', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skills', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('technician', 'subtype', 'item'), name='unique_technician_skill')],
+            },
+        ),
+    ]
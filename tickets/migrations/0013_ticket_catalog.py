@@ -0,0 +1,165 @@
+# Generated by Django 5.1.7 on 2026-10-19 18:43
+
+import django.core.validators
+import django.db.models.deletion
+import re
+from django.db import migrations, models
+
+
+# The taxonomy as it was hard-coded in tickets/choices.py and TicketType/TicketSubType
+TYPES = [('INC', 'Incident'), ('REQ', 'Request')]
+SUBTYPES = [
+    ('ACC', 'Account', [
+        ('access', 'Account Access'),
+        ('permissions', 'Permission Issues'),
+        ('password', 'Password Reset'),
+        ('creation', 'Account Creation'),
+        ('software_access', 'Software Access Rights'),
+        ('other', 'Other Account Issue'),
+    ]),
+    ('LAB', 'Lab', [
+        ('instructor_ws', 'Instructor Workstation'),
+        ('instructor_periph', 'Instructor Peripherals'),
+        ('projector', 'Projector'),
+        ('av_equipment', 'A/V Equipment (Control Panel, Microphone)'),
+        ('lab_computer', 'Lab Computer'),
+        ('lab_periph', 'Lab Peripherals'),
+        ('other', 'Other Lab Issue'),
+    ]),
+    ('NET', 'Network', [
+        ('connectivity', 'Internet/Network Connectivity'),
+        ('wifi', 'WiFi Issues'),
+        ('ethernet', 'Ethernet Connection'),
+        ('vpn', 'VPN Access'),
+        ('router', 'Router/Switch Issues'),
+        ('performance', 'Network Performance'),
+        ('other', 'Other Network Issue'),
+    ]),
+    ('WRK', 'Laptop/Workstation', [
+        ('setup', 'New Computer Setup'),
+        ('hardware', 'Hardware Issues'),
+        ('remote_desktop', 'Remote Desktop'),
+        ('makemeadmin', 'MakeMeAdmin Access'),
+        ('monitors', 'Monitor/Display Issues'),
+        ('peripherals', 'Keyboard/Mouse/Peripherals'),
+        ('other', 'Other Workstation Issue'),
+    ]),
+    ('PRT', 'Printer', [
+        ('connect', 'Printer Connection'),
+        ('install', 'Printer Installation'),
+        ('error', 'Printer Errors'),
+        ('supplies', 'Printer Supplies'),
+        ('quality', 'Print Quality Issues'),
+        ('other', 'Other Printer Issue'),
+    ]),
+    ('SRV', 'Server', [
+        ('deploy', 'Server Deployment'),
+        ('access', 'Server Access'),
+        ('maintenance', 'Server Maintenance'),
+        ('backup', 'Backup Issues'),
+        ('performance', 'Performance Issues'),
+        ('storage', 'Storage/Space Issues'),
+        ('other', 'Other Server Issue'),
+    ]),
+    ('SFT', 'Software', [
+        ('install', 'Software Installation'),
+        ('update', 'Software Updates'),
+        ('license', 'License Management'),
+        ('config', 'Software Configuration'),
+        ('compatibility', 'Compatibility Issues'),
+        ('other', 'Other Software Issue'),
+    ]),
+]
+
+
+def seed_catalog(apps, schema_editor):
+    CatalogType = apps.get_model('tickets', 'CatalogType')
+    CatalogSubtype = apps.get_model('tickets', 'CatalogSubtype')
+    CatalogItem = apps.get_model('tickets', 'CatalogItem')
+    CatalogType.objects.bulk_create(
+        CatalogType(code=code, label=label, position=index * 10) for index, (code, label) in enumerate(TYPES)
+    )
+    for index, (code, label, items) in enumerate(SUBTYPES):
+        subtype = CatalogSubtype.objects.create(code=code, label=label, position=index * 10)
+        CatalogItem.objects.bulk_create(
+            CatalogItem(subtype=subtype, code=item, label=item_label, position=item_index * 10)
+            for item_index, (item, item_label) in enumerate(items)
+        )
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0012_ticket_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogSubtype',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=3, unique=True, validators=[django.core.validators.RegexValidator(re.compile('^[-a-zA-Z0-9_]+\\Z'), 'Enter a valid “slug” consisting of letters, numbers, underscores or hyphens.', 'invalid')])),
+                ('label', models.CharField(max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['position', 'code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CatalogType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=3, unique=True, validators=[django.core.validators.RegexValidator(re.compile('^[-a-zA-Z0-9_]+\\Z'), 'Enter a valid “slug” consisting of letters, numbers, underscores or hyphens.', 'invalid')])),
+                ('label', models.CharField(max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['position', 'code'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='archivedticket',
+            name='subtype',
+            field=models.CharField(max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='archivedticket',
+            name='type',
+            field=models.CharField(max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='technicianskill',
+            name='subtype',
+            field=models.CharField(max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='subtype',
+            field=models.CharField(max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='ticket',
+            name='type',
+            field=models.CharField(max_length=3),
+        ),
+        migrations.CreateModel(
+            name='CatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=50, validators=[django.core.validators.RegexValidator(re.compile('^[-a-zA-Z0-9_]+\\Z'), 'Enter a valid “slug” consisting of letters, numbers, underscores or hyphens.', 'invalid')])),
+                ('label', models.CharField(max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+                ('subtype', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='items', to='tickets.catalogsubtype')),
+            ],
+            options={
+                'ordering': ['subtype', 'position', 'code'],
+                'constraints': [models.UniqueConstraint(fields=('subtype', 'code'), name='unique_catalog_item')],
+            },
+        ),
+        migrations.RunPython(seed_catalog, migrations.RunPython.noop),
+    ]
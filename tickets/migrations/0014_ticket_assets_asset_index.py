@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 20:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index the ticket-asset links by asset, then ticket. The asset page reads
+    an asset's tickets newest first a page at a time, and the asset list
+    counts each asset's tickets; both only touch the index. The through
+    table is created by the ManyToManyField, so its Meta can't declare this.
+    """
+
+    dependencies = [
+        ('tickets', '0013_ticket_catalog'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX tickets_ticket_assets_asset_ticket ON tickets_ticket_assets (asset_id, ticket_id)',
+            'DROP INDEX tickets_ticket_assets_asset_ticket',
+        ),
+    ]
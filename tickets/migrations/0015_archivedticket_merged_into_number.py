@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0014_ticket_assets_asset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedticket',
+            name='merged_into_number',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
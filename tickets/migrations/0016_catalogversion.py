@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-19 21:40
+
+import time
+
+from django.db import migrations, models
+
+
+def create_version(apps, schema_editor):
+    apps.get_model('tickets', 'CatalogVersion').objects.create(pk=1, version=time.time_ns())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0015_archivedticket_merged_into_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_version, migrations.RunPython.noop),
+    ]
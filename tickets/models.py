@@ -1,23 +1,16 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Length
 from django.contrib.auth import get_user_model
+from django.core.validators import validate_slug
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 from .security import generate_access_code
+from helpdesk.db import on_rollback
 import datetime
+import functools
 import os
 
-class TicketType(models.TextChoices):
-    INCIDENT = 'INC', 'Incident'
-    REQUEST = 'REQ', 'Request'
-
-class TicketSubType(models.TextChoices):
-    ACCOUNT = 'ACC', 'Account'
-    LAB = 'LAB', 'Lab'
-    NETWORK = 'NET', 'Network'
-    WORKSTATION = 'WRK', 'Laptop/Workstation'
-    PRINTER = 'PRT', 'Printer'
-    SERVER = 'SRV', 'Server'
-    SOFTWARE = 'SFT', 'Software'
-
 class TicketStatus(models.TextChoices):
     NEW = 'NEW', 'New'
     ASSIGNED = 'ASG', 'Assigned'
@@ -26,22 +19,42 @@ class TicketStatus(models.TextChoices):
     RESOLVED = 'RES', 'Resolved'
     CLOSED = 'CLS', 'Closed'
 
-def generate_ticket_number():
+def generate_ticket_number(year=None):
     """Generate a year-based ticket number"""
-    year = datetime.datetime.now().year
-    last_ticket = Ticket.objects.filter(
-        ticket_number__startswith=f'{year}-'
-    ).order_by('-ticket_number').first()
-
-    if last_ticket:
-        last_number = int(last_ticket.ticket_number.split('-')[1])
-        new_number = last_number + 1
+    year = year or datetime.datetime.now().year
+    # Order by length first so that e.g. 2025-10000 sorts after 2025-9999
+    # Archived tickets keep their numbers, so both tables are checked
+    last_numbers = [
+        model.objects.filter(
+            ticket_number__startswith=f'{year}-'
+        ).order_by(Length('ticket_number').desc(), '-ticket_number').values_list('ticket_number', flat=True).first()
+        for model in (Ticket, ArchivedTicket)
+    ]
+    last_numbers = [int(number.split('-')[1]) for number in last_numbers if number]
+
+    if last_numbers:
+        new_number = max(last_numbers) + 1
     else:
         new_number = 1001
 
     return f"{year}-{new_number}"
 
-class Ticket(models.Model):
+class CatalogLabels:
+    """get_type_display() and friends for models storing catalog codes (see tickets/catalog.py)."""
+
+    def get_type_display(self):
+        from .catalog import get_catalog
+        return get_catalog().type_labels.get(self.type, self.type)
+
+    def get_subtype_display(self):
+        from .catalog import get_catalog
+        return get_catalog().subtype_labels.get(self.subtype, self.subtype)
+
+    def get_item_display(self):
+        from .catalog import get_catalog
+        return get_catalog().item_labels.get((self.subtype, self.item), self.item)
+
+class Ticket(CatalogLabels, models.Model):
     ticket_number = models.CharField(max_length=20, unique=True, default=generate_ticket_number)
     access_code = models.CharField(max_length=6, default=generate_access_code)
     time_created = models.DateTimeField(auto_now_add=True)
@@ -50,8 +63,9 @@ class Ticket(models.Model):
     requestor_name = models.CharField(max_length=100)
     title = models.CharField(max_length=200)
     description = models.TextField()
-    type = models.CharField(max_length=3, choices=TicketType.choices)
-    subtype = models.CharField(max_length=3, choices=TicketSubType.choices)
+    # Codes from the ticket catalog (CatalogType, CatalogSubtype, CatalogItem)
+    type = models.CharField(max_length=3)
+    subtype = models.CharField(max_length=3)
     item = models.CharField(max_length=50)  # Detailed classification
     category = models.CharField(max_length=50)
     subcategory = models.CharField(max_length=50)
@@ -69,6 +83,29 @@ class Ticket(models.Model):
     )
     assets = models.ManyToManyField('assets.Asset', blank=True)
     has_new_responses = models.BooleanField(default=False)
+    # Maintained by TicketMessage.save/record_new_messages so lists can show and
+    # sort by activity without joining messages
+    message_count = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # Version stamp of everything the public ticket page shows, for its ETag
+    # (see helpdesk/conditional.py). Bulk updates that change the page set it too.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Set when the ticket was submitted (see tickets/similarity.py)
+    possible_duplicate_of = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='possible_duplicates'
+    )
+    # Set on tickets merged into another one (see tickets/merge.py)
+    merged_into = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='merged_tickets'
+    )
 
     def save(self, *args, **kwargs):
         if not self.ticket_number:
@@ -95,6 +132,13 @@ class TicketAttachment(models.Model):
     file = models.FileField(upload_to='ticket_attachments/')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    def save(self, *args, **kwargs):
+        writes_file = bool(self.file) and not self.file._committed
+        super().save(*args, **kwargs)
+        if writes_file:
+            # A rolled-back (or retried) request must not leave the upload behind
+            on_rollback(functools.partial(self.file.storage.delete, self.file.name))
+
     def __str__(self):
         return f"Attachment for {self.ticket.ticket_number}"
     
@@ -114,12 +158,251 @@ class TicketMessage(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     is_from_requestor = models.BooleanField(default=False)
+    # Message-ID of the email a reply came in as (see tickets/inbound_mail.py)
+    email_message_id = models.CharField(max_length=255, null=True, blank=True, unique=True)
+
+    class Meta:
+        # Threads are read newest-first in windows (see tickets/threads.py)
+        indexes = [models.Index(fields=['ticket', 'created_at'])]
 
     def save(self, *args, **kwargs):
-        if self.is_from_requestor:
-            self.ticket.has_new_responses = True
-            self.ticket.save()
-        super().save(*args, **kwargs)
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                record_new_messages(self.ticket, 1, self.created_at, self.is_from_requestor)
 
     def __str__(self):
         return f"Message on {self.ticket.ticket_number} at {self.created_at}"
+
+
+def record_new_messages(ticket, count, latest_created_at, from_requestor=False):
+    """
+    Update a ticket's message counters after `count` messages were added, with
+    a single narrow UPDATE. Call it inside the transaction that inserted them;
+    bulk ingestion can insert with bulk_create and call this once per ticket.
+    """
+    latest = Value(latest_created_at)
+    updates = {
+        'message_count': F('message_count') + count,
+        'last_activity_at': Greatest(Coalesce('last_activity_at', latest), latest),
+        'updated_at': timezone.now(),
+    }
+    if from_requestor:
+        updates['has_new_responses'] = True
+    ticket_id = ticket.pk if isinstance(ticket, Ticket) else ticket
+    Ticket.objects.filter(pk=ticket_id).update(**updates)
+
+    if isinstance(ticket, Ticket):
+        # Keep the caller's instance in step without reloading it
+        ticket.message_count += count
+        if ticket.last_activity_at is None or latest_created_at > ticket.last_activity_at:
+            ticket.last_activity_at = latest_created_at
+        if from_requestor:
+            ticket.has_new_responses = True
+
+
+def refresh_ticket_activity(tickets):
+    """Recompute message_count and last_activity_at from the messages themselves."""
+    messages = TicketMessage.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket')
+    tickets.update(
+        message_count=Coalesce(Subquery(messages.annotate(total=Count('id')).values('total')), 0),
+        last_activity_at=Coalesce(
+            Subquery(messages.annotate(latest=Max('created_at')).values('latest')),
+            F('time_created'),
+        ),
+        updated_at=timezone.now(),
+    )
+
+class ArchivedTicket(CatalogLabels, models.Model):
+    """
+    A closed ticket moved out of the hot Ticket table by archive_tickets.
+    Mirrors Ticket so templates and links keep working; read-only from then on.
+    """
+    ticket_number = models.CharField(max_length=20, unique=True)
+    access_code = models.CharField(max_length=6)
+    time_created = models.DateTimeField()
+    requestor_email = models.EmailField()
+    requestor_phone = models.CharField(max_length=20, blank=True)
+    requestor_name = models.CharField(max_length=100)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    type = models.CharField(max_length=3)
+    subtype = models.CharField(max_length=3)
+    item = models.CharField(max_length=50)
+    category = models.CharField(max_length=50)
+    subcategory = models.CharField(max_length=50)
+    status = models.CharField(max_length=3, choices=TicketStatus.choices)
+    assigned_to = models.ForeignKey(
+        get_user_model(),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_tickets'
+    )
+    assets = models.ManyToManyField('assets.Asset', blank=True, related_name='archived_tickets')
+    # Ticket number of the ticket this one was merged into, archived with it
+    merged_into_number = models.CharField(max_length=20, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['time_created'])]
+
+    def __str__(self):
+        return f"{self.ticket_number} - {self.title} (archived)"
+
+
+class ArchivedTicketAttachment(models.Model):
+    ticket = models.ForeignKey(ArchivedTicket, on_delete=models.CASCADE, related_name='attachments')
+    file = models.FileField(upload_to='ticket_attachments/')
+    uploaded_at = models.DateTimeField()
+
+    def filename(self):
+        return os.path.basename(self.file.name)
+
+
+class ArchivedTicketMessage(models.Model):
+    ticket = models.ForeignKey(ArchivedTicket, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(
+        get_user_model(),
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_messages'
+    )
+    sender_email = models.EmailField()
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    is_from_requestor = models.BooleanField(default=False)
+
+
+class TicketSignature(models.Model):
+    """MinHash signature of a ticket's text (see tickets/similarity.py)."""
+    ticket = models.OneToOneField(Ticket, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    minhash = models.BinaryField()
+    # Hash of the title and description the signature was built from
+    source_hash = models.BigIntegerField()
+
+
+class TicketSignatureBand(models.Model):
+    """One locality-sensitive hash bucket a ticket's signature falls into."""
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='signature_bands')
+    key = models.BigIntegerField()
+
+    class Meta:
+        # Covers the candidate lookup (key IN ... GROUP BY ticket) without reading the table
+        indexes = [models.Index(fields=['key', 'ticket'])]
+
+
+class MailboxCheckpoint(models.Model):
+    """How far ingest_mail has read a mailbox (see tickets/inbound_mail.py)."""
+    path = models.CharField(max_length=500, unique=True)
+    # Byte offset of the first unread message in an mbox file, and the file's
+    # inode, so that a rotated mailbox is read from the start
+    offset = models.BigIntegerField(default=0)
+    inode = models.BigIntegerField(null=True, blank=True)
+    messages_read = models.PositiveIntegerField(default=0)
+    messages_added = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.path
+
+
+class PendingNotification(models.Model):
+    """
+    A notification event held back for NOTIFICATION_COALESCE_SECONDS so that
+    events for the same recipient and ticket go out as one email (see
+    send_pending_notifications in tickets/notifications.py).
+    """
+    recipient = models.EmailField()
+    ticket = models.ForeignKey(Ticket, on_delete=models.CASCADE, related_name='pending_notifications')
+    kind = models.CharField(max_length=20)
+    subject = models.CharField(max_length=200)
+    details = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['recipient', 'ticket', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.kind} for {self.recipient} on {self.ticket_id}"
+
+
+class TechnicianSkill(models.Model):
+    """A subtype, or one item within it, that skill routing sends to a technician (see tickets/assignment.py)."""
+    technician = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='skills')
+    subtype = models.CharField(max_length=3)
+    item = models.CharField(max_length=50, blank=True)  # Blank for the whole subtype
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['technician', 'subtype', 'item'], name='unique_technician_skill')]
+
+    def __str__(self):
+        return f"{self.technician} - {self.subtype} {self.item}".strip()
+
+
+class TechnicianWorkload(models.Model):
+    """
+    A technician's open ticket count as auto-assignment sees it. Recounted
+    when older than ASSIGNMENT_COUNT_MAX_AGE and bumped on every automatic
+    assignment in between, so decisions don't count tickets.
+    """
+    technician = models.OneToOneField(
+        get_user_model(), on_delete=models.CASCADE, primary_key=True, related_name='workload',
+    )
+    open_tickets = models.PositiveIntegerField(default=0)
+    last_assigned_at = models.DateTimeField(null=True, blank=True)
+    counted_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.technician}: {self.open_tickets} open"
+
+
+class CatalogType(models.Model):
+    """A ticket type. Tickets store the code, so it never changes (see tickets/catalog.py)."""
+    code = models.CharField(max_length=3, unique=True, validators=[validate_slug])
+    label = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)  # Offered on the ticket forms
+
+    class Meta:
+        ordering = ['position', 'code']
+
+    def __str__(self):
+        return self.label
+
+
+class CatalogSubtype(models.Model):
+    """A ticket subtype, the group its items are chosen from."""
+    code = models.CharField(max_length=3, unique=True, validators=[validate_slug])
+    label = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['position', 'code']
+
+    def __str__(self):
+        return self.label
+
+
+class CatalogItem(models.Model):
+    """A ticket item within a subtype. Codes are only unique per subtype."""
+    subtype = models.ForeignKey(CatalogSubtype, on_delete=models.PROTECT, related_name='items')
+    code = models.CharField(max_length=50, validators=[validate_slug])
+    label = models.CharField(max_length=100)
+    position = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ['subtype', 'position', 'code']
+        constraints = [models.UniqueConstraint(fields=['subtype', 'code'], name='unique_catalog_item')]
+
+    def __str__(self):
+        return f"{self.subtype.code} {self.label}"
+
+
+class CatalogVersion(models.Model):
+    """The catalog's version: one row, changed by every edit (see tickets/catalog.py)."""
+    version = models.BigIntegerField()
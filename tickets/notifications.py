@@ -1,11 +1,52 @@
-from django.core.mail import send_mail
+import datetime
+
+from django.core.mail import EmailMultiAlternatives, get_connection, send_mail
+from django.db import transaction
+from django.db.models import Min
 from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.html import strip_tags
 from django.conf import settings as django_settings
 from accounts.models import Settings
-from .models import Ticket
+from .models import PendingNotification, Ticket, TicketStatus
 from django.conf import settings as django_settings
 from accounts.utils import update_email_settings
+from monitoring import metrics
+from monitoring.metrics import registry
+
+notification_events = registry.counter(
+    'helpdesk_notification_events_total', 'Notification events raised, before coalescing.', ('kind',),
+)
+# Shared: with coalescing on, most emails are sent by the send_notifications worker
+notification_emails = registry.counter(
+    'helpdesk_notification_emails_total', 'Notification emails sent, by every process.', ('template',), shared=True,
+)
+
+# Groups of pending notifications sent per connection by send_pending_notifications
+FLUSH_BATCH_SIZE = 200
+
+
+def _render_email(subject, template_name, context, recipient):
+    context['site_url'] = django_settings.SITE_URL
+    html_message = render_to_string(f'tickets/email/{template_name}.html', context)
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=strip_tags(html_message),
+        from_email=django_settings.DEFAULT_FROM_EMAIL,
+        to=[recipient],
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def _send_messages(messages, template_name):
+    """Send rendered emails over a single connection."""
+    if not messages:
+        return
+    with metrics.timer('email'):
+        get_connection(fail_silently=False).send_messages(messages)
+    registry.inc(notification_emails, (template_name,), len(messages))
 
 class NotificationManager:
     """
@@ -21,10 +62,13 @@ class NotificationManager:
         'ticket_resolved': 'Ticket Resolution',
     }
 
-    def __init__(self):
-        self.settings = Settings.objects.first()
-        if not self.settings:
-            self.settings = Settings.objects.create()
+    @cached_property
+    def settings(self):
+        # Loaded on first use: pages build a manager up front but most requests notify nobody
+        settings = Settings.objects.first()
+        if not settings:
+            settings = Settings.objects.create()
+        return settings
 
     def _should_send_notification(self, notification_type):
         """Check if notification should be sent based on settings."""
@@ -40,13 +84,49 @@ class NotificationManager:
         html_message = render_to_string(f'tickets/email/{template_name}.html', context)
         plain_message = strip_tags(html_message)
 
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=django_settings.DEFAULT_FROM_EMAIL,
-            recipient_list=recipient_list,
-            html_message=html_message,
-            fail_silently=False,
+        def send():
+            with metrics.timer('email'):
+                send_mail(
+                    subject=subject,
+                    message=plain_message,
+                    from_email=django_settings.DEFAULT_FROM_EMAIL,
+                    recipient_list=recipient_list,
+                    html_message=html_message,
+                    fail_silently=False,
+                )
+            registry.inc(notification_emails, (template_name,))
+
+        # Write views run in a transaction (helpdesk.db.retry_on_locked). Sending
+        # after commit keeps the write lock free while talking to the mail server
+        # and means a rolled-back or retried request sends nothing.
+        transaction.on_commit(send)
+
+    def _send_batch(self, subject, template_name, contexts):
+        """
+        Send one templated email per recipient ({recipient: context}) over a
+        single connection, after commit.
+        """
+        update_email_settings()
+        messages = [
+            _render_email(subject, template_name, context, recipient)
+            for recipient, context in contexts.items()
+        ]
+        transaction.on_commit(lambda: _send_messages(messages, template_name))
+
+    def _notify(self, kind, ticket, recipients, subject, template_name, context, details):
+        """
+        Send a notification now, or with NOTIFICATION_COALESCE_SECONDS set,
+        queue it to be combined with the recipient's other events on the
+        same ticket. `details` is what the combined email shows of it.
+        """
+        recipients = list(dict.fromkeys(recipients))
+        registry.inc(notification_events, (kind,), len(recipients))
+        if not django_settings.NOTIFICATION_COALESCE_SECONDS:
+            self._send_email(subject, template_name, context, recipients)
+            return
+        PendingNotification.objects.bulk_create(
+            PendingNotification(recipient=recipient, ticket=ticket, kind=kind, subject=subject, details=details)
+            for recipient in recipients
         )
 
     def notify_ticket_created(self, ticket):
@@ -56,11 +136,12 @@ class NotificationManager:
             'access_code': ticket.access_code,
         }
         if django_settings.EMAIL_HOST_PASSWORD: # Check if setup
-            self._send_email(
+            self._notify(
+                'ticket_created', ticket, [ticket.requestor_email],
                 subject=f'Ticket Created - {ticket.ticket_number}',
                 template_name='ticket_created',
                 context=context,
-                recipient_list=[ticket.requestor_email]
+                details={},
             )
 
     def notify_status_changed(self, ticket, old_status):
@@ -78,11 +159,12 @@ class NotificationManager:
                 'new_status': new_status_display,
             }
             if django_settings.EMAIL_HOST_PASSWORD: # Check if setup
-                self._send_email(
+                self._notify(
+                    'status_changed', ticket, [ticket.requestor_email],
                     subject=f'Ticket Status Updated - {ticket.ticket_number}',
                     template_name='status_changed',
                     context=context,
-                    recipient_list=[ticket.requestor_email]
+                    details={'old_status': old_status_display, 'new_status': new_status_display},
                 )
 
     def notify_new_message(self, ticket, message):
@@ -94,16 +176,34 @@ class NotificationManager:
             }
             # Determine recipient based on message sender
             if message.is_from_requestor and ticket.assigned_to:
+                if self.settings.technician_digest:
+                    # Covered by the next digest (send_technician_digests)
+                    registry.inc(notification_events, ('new_message',))
+                    return
                 recipient = ticket.assigned_to.email
             else:
                 recipient = ticket.requestor_email
             if django_settings.EMAIL_HOST_PASSWORD: # Check if setup
-                self._send_email(
+                sender = message.sender.get_full_name() if message.sender else message.sender_email
+                details = {'sender': sender, 'content': message.content}
+                self._notify(
+                    'new_message', ticket, [recipient],
                     subject=f'New Message on Ticket {ticket.ticket_number}',
                     template_name='new_message',
                     context=context,
-                    recipient_list=[recipient]
+                    details=details,
                 )
+                if not message.is_from_requestor:
+                    # Requestors of tickets merged into this one follow it through
+                    # their own ticket number and access code (see tickets/merge.py)
+                    for source in ticket.merged_tickets.all():
+                        self._notify(
+                            'new_message', source, [source.requestor_email],
+                            subject=f'New Message on Ticket {source.ticket_number}',
+                            template_name='new_message',
+                            context={'ticket': source, 'message': message, 'merged_into': ticket},
+                            details=details,
+                        )
 
     def notify_ticket_assigned(self, ticket, old_technician=None):
         """Send notification for ticket assignment changes."""
@@ -118,9 +218,128 @@ class NotificationManager:
                 recipients.append(ticket.assigned_to.email)
             
             if django_settings.EMAIL_HOST_PASSWORD: # Check if setup
-                self._send_email(
+                self._notify(
+                    'ticket_assigned', ticket, recipients,
                     subject=f'Ticket Assignment Updated - {ticket.ticket_number}',
                     template_name='ticket_assigned',
                     context=context,
-                    recipient_list=recipients
+                    details={'old_technician': context['old_technician'], 'new_technician': context['new_technician']},
                 )
+
+    def notify_tickets_merged(self, target, sources):
+        """Tell the requestors of merged tickets where their conversation continues, in one batch."""
+        contexts = {}
+        for source in sources:
+            context = contexts.setdefault(source.requestor_email.lower(), {
+                'requestor_name': source.requestor_name,
+                'requestor_email': source.requestor_email,
+                'tickets': [],
+                'target': target,
+            })
+            context['tickets'].append(source)
+        registry.inc(notification_events, ('tickets_merged',), len(contexts))
+        if contexts and django_settings.EMAIL_HOST_PASSWORD: # Check if setup
+            self._send_batch(
+                subject=f'Tickets Merged into {target.ticket_number}',
+                template_name='tickets_merged',
+                contexts=contexts,
+            )
+
+    def notify_tickets_reassigned(self, plan, previous):
+        """Tell each requestor, in one email, which of their tickets moved from `previous` and to whom."""
+        if not self._should_send_notification('ticket_assigned'):
+            return
+        contexts = {}
+        for ticket, technician in plan:
+            context = contexts.setdefault(ticket.requestor_email.lower(), {
+                'requestor_name': ticket.requestor_name,
+                'requestor_email': ticket.requestor_email,
+                'old_technician': previous.get_full_name(),
+                'changes': [],
+            })
+            context['changes'].append({
+                'ticket': ticket,
+                'new_technician': technician.get_full_name() if technician else 'Unassigned',
+            })
+        registry.inc(notification_events, ('tickets_reassigned',), len(contexts))
+        if contexts and django_settings.EMAIL_HOST_PASSWORD: # Check if setup
+            self._send_batch(
+                subject='Ticket Assignment Updated',
+                template_name='tickets_reassigned',
+                contexts=contexts,
+            )
+
+
+def send_pending_notifications(window=None, now=None):
+    """
+    Send one email per recipient and ticket whose first queued event is at
+    least `window` seconds (NOTIFICATION_COALESCE_SECONDS) old, covering
+    every event queued for them so far. Returns (events, emails).
+
+    Events are deleted only after their email has gone out, so a failed
+    send is retried on the next run. Run one sender at a time.
+    """
+    if window is None:
+        window = django_settings.NOTIFICATION_COALESCE_SECONDS
+    cutoff = (now or timezone.now()) - datetime.timedelta(seconds=window)
+    due = list(
+        PendingNotification.objects.values('recipient', 'ticket_id').order_by()
+        .annotate(first=Min('created_at')).filter(first__lte=cutoff)
+        .values_list('recipient', 'ticket_id')
+    )
+    update_email_settings()
+    events_sent = emails_sent = 0
+    for start in range(0, len(due), FLUSH_BATCH_SIZE):
+        groups = {key: [] for key in due[start:start + FLUSH_BATCH_SIZE]}
+        ticket_ids = {ticket_id for recipient, ticket_id in groups}
+        for event in PendingNotification.objects.filter(ticket_id__in=ticket_ids).order_by('created_at', 'pk'):
+            if (event.recipient, event.ticket_id) in groups:
+                groups[event.recipient, event.ticket_id].append(event)
+        tickets = Ticket.objects.select_related('assigned_to').in_bulk(ticket_ids)
+
+        messages, sent_ids = [], []
+        for (recipient, ticket_id), events in groups.items():
+            if not events:
+                continue
+            ticket = tickets[ticket_id]
+            subject = events[0].subject if len(events) == 1 else f'{len(events)} Updates on Ticket {ticket.ticket_number}'
+            messages.append(_render_email(subject, 'ticket_updates', {
+                'ticket': ticket,
+                'events': events,
+                'for_requestor': recipient.lower() == ticket.requestor_email.lower(),
+            }, recipient))
+            sent_ids += [event.pk for event in events]
+        _send_messages(messages, 'ticket_updates')
+        PendingNotification.objects.filter(pk__in=sent_ids).delete()
+        events_sent += len(sent_ids)
+        emails_sent += len(messages)
+    return events_sent, emails_sent
+
+
+def send_technician_digests():
+    """
+    Email each technician a list of their assigned tickets with new responses,
+    when Settings.technician_digest is on. Returns (technicians, tickets).
+    """
+    settings = Settings.objects.first()
+    if not (settings and settings.technician_digest):
+        return 0, 0
+    tickets = {}
+    for ticket in (
+        Ticket.objects.filter(has_new_responses=True, assigned_to__isnull=False)
+        .exclude(status=TicketStatus.CLOSED)
+        .select_related('assigned_to').order_by('-last_activity_at')
+    ):
+        tickets.setdefault(ticket.assigned_to, []).append(ticket)
+    update_email_settings()
+    messages = [
+        _render_email(
+            f'Your {len(assigned)} Ticket{"s" if len(assigned) != 1 else ""} with New Responses',
+            'technician_digest',
+            {'technician': technician, 'tickets': assigned},
+            technician.email,
+        )
+        for technician, assigned in tickets.items() if technician.email
+    ]
+    _send_messages(messages, 'technician_digest')
+    return len(messages), sum(len(assigned) for assigned in tickets.values())
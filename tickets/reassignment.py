@@ -0,0 +1,97 @@
+"""
+Moving a technician's open tickets elsewhere in one go: when they are
+deleted or deactivated, or from Rebalance Workload on Manage Users.
+
+The tickets can be unassigned (back to New), given to one technician, or
+spread over the other active technicians with the automatic assignment
+policy (see tickets/assignment.py): by skill when assignment by skill is
+on, otherwise fewest open tickets first.
+
+plan_reassignment only decides, so the same plan can be previewed.
+reassign_tickets applies it with a single UPDATE, whatever the number of
+tickets or technicians, and sends each requestor one email listing all of
+their tickets that moved.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from accounts.models import Settings
+
+from .assignment import OPEN_STATUSES, Strategy, current_workloads, forget_workloads, pick_technician, technician_skills
+from .models import Ticket, TicketStatus
+from .notifications import NotificationManager
+
+
+def open_tickets(user):
+    return Ticket.objects.filter(assigned_to=user, status__in=OPEN_STATUSES)
+
+
+def plan_reassignment(user, to=None, spread=False):
+    """
+    [(ticket, new technician or None)] for each of `user`'s open tickets,
+    oldest first: all to `to`, spread over the other active technicians,
+    or (neither given) unassigned.
+    """
+    tickets = list(
+        open_tickets(user).only('id', 'ticket_number', 'title', 'status', 'subtype', 'item', 'requestor_email',
+                                'requestor_name', 'access_code', 'assigned_to').order_by('time_created', 'pk')
+    )
+    if not spread:
+        return [(ticket, to) for ticket in tickets]
+
+    workloads = current_workloads()
+    workloads.pop(user.pk, None)
+    if not workloads:
+        return [(ticket, None) for ticket in tickets]
+    settings = Settings.objects.first()
+    strategy = Strategy.SKILLS if settings and settings.auto_assignment == Strategy.SKILLS else Strategy.LEAST_OPEN
+    skills = technician_skills() if strategy == Strategy.SKILLS else None
+    technicians = get_user_model().objects.in_bulk(list(workloads))
+    plan = []
+    for ticket in tickets:
+        technician_id = pick_technician(strategy, ticket.subtype, ticket.item, workloads, skills)
+        # Counted in memory only; the rows are recounted after the move
+        workloads[technician_id].open_tickets += 1
+        plan.append((ticket, technicians[technician_id]))
+    return plan
+
+
+def reassign_tickets(user, to=None, spread=False, notify=True):
+    """Apply plan_reassignment(user, to, spread) and return the plan."""
+    with transaction.atomic():
+        plan = plan_reassignment(user, to, spread)
+        if not plan:
+            return plan
+        targets, unassigned = {}, []
+        for ticket, technician in plan:
+            if technician is None:
+                unassigned.append(ticket.pk)
+            else:
+                targets.setdefault(technician.pk, []).append(ticket.pk)
+
+        Ticket.objects.filter(pk__in=[ticket.pk for ticket, technician in plan], assigned_to=user).update(
+            assigned_to=Case(
+                *[When(pk__in=ticket_ids, then=Value(technician_id)) for technician_id, ticket_ids in targets.items()],
+                default=None, output_field=IntegerField(),
+            ),
+            # Unassigned tickets go back to the pool; moved ones keep their progress
+            status=Case(
+                When(pk__in=unassigned, then=Value(TicketStatus.NEW)),
+                When(status=TicketStatus.NEW, then=Value(TicketStatus.ASSIGNED)),
+                default=F('status'),
+            ),
+            updated_at=timezone.now(),
+        )
+        forget_workloads([user.pk, *targets])
+
+        for ticket, technician in plan:
+            ticket.assigned_to = technician
+            if technician is None:
+                ticket.status = TicketStatus.NEW
+            elif ticket.status == TicketStatus.NEW:
+                ticket.status = TicketStatus.ASSIGNED
+        if notify:
+            NotificationManager().notify_tickets_reassigned(plan, user)
+    return plan
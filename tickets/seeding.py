@@ -0,0 +1,217 @@
+"""
+Synthetic data generation for benchmarks, load tests and query budget tests.
+
+Everything is inserted with bulk_create in batches, so 100k tickets take
+seconds rather than the minutes individual saves would need. Rebuilding
+the similarity index afterwards adds about half a millisecond per ticket.
+"""
+import datetime
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from assets.models import Asset, AssetType
+from .catalog import get_catalog
+from .models import generate_ticket_number, Ticket, TicketAttachment, TicketMessage, TicketStatus
+from .security import generate_access_code
+from .similarity import rebuild_index as rebuild_similarity_index
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+
+# Password for every seeded technician, so load tests can sign in
+SEED_PASSWORD = 'Seeded-Technician-Password-1!'
+
+FIRST_NAMES = ['Alex', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn', 'Drew']
+LAST_NAMES = ['Smith', 'Johnson', 'Brown', 'Davis', 'Miller', 'Wilson', 'Moore', 'Clark', 'Hall', 'Young']
+BUILDINGS = ['Nicks Hall', 'Gilbreath Hall', 'Brown Hall', 'Lamb Hall', 'Sherrod Library']
+PROBLEMS = [
+    'is not working', 'keeps disconnecting', 'shows an error on startup', 'is very slow',
+    'needs to be set up', 'will not turn on', 'needs an update', 'stopped responding',
+]
+ASSET_NAMES = {
+    AssetType.AV: 'Control Panel', AssetType.COMPUTER: 'Dell OptiPlex', AssetType.MONITOR: 'Dell Monitor',
+    AssetType.NETWORK: 'Cisco Switch', AssetType.PERIPHERAL: 'Logitech Webcam', AssetType.PRINTER: 'HP LaserJet',
+    AssetType.PROJECTOR: 'Epson Projector', AssetType.SERVER: 'PowerEdge Server',
+    AssetType.SOFTWARE: 'License Key', AssetType.OTHER: 'Misc Equipment',
+}
+
+# Open tickets are the minority in a system that has been running for a while
+STATUS_WEIGHTS = {
+    TicketStatus.NEW: 5, TicketStatus.ASSIGNED: 5, TicketStatus.IN_PROGRESS: 5,
+    TicketStatus.WAITING: 3, TicketStatus.RESOLVED: 12, TicketStatus.CLOSED: 70,
+}
+
+SEED_ATTACHMENT_COUNT = 5
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Temporarily disable auto_now_add so seeded rows can be backdated."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field, _ in saved:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def _attachment_names():
+    """Create a handful of small files that all seeded attachments point at."""
+    names = []
+    for i in range(SEED_ATTACHMENT_COUNT):
+        name = f'ticket_attachments/seed/screenshot-{i}.txt'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(f'Seeded attachment {i}\n'.encode()))
+        names.append(name)
+    return names
+
+
+def seed_technicians(count, rng):
+    password = make_password(SEED_PASSWORD)  # Hash once, it is deliberately slow
+    existing = User.objects.filter(username__startswith='seed-tech-').count()
+    users = []
+    for i in range(existing, existing + count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        users.append(User(
+            username=f'seed-tech-{i}',
+            email=f'seed-tech-{i}@etsu.edu',
+            first_name=first,
+            last_name=last,
+            password=password,
+            user_type=User.UserType.TECHNICIAN,
+            department='Computing',
+        ))
+    User.objects.bulk_create(users, batch_size=BATCH_SIZE)
+    return list(User.objects.filter(username__startswith='seed-tech-'))
+
+
+def seed_assets(count, rng):
+    existing = Asset.objects.filter(inventory_number__startswith='SEED').count()
+    assets = []
+    for i in range(existing, existing + count):
+        asset_type = rng.choice(AssetType.values)
+        assets.append(Asset(
+            inventory_number=f'SEED{i:07d}',
+            name=f'{ASSET_NAMES[asset_type]} {i}',
+            type=asset_type,
+            location=f'{rng.choice(BUILDINGS)} {rng.randint(100, 499)}',
+            details='Seeded asset',
+            purchase_date=datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randint(0, 3600)),
+        ))
+    Asset.objects.bulk_create(assets, batch_size=BATCH_SIZE)
+    return list(Asset.objects.filter(inventory_number__startswith='SEED').values_list('id', flat=True))
+
+
+def _next_ticket_numbers(year):
+    """Continue numbering after the highest existing ticket of the given year."""
+    return int(generate_ticket_number(year).split('-')[1])
+
+
+def seed_tickets(count, technicians, asset_ids, rng, messages_per_ticket=3, attachment_ratio=0.2, days=3 * 365):
+    """
+    Create tickets spread over the last `days` days and across the
+    type/subtype/item taxonomy, with messages, attachments and asset links.
+    """
+    now = timezone.now()
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    catalog = get_catalog()
+    types = [code for code, label in catalog.type_choices]
+    subtypes = [(subtype, items) for subtype, items in catalog.item_choices.items() if items]
+    attachment_names = _attachment_names() if attachment_ratio else []
+
+    # Generate creation times first so ticket numbers follow them within each year
+    created = sorted(now - datetime.timedelta(seconds=rng.randint(0, days * 86400)) for _ in range(count))
+    next_number = {}
+
+    time_created = Ticket._meta.get_field('time_created')
+    message_created = TicketMessage._meta.get_field('created_at')
+    uploaded_at = TicketAttachment._meta.get_field('uploaded_at')
+
+    with explicit_timestamps(time_created, message_created, uploaded_at):
+        for start in range(0, count, BATCH_SIZE):
+            with transaction.atomic():
+                tickets, message_counts = [], []
+                for when in created[start:start + BATCH_SIZE]:
+                    if when.year not in next_number:
+                        next_number[when.year] = _next_ticket_numbers(when.year)
+                    number = next_number[when.year]
+                    next_number[when.year] += 1
+
+                    subtype, items = rng.choice(subtypes)
+                    item_code, item_label = rng.choice(items)
+                    status = rng.choices(statuses, weights)[0]
+                    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+                    assigned = None
+                    if status != TicketStatus.NEW and technicians:
+                        assigned = rng.choice(technicians)
+                    message_count = rng.randint(0, messages_per_ticket * 2)
+                    message_counts.append(message_count)
+                    tickets.append(Ticket(
+                        ticket_number=f'{when.year}-{number}',
+                        access_code=generate_access_code(),
+                        time_created=when,
+                        requestor_email=f'{first}.{last}{rng.randint(1, 300)}@etsu.edu'.lower(),
+                        requestor_name=f'{first} {last}',
+                        title=f'{item_label} {rng.choice(PROBLEMS)}',
+                        description=f'{item_label} in {rng.choice(BUILDINGS)} {rng.choice(PROBLEMS)}.',
+                        type=rng.choice(types),
+                        subtype=subtype,
+                        item=item_code,
+                        status=status,
+                        assigned_to=assigned,
+                        # bulk_create skips TicketMessage.save, so set the counters here
+                        message_count=message_count,
+                        last_activity_at=when + datetime.timedelta(hours=message_count),
+                    ))
+                tickets = Ticket.objects.bulk_create(tickets)
+
+                messages, attachments, links = [], [], []
+                for ticket, message_count in zip(tickets, message_counts):
+                    for i in range(message_count):
+                        from_requestor = i % 2 == 1
+                        messages.append(TicketMessage(
+                            ticket=ticket,
+                            sender=None if from_requestor else ticket.assigned_to,
+                            sender_email=ticket.requestor_email if from_requestor else (
+                                ticket.assigned_to.email if ticket.assigned_to else 'helpdesk@etsu.edu'
+                            ),
+                            content=f'Update {i + 1} on {ticket.title.lower()}.',
+                            created_at=ticket.time_created + datetime.timedelta(hours=i + 1),
+                            is_from_requestor=from_requestor,
+                        ))
+                    if attachment_names and rng.random() < attachment_ratio:
+                        attachments.append(TicketAttachment(
+                            ticket=ticket,
+                            file=rng.choice(attachment_names),
+                            uploaded_at=ticket.time_created,
+                        ))
+                    if asset_ids and rng.random() < 0.5:
+                        links.append(Ticket.assets.through(ticket_id=ticket.id, asset_id=rng.choice(asset_ids)))
+
+                TicketMessage.objects.bulk_create(messages, batch_size=BATCH_SIZE)
+                TicketAttachment.objects.bulk_create(attachments, batch_size=BATCH_SIZE)
+                Ticket.assets.through.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def seed(tickets, technicians=10, assets=None, messages_per_ticket=3, attachment_ratio=0.2, random_seed=0):
+    """Seed a complete data set. Assets default to a tenth of the ticket count."""
+    rng = random.Random(random_seed)
+    if assets is None:
+        assets = max(tickets // 10, 1)
+    technician_users = seed_technicians(technicians, rng)
+    asset_ids = seed_assets(assets, rng)
+    seed_tickets(tickets, technician_users, asset_ids, rng, messages_per_ticket, attachment_ratio)
+    # bulk_create skips the signals that maintain the similarity index
+    for _ in rebuild_similarity_index():
+        pass
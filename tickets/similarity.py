@@ -0,0 +1,321 @@
+"""
+Near-duplicate and similar ticket detection.
+
+A ticket's text (title, description and messages) is reduced to its set of
+words, less stopwords, and summarized by a MinHash signature of NUM_PERM
+values. The fraction of positions where two signatures agree
+estimates the Jaccard similarity of the two word sets. (Word pairs were
+tried as well; they made reworded reports of the same problem look less
+alike than reports of the same problem in different rooms.)
+
+Each signature is cut into BANDS bands of ROWS values, and each band is
+hashed to a TicketSignatureBand key (locality-sensitive hashing). Finding
+candidates is therefore an indexed lookup of BANDS keys, not a scan of
+every ticket, and only the candidates' signatures are compared. With 20
+bands of 3 rows, tickets that are 50% similar become candidates about 93%
+of the time, and 10% similar ones about 2% of the time.
+
+Signals keep the index current:
+* A new ticket is indexed when it is saved.
+* The MinHash of a union is the element-wise minimum of the MinHashes, so a
+  new message is merged into its ticket's signature without re-reading the
+  thread.
+rebuild_index() (the rebuild_similarity_index command) recomputes
+everything, for example after bulk loads that skip signals.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.signals import post_save
+
+from .models import Ticket, TicketMessage, TicketSignature, TicketSignatureBand, TicketStatus
+
+BANDS = 20
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+
+# Estimated Jaccard similarity above which an open ticket from the same
+# requestor, asset or item is flagged as a probable duplicate
+DUPLICATE_THRESHOLD = 0.5
+# ...and above which a resolved ticket is suggested on manage_ticket
+SIMILAR_THRESHOLD = 0.3
+SIMILAR_LIMIT = 5
+# Candidates with the most matching bands that are scored per lookup
+MAX_CANDIDATES = 200
+
+# One random (a*h + b) % p permutation per signature position. Cheaper
+# XOR masks were tried, but were noticeably less accurate on texts as short
+# as most tickets. Fixed so that signatures stay comparable across processes
+# and restarts.
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x7E1C37)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_PACK = struct.Struct(f'>{NUM_PERM}Q')
+
+_WORD = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+    a an and are as at be been but by can could did do does for from had has have
+    hello hi i if in into is it its me my of on or our please so that the their them
+    then there this to was we were what when which will with would you your
+""".split())
+
+
+def _hash(text):
+    """A stable 63-bit hash (Python's hash() differs between processes)."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big') >> 1
+
+
+def shingles(text):
+    return set(_WORD.findall(text.lower())) - STOPWORDS
+
+
+def minhash(text):
+    """The MinHash signature of `text`, or None if it has no words."""
+    hashes = [_hash(word) for word in shingles(text)]
+    if not hashes:
+        return None
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def merge(signature, other):
+    """The signature of the union of two texts."""
+    if signature is None or other is None:
+        return signature or other
+    return [min(x, y) for x, y in zip(signature, other)]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return sum(x == y for x, y in zip(signature, other)) / NUM_PERM
+
+
+def band_keys(signature):
+    return [
+        _hash(f'{band}:' + ','.join(map(str, signature[band * ROWS:(band + 1) * ROWS])))
+        for band in range(BANDS)
+    ]
+
+
+def pack(signature):
+    return _PACK.pack(*signature)
+
+
+def unpack(data):
+    return list(_PACK.unpack(bytes(data)))
+
+
+def _source_hash(ticket):
+    return _hash(f'{ticket.title}\n{ticket.description}')
+
+
+def ticket_signature(ticket, message_texts=None):
+    """Compute a ticket's signature from its title, description and messages."""
+    if message_texts is None:
+        message_texts = ticket.messages.values_list('content', flat=True)
+    return minhash('\n'.join([ticket.title, ticket.description, *message_texts]))
+
+
+def _store(ticket_id, signature, source_hash):
+    if signature is None:
+        TicketSignature.objects.filter(ticket_id=ticket_id).delete()
+        TicketSignatureBand.objects.filter(ticket_id=ticket_id).delete()
+        return
+    TicketSignature.objects.update_or_create(
+        ticket_id=ticket_id, defaults={'minhash': pack(signature), 'source_hash': source_hash},
+    )
+    TicketSignatureBand.objects.filter(ticket_id=ticket_id).delete()
+    TicketSignatureBand.objects.bulk_create(
+        TicketSignatureBand(ticket_id=ticket_id, key=key) for key in band_keys(signature)
+    )
+
+
+def index_ticket(ticket):
+    signature = ticket_signature(ticket)
+    _store(ticket.pk, signature, _source_hash(ticket))
+    return signature
+
+
+def add_message(message):
+    """Merge a new message into its ticket's signature."""
+    stored = TicketSignature.objects.filter(ticket_id=message.ticket_id).first()
+    if stored is None:
+        # Never indexed (e.g. bulk loaded): index the whole thread
+        index_ticket(message.ticket)
+        return
+    signature = unpack(stored.minhash)
+    merged = merge(signature, minhash(message.content))
+    if merged != signature:
+        _store(message.ticket_id, merged, stored.source_hash)
+
+
+def add_messages(messages):
+    """Merge messages inserted with bulk_create (which sends no signals) into their tickets' signatures."""
+    texts = {}
+    for message in messages:
+        texts.setdefault(message.ticket_id, []).append(message.content)
+    stored = {row.ticket_id: row for row in TicketSignature.objects.filter(ticket_id__in=texts)}
+    for ticket_id, contents in texts.items():
+        row = stored.get(ticket_id)
+        if row is None:
+            index_ticket(Ticket.objects.get(pk=ticket_id))
+            continue
+        signature = unpack(row.minhash)
+        merged = merge(signature, minhash('\n'.join(contents)))
+        if merged != signature:
+            _store(ticket_id, merged, row.source_hash)
+
+
+def merge_ticket_signatures(target, source_ids):
+    """Fold merged tickets' signatures into the target's and drop theirs (see tickets/merge.py)."""
+    stored = {
+        row.ticket_id: unpack(row.minhash)
+        for row in TicketSignature.objects.filter(ticket_id__in=[target.pk, *source_ids])
+    }
+    if len(stored) == len(source_ids) + 1:
+        signature = stored.pop(target.pk)
+        for other in stored.values():
+            signature = merge(signature, other)
+        _store(target.pk, signature, _source_hash(target))
+    else:
+        # Something was never indexed: read the combined thread instead
+        index_ticket(target)
+    TicketSignatureBand.objects.filter(ticket_id__in=source_ids).delete()
+    TicketSignature.objects.filter(ticket_id__in=source_ids).delete()
+
+
+def _ticket_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        index_ticket(instance)
+    elif update_fields is None or {'title', 'description'} & set(update_fields):
+        source_hash = TicketSignature.objects.filter(ticket_id=instance.pk).values_list('source_hash', flat=True).first()
+        if source_hash != _source_hash(instance):
+            index_ticket(instance)
+
+
+def _message_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add_message(instance)
+
+
+def connect_signals():
+    post_save.connect(_ticket_saved, sender=Ticket, dispatch_uid='ticket_similarity')
+    post_save.connect(_message_saved, sender=TicketMessage, dispatch_uid='ticket_similarity')
+
+
+def signature_for(ticket):
+    """The stored signature, or one computed on the fly for unindexed tickets."""
+    stored = TicketSignature.objects.filter(ticket_id=ticket.pk).values_list('minhash', flat=True).first()
+    return unpack(stored) if stored is not None else ticket_signature(ticket)
+
+
+def similar_tickets(ticket, queryset=None, threshold=SIMILAR_THRESHOLD, limit=SIMILAR_LIMIT, signature=None):
+    """
+    Tickets from `queryset` whose text is at least `threshold` similar to
+    `ticket`'s, as (ticket, score) pairs, most similar first.
+    """
+    if signature is None:
+        signature = signature_for(ticket)
+    if signature is None:
+        return []
+    # Tickets sharing the most bands are the most likely to be similar. Only
+    # tickets from `queryset` compete for the MAX_CANDIDATES places.
+    bands = TicketSignatureBand.objects.filter(key__in=band_keys(signature)).exclude(ticket_id=ticket.pk)
+    if queryset is not None:
+        bands = bands.filter(ticket__in=queryset.values('pk'))
+    best = (
+        bands.values('ticket_id').annotate(hits=Count('id')).order_by('-hits')
+        .values_list('ticket_id', flat=True)[:MAX_CANDIDATES]
+    )
+
+    scored = []
+    candidates = (
+        Ticket.objects.filter(pk__in=best).select_related('signature')
+        .only('ticket_number', 'title', 'status', 'signature__minhash')
+    )
+    for candidate in candidates:
+        score = similarity(signature, unpack(candidate.signature.minhash))
+        if score >= threshold:
+            scored.append((candidate, score))
+    scored.sort(key=lambda pair: pair[1], reverse=True)
+    return scored[:limit]
+
+
+def similar_resolved_tickets(ticket):
+    """Past tickets whose resolution might help with this one, for manage_ticket."""
+    resolved = Ticket.objects.filter(status__in=[TicketStatus.RESOLVED, TicketStatus.CLOSED])
+    return similar_tickets(ticket, resolved)
+
+
+def flag_probable_duplicate(ticket):
+    """
+    Look for an open ticket from the same requestor, or about the same asset
+    or item, with nearly the same text. Record it on `ticket` and return it.
+    """
+    related = Q(requestor_email__iexact=ticket.requestor_email) | Q(item=ticket.item)
+    asset_ids = list(ticket.assets.values_list('id', flat=True))
+    if asset_ids:
+        related |= Q(assets__in=asset_ids)
+    open_tickets = (
+        Ticket.objects.exclude(status__in=[TicketStatus.RESOLVED, TicketStatus.CLOSED])
+        .filter(related).distinct()
+    )
+    matches = similar_tickets(ticket, open_tickets, threshold=DUPLICATE_THRESHOLD, limit=1)
+    if not matches:
+        return None
+    original = matches[0][0]
+    # The earliest report stays the original
+    original = original.possible_duplicate_of or original
+    ticket.possible_duplicate_of = original
+    Ticket.objects.filter(pk=ticket.pk).update(possible_duplicate_of=original)
+    return original
+
+
+def rebuild_index(batch_size=1000):
+    """
+    Recompute every signature from scratch, one batch of tickets per query.
+    Yields the number of tickets indexed so far after each batch.
+    """
+    with transaction.atomic():
+        TicketSignatureBand.objects.all().delete()
+        TicketSignature.objects.all().delete()
+    done = 0
+    last_id = 0
+    while True:
+        tickets = list(
+            Ticket.objects.filter(pk__gt=last_id).order_by('pk').only('id', 'title', 'description')[:batch_size]
+        )
+        if not tickets:
+            return
+        last_id = tickets[-1].pk
+        texts = {ticket.pk: [] for ticket in tickets}
+        for ticket_id, content in TicketMessage.objects.filter(
+            ticket_id__in=texts,
+        ).values_list('ticket_id', 'content'):
+            texts[ticket_id].append(content)
+
+        signatures, bands = [], []
+        for ticket in tickets:
+            signature = ticket_signature(ticket, texts[ticket.pk])
+            if signature is None:
+                continue
+            signatures.append(TicketSignature(
+                ticket_id=ticket.pk, minhash=pack(signature), source_hash=_source_hash(ticket),
+            ))
+            bands.extend((ticket.pk, key) for key in band_keys(signature))
+        with transaction.atomic():
+            TicketSignature.objects.bulk_create(signatures, batch_size=500)
+            # Twenty rows per ticket: skip building model instances for them
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {connection.ops.quote_name(TicketSignatureBand._meta.db_table)} '
+                    f'(ticket_id, {connection.ops.quote_name("key")}) VALUES (%s, %s)',
+                    bands,
+                )
+        done += len(tickets)
+        yield done
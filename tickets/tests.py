@@ -1,3 +1,735 @@
-from django.test import TestCase
+import gzip
+import io
+import mailbox
+import os
+import shutil
+import tempfile
+from email.message import EmailMessage
 
-# Create your tests here.
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.conf import settings
+from django.core import mail
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Settings
+from helpdesk import throttle
+from helpdesk.db import retry_on_locked
+from helpdesk.compression import brotli
+from monitoring.metrics import registry
+
+from . import catalog, similarity
+from .assignment import Strategy, auto_assign, current_workloads
+from .forms import TicketSubmissionForm
+from .inbound_mail import ingest_mailbox, strip_quoted
+from .merge import merge_tickets
+from .archive import archivable_tickets, archive_closed_tickets
+from .models import (
+    CatalogItem, CatalogVersion, MailboxCheckpoint, PendingNotification, TechnicianSkill, TechnicianWorkload, Ticket,
+    TicketAttachment, TicketMessage, TicketStatus,
+)
+from .notifications import NotificationManager, send_pending_notifications
+from .reassignment import plan_reassignment, reassign_tickets
+
+
+def make_mail(number, ticket, sender=None, body=None, attachment=None, **headers):
+    message = EmailMessage()
+    message['From'] = f'Requestor <{sender or ticket.requestor_email}>'
+    message['To'] = 'helpdesk@etsu.edu'
+    message['Subject'] = f'Re: New Message on Ticket {ticket.ticket_number}'
+    message['Message-ID'] = f'<reply-{number}@mail.etsu.edu>'
+    for name, value in headers.items():
+        message[name.replace('_', '-')] = value
+    message.set_content(body or (
+        f'Reply number {number}: the printer in room {number % 50} still jams.\n'
+        '\n'
+        f'On Mon, Oct 19, 2026 at 9:00 AM Helpdesk <helpdesk@etsu.edu> wrote:\n'
+        '> Please try restarting it.\n'
+    ))
+    if attachment:
+        message.add_attachment(attachment, maintype='application', subtype='octet-stream', filename='log.txt')
+    return message
+
+
+class QuotedTextTests(TestCase):
+    def test_strips_quoted_reply(self):
+        text = 'Still broken.\n\nOn Mon, Oct 19, 2026 at 9:00 AM Helpdesk\n<helpdesk@etsu.edu> wrote:\n> Old text\n'
+        self.assertEqual(strip_quoted(text), 'Still broken.')
+
+    def test_strips_outlook_header_block_and_signature(self):
+        self.assertEqual(strip_quoted('Fixed, thanks.\n-- \nJane\n'), 'Fixed, thanks.')
+        text = 'Fixed, thanks.\r\n\r\nFrom: Helpdesk <helpdesk@etsu.edu>\r\nSent: Monday\r\nOld text\r\n'
+        self.assertEqual(strip_quoted(text), 'Fixed, thanks.')
+
+    def test_drops_inline_quote_lines(self):
+        self.assertEqual(strip_quoted('> Did you restart it?\nYes, twice.'), 'Yes, twice.')
+
+
+class InboundMailTests(TestCase):
+    EMAILS = 2000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tickets = [
+            Ticket.objects.create(
+                requestor_email=f'user{i}@etsu.edu', requestor_name=f'User {i}', title='Printer jams',
+                description='The printer jams on every page.', type='INC', subtype='PRT', item='printer',
+            )
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        media = override_settings(MEDIA_ROOT=os.path.join(self.directory, 'media'))
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def mbox(self, mails, name='inbox'):
+        path = os.path.join(self.directory, name)
+        box = mailbox.mbox(path)
+        for mail in mails:
+            box.add(mail)
+        box.close()
+        return path
+
+    def maildir(self, mails):
+        path = os.path.join(self.directory, 'Maildir')
+        box = mailbox.Maildir(path)
+        for mail in mails:
+            box.add(mail)
+        return path
+
+    def replies(self, start, count):
+        return [make_mail(number, self.tickets[number % len(self.tickets)]) for number in range(start, start + count)]
+
+    def ingest(self, path, **kwargs):
+        totals = {}
+        for totals in ingest_mailbox(path, **kwargs):
+            pass
+        return totals
+
+    def test_mbox_is_read_once_and_resumed_from_checkpoint(self):
+        path = self.mbox(self.replies(0, self.EMAILS))
+        with CaptureQueriesContext(connection) as queries:
+            totals = self.ingest(path, batch_size=500)
+        self.assertEqual(totals['read'], self.EMAILS)
+        self.assertEqual(totals['added'], self.EMAILS)
+        # Queries per batch and ticket, not per email
+        self.assertLess(len(queries), self.EMAILS / 3)
+
+        ticket = Ticket.objects.get(pk=self.tickets[0].pk)
+        self.assertEqual(ticket.message_count, self.EMAILS // len(self.tickets))
+        self.assertEqual(ticket.messages.count(), ticket.message_count)
+        self.assertTrue(ticket.has_new_responses)
+        message = ticket.messages.first()
+        self.assertTrue(message.is_from_requestor)
+        self.assertEqual(message.sender_email, ticket.requestor_email)
+        self.assertNotIn('restarting', message.content)
+
+        checkpoint = MailboxCheckpoint.objects.get(path=path)
+        self.assertEqual(checkpoint.offset, os.path.getsize(path))
+        self.assertEqual(checkpoint.messages_added, self.EMAILS)
+
+        # Nothing is read again; only mail delivered since is added
+        self.assertEqual(self.ingest(path), {})
+        self.mbox(self.replies(self.EMAILS, 10))
+        totals = self.ingest(path)
+        self.assertEqual((totals['read'], totals['added']), (10, 10))
+        self.assertEqual(TicketMessage.objects.count(), self.EMAILS + 10)
+
+    def test_mbox_message_being_delivered_is_left_for_later(self):
+        path = self.mbox(self.replies(0, 3))
+        with open(path, 'ab') as fp:
+            fp.write(b'From user0@etsu.edu Mon Oct 19 09:00:00 2026\nFrom: user0@etsu.edu\nSubject: Re: ' +
+                     self.tickets[0].ticket_number.encode() + b'\n\nHalf writ')
+        self.assertEqual(self.ingest(path)['added'], 3)
+        with open(path, 'ab') as fp:
+            fp.write(b'ten\n\n')
+        self.assertEqual(self.ingest(path)['added'], 1)
+
+    def test_rotated_mbox_is_read_from_the_start(self):
+        path = self.mbox(self.replies(0, 5))
+        self.ingest(path)
+        os.remove(path)
+        self.mbox(self.replies(5, 2))
+        totals = self.ingest(path)
+        self.assertEqual((totals['read'], totals['added']), (2, 2))
+
+    def test_maildir_messages_are_moved_to_cur(self):
+        path = self.maildir(self.replies(0, self.EMAILS))
+        totals = self.ingest(path, batch_size=500)
+        self.assertEqual(totals['added'], self.EMAILS)
+        self.assertEqual(os.listdir(os.path.join(path, 'new')), [])
+        self.assertEqual(len(os.listdir(os.path.join(path, 'cur'))), self.EMAILS)
+
+        # As if the process died after committing but before moving the files
+        cur = os.path.join(path, 'cur')
+        for name in sorted(os.listdir(cur))[:50]:
+            shutil.copy(os.path.join(cur, name), os.path.join(path, 'new', name.split(':')[0]))
+        totals = self.ingest(path)
+        self.assertEqual((totals['read'], totals['added'], totals['duplicate']), (50, 0, 50))
+        self.assertEqual(TicketMessage.objects.count(), self.EMAILS)
+
+    def test_only_requestor_replies_are_added(self):
+        ticket = self.tickets[0]
+        path = self.mbox([
+            make_mail(1, ticket, sender='someone.else@etsu.edu'),
+            make_mail(2, ticket, Auto_Submitted='auto-replied'),
+            make_mail(3, ticket, body='> Only quoted text\n'),
+            make_mail(4, ticket, sender=ticket.requestor_email.upper()),
+        ])
+        unknown = make_mail(5, ticket)
+        unknown.replace_header('Subject', 'Re: Ticket 1999-1001 on 2026-10-19')
+        self.mbox([unknown])
+
+        totals = self.ingest(path)
+        self.assertEqual(
+            {reason: totals[reason] for reason in ('added', 'rejected', 'automatic', 'empty', 'unmatched')},
+            {'added': 1, 'rejected': 1, 'automatic': 1, 'empty': 1, 'unmatched': 1},
+        )
+
+    def test_attachments_are_saved(self):
+        ticket = self.tickets[0]
+        path = self.maildir([make_mail(1, ticket, body='Log attached.', attachment=b'paper jam at tray 2')])
+        self.assertEqual(self.ingest(path)['attachments'], 1)
+        attachment = TicketAttachment.objects.get(ticket=ticket)
+        self.assertEqual(attachment.file.read(), b'paper jam at tray 2')
+
+    def test_replies_to_merged_tickets_go_to_the_target(self):
+        target, source = self.tickets[0], self.tickets[1]
+        merge_tickets(target, [source])
+        path = self.mbox([make_mail(1, source), make_mail(2, target, sender=source.requestor_email)])
+        self.assertEqual(self.ingest(path)['added'], 2)
+        self.assertEqual(target.messages.filter(sender_email=source.requestor_email).count(), 2)
+
+
+class MergedTicketTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.technician = get_user_model().objects.create_user(
+            'merge-tech', 'merge-tech@etsu.edu', 'pw', first_name='Tess', last_name='Tech',
+        )
+        cls.target, cls.source = [
+            Ticket.objects.create(
+                requestor_email=f'{name}@etsu.edu', requestor_name=name.title(), title=f'{name.title()}: projector',
+                description=f'{name.title()} says the projector is dead.', type='INC', subtype='LAB', item='projector',
+                status=TicketStatus.IN_PROGRESS,
+            )
+            for name in ('alice', 'bob')
+        ]
+        TicketMessage.objects.create(
+            ticket=cls.target, sender_email='alice@etsu.edu', content='My office number is 4021.', is_from_requestor=True,
+        )
+        TicketMessage.objects.create(
+            ticket=cls.source, sender_email='bob@etsu.edu', content='Still dead on Monday.', is_from_requestor=True,
+        )
+        merge_tickets(cls.target, [cls.source], merged_by=cls.technician)
+        TicketMessage.objects.create(
+            ticket=cls.target, sender=cls.technician, sender_email=cls.technician.email, content='A new lamp is ordered.',
+        )
+
+    def test_merged_requestor_sees_only_their_part_of_the_target(self):
+        response = self.client.get(reverse('view_ticket', args=[self.source.ticket_number, self.source.access_code]))
+        self.assertContains(response, 'Bob says the projector is dead.')
+        self.assertContains(response, 'Still dead on Monday.')
+        self.assertContains(response, 'A new lamp is ordered.')
+        self.assertContains(response, 'In Progress')
+        self.assertNotContains(response, 'Alice says')
+        self.assertNotContains(response, 'office number')
+
+        earlier = reverse('view_ticket_messages', args=[self.source.ticket_number, self.source.access_code])
+        newest = self.target.messages.order_by('-id').first()
+        self.assertNotIn('office number', self.client.get(earlier, {'before': newest.pk}).json()['html'])
+
+    def test_messages_are_labelled_with_their_sender(self):
+        response = self.client.get(reverse('view_ticket', args=[self.target.ticket_number, self.target.access_code]))
+        self.assertContains(response, 'bob@etsu.edu')
+
+    @override_settings(EMAIL_HOST_PASSWORD='secret', NOTIFICATION_COALESCE_SECONDS=60)
+    def test_replies_notify_merged_requestors(self):
+        message = self.target.messages.get(content='A new lamp is ordered.')
+        NotificationManager().notify_new_message(self.target, message)
+        self.assertEqual(
+            set(PendingNotification.objects.values_list('recipient', 'ticket')),
+            {('alice@etsu.edu', self.target.pk), ('bob@etsu.edu', self.source.pk)},
+        )
+
+    def test_old_merged_ticket_stays_hot_while_its_target_is_open(self):
+        Ticket.objects.filter(pk=self.source.pk).update(last_activity_at=timezone.now() - timezone.timedelta(days=400))
+        self.assertEqual(list(archive_closed_tickets(days=30)), [])
+        self.assertTrue(Ticket.objects.filter(pk=self.source.pk).exists())
+
+    def test_merged_tickets_are_archived_with_their_target(self):
+        Ticket.objects.filter(pk=self.target.pk).update(status=TicketStatus.CLOSED)
+        cutoff = timezone.now() + timezone.timedelta(days=1)
+        self.assertEqual(set(archivable_tickets(cutoff)), {self.target, self.source})
+        Ticket.objects.filter(pk=self.source.pk).update(status=TicketStatus.IN_PROGRESS)
+        self.assertEqual(list(archivable_tickets(cutoff)), [])
+        Ticket.objects.filter(pk=self.source.pk).update(status=TicketStatus.CLOSED)
+
+        # One ticket per batch: the source still goes with its target
+        self.assertEqual(list(archive_closed_tickets(days=-1, batch_size=1))[-1], 2)
+        self.assertFalse(Ticket.objects.exists())
+        response = self.client.get(reverse('view_ticket', args=[self.source.ticket_number, self.source.access_code]))
+        self.assertContains(response, f'merged into #{self.target.ticket_number}')
+        self.assertContains(response, 'Still dead on Monday.')
+        self.assertContains(response, 'A new lamp is ordered.')
+        self.assertNotContains(response, 'office number')
+        self.assertNotContains(response, 'No messages.')
+
+
+class DuplicateDetectionTests(TestCase):
+    def test_open_duplicate_found_among_many_closed_lookalikes(self):
+        text = 'The projector in Lamb Hall room 310 shows no picture and the lamp light blinks orange.'
+        fields = {'description': text, 'type': 'INC', 'subtype': 'LAB'}
+        Ticket.objects.bulk_create(
+            Ticket(ticket_number=f'2025-{number}', requestor_email=f'user{number}@etsu.edu', requestor_name='User',
+                   title='Projector', item='projector', status=TicketStatus.CLOSED, **fields)
+            for number in range(similarity.MAX_CANDIDATES + 10)
+        )
+        for _ in similarity.rebuild_index():
+            pass
+        # Fewer matching bands than each closed ticket, but still a duplicate
+        original = Ticket.objects.create(
+            requestor_email='alice@etsu.edu', requestor_name='Alice', title='Projector broken',
+            item='projector', status=TicketStatus.NEW, **fields,
+        )
+        ticket = Ticket.objects.create(
+            requestor_email='alice@etsu.edu', requestor_name='Alice', title='Projector', item='projector',
+            **fields,
+        )
+        self.assertEqual(similarity.flag_probable_duplicate(ticket), original)
+
+
+class AccessCodeThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ticket = Ticket.objects.create(
+            requestor_email='user@etsu.edu', requestor_name='User', title='Printer jams',
+            description='The printer jams on every page.', type='INC', subtype='PRT', item='printer',
+        )
+
+    def setUp(self):
+        caches[settings.THROTTLE_CACHE].clear()
+        self.addCleanup(caches[settings.THROTTLE_CACHE].clear)
+        self.url = reverse('view_ticket', args=[self.ticket.ticket_number, self.ticket.access_code])
+
+    def drain(self, **keys):
+        for bucket in throttle.buckets(throttle.FAILURES, keys):
+            bucket.take(bucket.capacity)
+
+    def test_guessed_ticket_is_challenged_not_refused(self):
+        self.drain(ticket=self.ticket.ticket_number)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'throttle-challenge', status_code=429)
+
+    def test_guessing_ip_is_refused(self):
+        self.drain(ip='10.0.0.1')
+        response = self.client.get(self.url, REMOTE_ADDR='10.0.0.1')
+        self.assertNotContains(response, 'throttle-challenge', status_code=429)
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+
+class LockRetryTests(TransactionTestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp(prefix='helpdesk-retry-')
+        self.addCleanup(shutil.rmtree, media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.media = media
+        self.ticket = Ticket.objects.create(
+            requestor_email='user@etsu.edu', requestor_name='User', title='Printer jams',
+            description='The printer jams on every page.', type='INC', subtype='PRT', item='printer',
+        )
+
+    def test_retried_request_leaves_no_uploads_or_messages_behind(self):
+        attempts = []
+
+        @retry_on_locked
+        def view(request):
+            TicketAttachment.objects.create(ticket=self.ticket, file=ContentFile(b'log', name='log.txt'))
+            messages.success(request, 'Attachment saved.')
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OperationalError('database is locked')
+
+        request = RequestFactory().post('/')
+        request.session = {}
+        request._messages = FallbackStorage(request)
+        view(request)
+
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual([str(message) for message in get_messages(request)], ['Attachment saved.'])
+        attachment = TicketAttachment.objects.get()
+        self.assertEqual(os.listdir(os.path.join(self.media, 'ticket_attachments')), [os.path.basename(attachment.file.name)])
+
+
+class ConditionalResponseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ticket = Ticket.objects.create(
+            requestor_email='user@etsu.edu', requestor_name='User', title='Printer jams',
+            description='The printer jams on every page.', type='INC', subtype='PRT', item='printer',
+        )
+
+    def setUp(self):
+        self.url = reverse('view_ticket', args=[self.ticket.ticket_number, self.ticket.access_code])
+        # The first response sets the CSRF cookie that later ETags include
+        self.client.get(self.url)
+
+    def revalidate(self, url=None):
+        etag = self.client.get(url or self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url or self.url, HTTP_IF_NONE_MATCH=etag)
+        return response, queries
+
+    def test_unchanged_ticket_page_is_not_rendered(self):
+        response, queries = self.revalidate()
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.templates, [])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_changes_to_the_ticket_change_the_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        TicketMessage.objects.create(ticket=self.ticket, sender_email='user@etsu.edu', content='Any news?')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(self.url)['ETag']
+        other = Ticket.objects.create(
+            requestor_email='other@etsu.edu', requestor_name='Other', title='Printer jams',
+            description='Same printer.', type='INC', subtype='PRT', item='printer',
+        )
+        merge_tickets(other, [self.ticket])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_submission_form_and_confirmation_revalidate(self):
+        self.assertEqual(self.revalidate(reverse('submit_ticket'))[0].status_code, 304)
+        confirmation = reverse('ticket_confirmation', args=[self.ticket.ticket_number])
+        self.assertEqual(self.revalidate(confirmation)[0].status_code, 304)
+
+    def test_html_is_compressed(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'Printer jams', gzip.decompress(response.content))
+        self.assertTrue(response['ETag'].startswith('W/'))
+        if brotli is not None:
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertIn(b'Printer jams', brotli.decompress(response.content))
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        # The in-memory catalog would otherwise outlive each test's rolled-back changes
+        catalog.clear()
+        self.addCleanup(catalog.clear)
+
+    def test_edits_reach_the_forms_and_the_json(self):
+        response = self.client.get(reverse('ticket_catalog'))
+        self.assertIn(['wifi', 'WiFi Issues'], response.json()['items']['NET'])
+
+        wifi = CatalogItem.objects.get(subtype__code='NET', code='wifi')
+        wifi.label = 'Wireless'
+        wifi.save()
+        self.assertEqual(self.client.get(reverse('ticket_catalog'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertIn(('wifi', 'Wireless'), TicketSubmissionForm().fields['item'].choices)
+
+        wifi.active = False
+        wifi.save()
+        self.assertNotIn('wifi', dict(catalog.get_catalog().item_choices['NET']))
+        self.assertEqual(catalog.get_catalog().item_labels['NET', 'wifi'], 'Wireless')
+
+    @override_settings(TICKET_CATALOG_CHECK_SECONDS=0)
+    def test_edits_by_other_processes_are_picked_up(self):
+        version = catalog.get_catalog().version
+        # What another worker's edit leaves behind: new rows and a new version, but this process's memory untouched
+        CatalogItem.objects.filter(subtype__code='NET', code='wifi').update(label='Wireless')
+        CatalogVersion.objects.filter(pk=1).update(version=version + 1)
+        self.assertEqual(catalog.get_catalog().version, version + 1)
+        self.assertEqual(catalog.get_catalog().item_labels['NET', 'wifi'], 'Wireless')
+
+    def test_forms_only_accept_items_of_the_subtype(self):
+        data = {
+            'requestor_email': 'user@etsu.edu', 'requestor_name': 'User', 'title': 'No WiFi',
+            'description': 'No WiFi in the library.', 'type': 'INC', 'subtype': 'PRT', 'item': 'wifi',
+        }
+        self.assertIn('item', TicketSubmissionForm(data).errors)
+        self.assertTrue(TicketSubmissionForm({**data, 'subtype': 'NET'}).is_valid())
+
+    def test_remap_moves_tickets_and_skills_in_batches(self):
+        tickets = [
+            Ticket.objects.create(
+                requestor_email='user@etsu.edu', requestor_name='User', title='No WiFi',
+                description='No WiFi in the library.', type='INC', subtype='NET', item='wifi',
+            )
+            for _ in range(5)
+        ]
+        User = get_user_model()
+        both = User.objects.create_user('both', 'both@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN)
+        wifi_only = User.objects.create_user('wifi', 'wifi@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN)
+        TechnicianSkill.objects.create(technician=both, subtype='NET', item='wifi')
+        TechnicianSkill.objects.create(technician=both, subtype='NET', item='connectivity')
+        TechnicianSkill.objects.create(technician=wifi_only, subtype='NET', item='wifi')
+
+        call_command('remap_ticket_items', 'NET:wifi=NET:connectivity', batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(Ticket.objects.filter(subtype='NET', item='connectivity').count(), 5)
+        self.assertGreater(Ticket.objects.get(pk=tickets[0].pk).updated_at, tickets[0].updated_at)
+        self.assertEqual(
+            sorted(TechnicianSkill.objects.values_list('technician__username', 'item')),
+            [('both', 'connectivity'), ('wifi', 'connectivity')],
+        )
+        self.assertFalse(CatalogItem.objects.get(subtype__code='NET', code='wifi').active)
+        self.assertFalse(catalog.get_catalog().offers_item('NET', 'wifi'))
+
+
+def new_ticket(subtype='LAB', item='projector', **fields):
+    return Ticket.objects.create(**{
+        'requestor_email': 'user@etsu.edu', 'requestor_name': 'User', 'title': 'Help',
+        'description': 'Something is broken.', 'type': 'INC', 'subtype': subtype, 'item': item, **fields,
+    })
+
+
+class AutoAssignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.ann, cls.bob, cls.cat = [
+            User.objects.create_user(name, f'{name}@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN)
+            for name in ('ann', 'bob', 'cat')
+        ]
+        User.objects.create_user('gone', 'gone@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN, is_active=False)
+        User.objects.create_user('boss', 'boss@etsu.edu', 'pw', user_type=User.UserType.SYSTEM_MANAGER)
+
+    def assign(self, strategy, **fields):
+        return auto_assign(new_ticket(**fields), strategy)
+
+    def test_round_robin_takes_turns(self):
+        chosen = [self.assign(Strategy.ROUND_ROBIN) for _ in range(4)]
+        self.assertEqual(chosen, [self.ann, self.bob, self.cat, self.ann])
+
+    def test_least_open_prefers_fewest_open_tickets(self):
+        new_ticket(assigned_to=self.ann, status=TicketStatus.IN_PROGRESS)
+        new_ticket(assigned_to=self.bob, status=TicketStatus.WAITING)
+        new_ticket(assigned_to=self.cat, status=TicketStatus.RESOLVED)
+        self.assertEqual(self.assign(Strategy.LEAST_OPEN), self.cat)
+        # Everyone has one open ticket now: whoever was auto-assigned longest ago
+        self.assertEqual(self.assign(Strategy.LEAST_OPEN), self.ann)
+
+    def test_skills_fall_back_from_item_to_subtype_to_anyone(self):
+        TechnicianSkill.objects.create(technician=self.ann, subtype='LAB', item='projector')
+        TechnicianSkill.objects.create(technician=self.bob, subtype='LAB', item='')
+        self.assertEqual(self.assign(Strategy.SKILLS, subtype='LAB', item='projector'), self.ann)
+        self.assertEqual(self.assign(Strategy.SKILLS, subtype='LAB', item='lab_computer'), self.bob)
+        self.assertEqual(self.assign(Strategy.SKILLS, subtype='NET', item='wifi'), self.cat)
+
+    def test_only_active_technicians_are_considered(self):
+        get_user_model().objects.filter(pk__in=[self.ann.pk, self.bob.pk]).update(is_active=False)
+        self.assertEqual(set(current_workloads()), {self.cat.pk})
+        self.assertEqual({self.assign(strategy) for strategy in Strategy if strategy}, {self.cat})
+
+    def test_ticket_assigned_meanwhile_is_left_alone(self):
+        ticket = new_ticket()
+        Ticket.objects.filter(pk=ticket.pk).update(assigned_to=self.bob, status=TicketStatus.ASSIGNED)
+        self.assertIsNone(auto_assign(ticket, Strategy.LEAST_OPEN))
+        self.assertEqual(Ticket.objects.get(pk=ticket.pk).assigned_to, self.bob)
+        self.assertFalse(TechnicianWorkload.objects.filter(last_assigned_at__isnull=False).exists())
+
+    @override_settings(ASSIGNMENT_COUNT_MAX_AGE=60)
+    def test_workloads_are_bumped_then_recounted(self):
+        ticket = new_ticket()
+        self.assertEqual(auto_assign(ticket, Strategy.LEAST_OPEN), self.ann)
+        self.assertEqual(TechnicianWorkload.objects.get(pk=self.ann.pk).open_tickets, 1)
+
+        # Resolved by hand: only noticed once the counts are older than ASSIGNMENT_COUNT_MAX_AGE
+        Ticket.objects.filter(pk=ticket.pk).update(status=TicketStatus.RESOLVED)
+        self.assertEqual(current_workloads()[self.ann.pk].open_tickets, 1)
+        later = timezone.now() + timezone.timedelta(seconds=61)
+        self.assertEqual(current_workloads(later)[self.ann.pk].open_tickets, 0)
+        self.assertEqual(TechnicianWorkload.objects.get(pk=self.ann.pk).open_tickets, 0)
+
+    def test_submitted_tickets_follow_the_setting(self):
+        Settings.objects.create(auto_assignment=Strategy.ROUND_ROBIN)
+        response = self.client.post(reverse('submit_ticket'), {
+            'requestor_email': 'user@etsu.edu', 'requestor_name': 'User', 'title': 'No WiFi',
+            'description': 'No WiFi in the library.', 'type': 'INC', 'subtype': 'NET', 'item': 'wifi',
+        })
+        ticket = Ticket.objects.get(ticket_number=response.url.strip('/').split('/')[-1])
+        self.assertEqual((ticket.assigned_to, ticket.status), (self.ann, TicketStatus.ASSIGNED))
+
+    def test_simulate_assignment_runs(self):
+        for subtype, item in [('LAB', 'projector'), ('NET', 'wifi'), ('LAB', 'lab_computer')] * 3:
+            new_ticket(subtype=subtype, item=item)
+        out = io.StringIO()
+        call_command('simulate_assignment', technicians=3, stdout=out)
+        self.assertIn('Replaying 9 tickets across 3 technicians', out.getvalue())
+        for strategy in (Strategy.ROUND_ROBIN, Strategy.LEAST_OPEN, Strategy.SKILLS):
+            self.assertIn(strategy.label, out.getvalue())
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise OSError('Connection refused')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_HOST_PASSWORD='secret',
+    NOTIFICATION_COALESCE_SECONDS=60,
+)
+class NotificationCoalescingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.technician = get_user_model().objects.create_user(
+            'notify-tech', 'notify-tech@etsu.edu', 'pw', first_name='Nora', last_name='Tech',
+        )
+        cls.printer, cls.wifi = [
+            new_ticket(title=title, assigned_to=cls.technician, status=TicketStatus.ASSIGNED)
+            for title in ('Printer jams', 'No WiFi')
+        ]
+
+    def setUp(self):
+        self.manager = NotificationManager()
+        # Unsaved: a Settings row would make update_email_settings replace the test email backend
+        self.manager.settings = Settings()
+
+    def queue_events(self):
+        self.manager.notify_ticket_created(self.printer)
+        self.manager.notify_status_changed(self.printer, TicketStatus.NEW)
+        reply = TicketMessage.objects.create(
+            ticket=self.printer, sender=self.technician, sender_email=self.technician.email,
+            content='Please try the other tray.',
+        )
+        self.manager.notify_new_message(self.printer, reply)
+        self.manager.notify_ticket_assigned(self.printer)
+        self.manager.notify_ticket_created(self.wifi)
+
+    def send(self, seconds_later=61):
+        return send_pending_notifications(now=timezone.now() + timezone.timedelta(seconds=seconds_later))
+
+    def test_one_email_per_recipient_and_ticket(self):
+        self.queue_events()
+        self.assertEqual(PendingNotification.objects.count(), 6)
+        self.assertEqual(self.send(), (6, 3))
+        self.assertFalse(PendingNotification.objects.exists())
+
+        emails = {(email.to[0], email.subject): email for email in mail.outbox}
+        number = self.printer.ticket_number
+        self.assertEqual(set(emails), {
+            ('user@etsu.edu', f'4 Updates on Ticket {number}'),
+            ('notify-tech@etsu.edu', f'Ticket Assignment Updated - {number}'),
+            ('user@etsu.edu', f'Ticket Created - {self.wifi.ticket_number}'),
+        })
+        digest = emails['user@etsu.edu', f'4 Updates on Ticket {number}'].body
+        self.assertIn('The ticket was created.', digest)
+        self.assertIn('The status changed from New to Assigned.', digest)
+        self.assertIn('Please try the other tray.', digest)
+        self.assertIn('The ticket was assigned to Nora Tech', digest)
+        self.assertIn(self.printer.access_code, digest)
+        self.assertIn('helpdesk_notification_emails_total{template="ticket_updates"} 3', registry.render())
+
+    def test_events_wait_for_the_window(self):
+        self.queue_events()
+        self.assertEqual(self.send(seconds_later=30), (0, 0))
+        self.assertEqual(PendingNotification.objects.count(), 6)
+
+    def test_events_are_kept_until_their_email_is_sent(self):
+        self.queue_events()
+        with override_settings(EMAIL_BACKEND='tickets.tests.FailingEmailBackend'):
+            with self.assertRaises(OSError):
+                self.send()
+        self.assertEqual(PendingNotification.objects.count(), 6)
+        self.assertEqual(self.send(), (6, 3))
+
+
+class ReassignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.ann, cls.bob, cls.dan = [
+            User.objects.create_user(name, f'{name}@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN,
+                                     first_name=name.title())
+            for name in ('ann', 'bob', 'dan')
+        ]
+        User.objects.create_user('gone', 'gone@etsu.edu', 'pw', user_type=User.UserType.TECHNICIAN, is_active=False)
+        cls.new, cls.working, cls.waiting = [
+            new_ticket(title=status.label, assigned_to=cls.dan, status=status, requestor_email=email)
+            for status, email in [
+                (TicketStatus.NEW, 'user@etsu.edu'),
+                (TicketStatus.IN_PROGRESS, 'user@etsu.edu'),
+                (TicketStatus.WAITING, 'other@etsu.edu'),
+            ]
+        ]
+        cls.resolved = new_ticket(assigned_to=cls.dan, status=TicketStatus.RESOLVED)
+
+    def moved(self):
+        return {
+            ticket.pk: (ticket.assigned_to, ticket.status)
+            for ticket in Ticket.objects.filter(pk__in=[self.new.pk, self.working.pk, self.waiting.pk])
+        }
+
+    def ticket_updates(self, queries):
+        return [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "tickets_ticket"')]
+
+    def test_unassigned_tickets_go_back_to_new(self):
+        with CaptureQueriesContext(connection) as queries:
+            reassign_tickets(self.dan, notify=False)
+        self.assertEqual(len(self.ticket_updates(queries)), 1)
+        self.assertEqual(set(self.moved().values()), {(None, TicketStatus.NEW)})
+        self.assertEqual(Ticket.objects.get(pk=self.resolved.pk).assigned_to, self.dan)
+
+    def test_moved_tickets_keep_their_progress(self):
+        with CaptureQueriesContext(connection) as queries:
+            reassign_tickets(self.dan, to=self.ann, notify=False)
+        self.assertEqual(len(self.ticket_updates(queries)), 1)
+        self.assertEqual(self.moved(), {
+            self.new.pk: (self.ann, TicketStatus.ASSIGNED),
+            self.working.pk: (self.ann, TicketStatus.IN_PROGRESS),
+            self.waiting.pk: (self.ann, TicketStatus.WAITING),
+        })
+
+    def test_spreading_starts_with_the_fewest_open_tickets(self):
+        new_ticket(assigned_to=self.ann, status=TicketStatus.IN_PROGRESS)
+        new_ticket(assigned_to=self.ann, status=TicketStatus.IN_PROGRESS)
+        plan = reassign_tickets(self.dan, spread=True, notify=False)
+        self.assertEqual([technician for ticket, technician in plan], [self.bob, self.bob, self.ann])
+        self.assertEqual(self.moved()[self.waiting.pk], (self.ann, TicketStatus.WAITING))
+        # The workload rows are recounted by the next decision
+        self.assertEqual(current_workloads()[self.bob.pk].open_tickets, 2)
+
+    def test_spreading_by_skill(self):
+        Settings.objects.create(auto_assignment=Strategy.SKILLS)
+        new_ticket(assigned_to=self.bob, status=TicketStatus.IN_PROGRESS, subtype='NET', item='wifi')
+        TechnicianSkill.objects.create(technician=self.bob, subtype='LAB', item='projector')
+        plan = plan_reassignment(self.dan, spread=True)
+        self.assertEqual({technician for ticket, technician in plan}, {self.bob})
+        # Only a preview
+        self.assertEqual(set(Ticket.objects.filter(assigned_to=self.dan).values_list('pk', flat=True)),
+                         {self.new.pk, self.working.pk, self.waiting.pk, self.resolved.pk})
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', EMAIL_HOST_PASSWORD='secret')
+    def test_each_requestor_gets_one_email(self):
+        plan = reassign_tickets(self.dan, to=self.ann, notify=False)
+        manager = NotificationManager()
+        # Unsaved: a Settings row would make update_email_settings replace the test email backend
+        manager.settings = Settings()
+        with self.captureOnCommitCallbacks(execute=True):
+            manager.notify_tickets_reassigned(plan, self.dan)
+        emails = {email.to[0]: email.body for email in mail.outbox}
+        self.assertEqual(set(emails), {'user@etsu.edu', 'other@etsu.edu'})
+        self.assertIn(self.new.ticket_number, emails['user@etsu.edu'])
+        self.assertIn(self.working.ticket_number, emails['user@etsu.edu'])
+        self.assertNotIn(self.waiting.ticket_number, emails['user@etsu.edu'])
+        self.assertIn('assigned to Dan', emails['user@etsu.edu'])
@@ -0,0 +1,54 @@
+"""
+Message threads are shown newest-first in fixed-size windows.
+
+Each window is a keyset query on the (ticket, created_at) index, so
+rendering a ticket costs the same with 5 messages or 5,000. Earlier
+windows are fetched by the "Load earlier messages" button through
+message_window_response.
+"""
+from django.db.models import Q
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.template.loader import render_to_string
+
+MESSAGE_WINDOW_SIZE = 20
+
+
+def message_window(messages, before=None, size=MESSAGE_WINDOW_SIZE):
+    """
+    Return the newest `size` of `messages` (a ticket's related manager),
+    or the newest ones older than message id `before`, oldest first,
+    together with whether any earlier messages exist.
+    """
+    window = messages.select_related('sender').order_by('-created_at', '-id')
+    if before is not None:
+        anchor = messages.filter(id=before).values_list('created_at', flat=True).first()
+        if anchor is None:
+            return [], False
+        window = window.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=before))
+    window = list(window[:size + 1])
+    return window[:size][::-1], len(window) > size
+
+
+def message_window_response(request, ticket, messages=None):
+    """
+    JSON for the "Load earlier messages" button: the rendered window and the
+    next cursor. `messages` narrows the thread (default: all of `ticket`'s).
+    """
+    try:
+        before = int(request.GET['before'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest('A numeric "before" message id is required.')
+
+    if messages is None:
+        messages = ticket.messages
+    messages, has_earlier = message_window(messages, before=before)
+    html = render_to_string(
+        'tickets/includes/message_list.html',
+        {'ticket': ticket, 'thread_messages': messages},
+        request=request,
+    )
+    return JsonResponse({
+        'html': html,
+        'has_earlier': has_earlier,
+        'before': messages[0].id if messages else None,
+    })
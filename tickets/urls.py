@@ -8,6 +8,8 @@ urlpatterns = [
     path('confirmation/<str:ticket_number>/', views.ticket_confirmation, name='ticket_confirmation'),
     path('access/', views.access_ticket, name='access_ticket'),
     path('view/<str:ticket_number>/<str:access_code>/', views.view_ticket, name='view_ticket'),
+    path('view/<str:ticket_number>/<str:access_code>/messages/', views.view_ticket_messages, name='view_ticket_messages'),
+    path('catalog.json', views.ticket_catalog, name='ticket_catalog'),
 
     # Technician URLs
     path('dashboard/', views_technician.dashboard, name='technician_dashboard'),
@@ -15,4 +17,7 @@ urlpatterns = [
     path('manage/<str:ticket_number>/', views_technician.manage_ticket, name='manage_ticket'),
     path('assign/<str:ticket_number>/', views_technician.self_assign_ticket, name='self_assign_ticket'),
     path('manage/<str:ticket_number>/add-asset/', views_technician.add_asset_to_ticket, name='add_asset_to_ticket'),
+    path('manage/<str:ticket_number>/messages/', views_technician.ticket_messages, name='ticket_messages'),
+    path('archive/', views_technician.archive_list, name='archive_list'),
+    path('archive/<str:ticket_number>/', views_technician.archived_ticket, name='archived_ticket'),
 ]
\ No newline at end of file
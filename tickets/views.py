@@ -1,18 +1,49 @@
+import datetime
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse
 from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
 from django.utils.html import strip_tags
-from .models import Ticket, TicketAttachment, TicketMessage
+from .models import ArchivedTicket, Ticket, TicketAttachment, TicketMessage
 from .forms import TicketSubmissionForm, TicketAccessForm, TicketMessageForm
 from .notifications import NotificationManager
+from .merge import requestor_messages
+from .threads import message_window, message_window_response
+from .similarity import flag_probable_duplicate
+from .assignment import auto_assign
+from .catalog import get_catalog
 from django.conf import settings
 from accounts.models import Settings
 from assets.models import Asset
+from helpdesk.conditional import conditional_page, release_stamp
+from helpdesk.db import retry_on_locked
+from helpdesk.throttle import record_failure, throttle
+
+def _submit_form_version(request):
+    # The form only changes with the code and the ticket catalog
+    return (get_catalog().version,), datetime.datetime.fromtimestamp(release_stamp() / 1e9, datetime.timezone.utc)
 
+def _ticket_version(request, ticket_number, access_code=None):
+    tickets = Ticket.objects.filter(ticket_number=ticket_number)
+    if access_code is not None:
+        tickets = tickets.filter(access_code=access_code)
+    row = tickets.values_list('pk', 'updated_at', 'merged_into', 'merged_into__updated_at').first()
+    if row is None:
+        return None
+    # A merged ticket's page shows the ticket it was merged into; labels come from the catalog
+    return (row, get_catalog().version), max(row[1], row[3] or row[1])
+
+@throttle('submit_ticket')
+@conditional_page(_submit_form_version)
+@retry_on_locked
 def submit_ticket(request):
     """Public view for submitting new tickets"""
     if request.method == 'POST':
@@ -56,20 +87,61 @@ def submit_ticket(request):
             for file in files:
                 TicketAttachment.objects.create(ticket=ticket, file=file)
             
+            # Flag it for technicians if it repeats an open ticket
+            original = flag_probable_duplicate(ticket)
+            if original and original.requestor_email.lower() == ticket.requestor_email.lower():
+                messages.info(
+                    request, f"This looks like your open ticket {original.ticket_number}; we've linked the two."
+                )
+            
             # Send notification
             notification_manager = NotificationManager()
             notification_manager.notify_ticket_created(ticket)
+            if auto_assign(ticket):
+                notification_manager.notify_ticket_assigned(ticket)
             
             messages.success(request, 'Ticket submitted successfully! Check your email for details.')
             return redirect('ticket_confirmation', ticket_number=ticket.ticket_number)
     else:
         form = TicketSubmissionForm()
     
-    return render(request, 'tickets/submit_ticket.html', {'form': form})
+    return render(request, 'tickets/submit_ticket.html', {
+        'form': form, 'release': release_stamp(), 'catalog_version': form.catalog.version,
+    })
+
+@require_safe
+@condition(etag_func=lambda request: str(get_catalog().version))
+def ticket_catalog(request):
+    """The active ticket catalog as JSON, for the forms' subtype and item dropdowns"""
+    catalog = get_catalog()
+    response = HttpResponse(catalog.json, content_type='application/json')
+    if request.GET.get('v') == str(catalog.version):
+        # The forms link to ?v=<version>, so this URL's answer never changes
+        patch_cache_control(response, public=True, max_age=86400, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
 
+@throttle('view_ticket', methods=('GET', 'POST'), guards_access_code=True)
+@conditional_page(_ticket_version)
+@retry_on_locked
 def view_ticket(request, ticket_number, access_code):
     """Public view for requestors to view their tickets"""
-    ticket = get_object_or_404(Ticket, ticket_number=ticket_number, access_code=access_code)
+    try:
+        ticket = Ticket.objects.get(ticket_number=ticket_number, access_code=access_code)
+    except Ticket.DoesNotExist:
+        # Old closed tickets are moved to the archive; links from emails keep working
+        archived = get_object_or_404(ArchivedTicket, ticket_number=ticket_number, access_code=access_code)
+        return render(request, 'tickets/archived_ticket.html', {'ticket': archived})
+    # A merged ticket's link shows the status of the ticket it was merged into
+    # and this requestor's part of its thread; replies are still signed by
+    # this requestor (see tickets/merge.py)
+    merged_from = None
+    thread = ticket.messages
+    if ticket.merged_into_id:
+        merged_from, ticket = ticket, ticket.merged_into
+        thread = requestor_messages(ticket, merged_from)
+    requestor = merged_from or ticket
     notification_manager = NotificationManager()
 
     if request.method == 'POST':
@@ -77,22 +149,38 @@ def view_ticket(request, ticket_number, access_code):
         if message_form.is_valid():
             message = message_form.save(commit=False)
             message.ticket = ticket
-            message.sender_email = ticket.requestor_email
+            message.sender_email = requestor.requestor_email
             message.is_from_requestor = True
             message.save()
     else:
         message_form = TicketMessageForm()
 
+    thread_messages, has_earlier_messages = message_window(thread)
     context = {
         'ticket': ticket,
+        'merged_from': merged_from,
+        'requestor': requestor,
         'message_form': message_form,
+        'thread_messages': thread_messages,
+        'has_earlier_messages': has_earlier_messages,
+        'messages_url': reverse('view_ticket_messages', args=[ticket_number, access_code]),
     }
     return render(request, 'tickets/view_ticket.html', context)
 
+@throttle('view_ticket', methods=('GET',), guards_access_code=True)
+def view_ticket_messages(request, ticket_number, access_code):
+    """Earlier messages of a ticket's thread, for the public ticket page"""
+    ticket = get_object_or_404(Ticket, ticket_number=ticket_number, access_code=access_code)
+    if ticket.merged_into_id:
+        return message_window_response(request, ticket.merged_into, requestor_messages(ticket.merged_into, ticket))
+    return message_window_response(request, ticket)
+
+@conditional_page(_ticket_version)
 def ticket_confirmation(request, ticket_number):
     ticket = get_object_or_404(Ticket, ticket_number=ticket_number)
     return render(request, 'tickets/confirmation.html', {'ticket': ticket})
 
+@throttle('access_ticket', guards_access_code=True)
 def access_ticket(request):
     if request.method == 'POST':
         form = TicketAccessForm(request.POST)
@@ -109,6 +197,13 @@ def access_ticket(request):
                 )
                 return redirect('view_ticket', ticket_number=ticket.ticket_number, access_code=access_code)
             except Ticket.DoesNotExist:
+                if ArchivedTicket.objects.filter(
+                    ticket_number=ticket_number,
+                    requestor_email=email,
+                    access_code=access_code
+                ).exists():
+                    return redirect('view_ticket', ticket_number=ticket_number, access_code=access_code)
+                record_failure(request)
                 messages.error(request, 'Invalid ticket information. Please check your email and try again.')
     else:
         form = TicketAccessForm()
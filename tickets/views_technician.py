@@ -1,32 +1,33 @@
+import re
+
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Count, Q
+from django.http import Http404, HttpResponseForbidden
 from django.utils.timezone import now
-from .models import Ticket, TicketMessage
-from accounts.models import Settings
+from .models import ArchivedTicket, Ticket, TicketMessage
+from accounts.permissions import can_view_ticket, get_settings, visible_tickets
 from .forms import *
 from .notifications import NotificationManager
+from .threads import message_window, message_window_response
+from .merge import merge_tickets
+from .assignment import auto_assign
+from .similarity import flag_probable_duplicate, similar_resolved_tickets
 from django.contrib.auth import get_user_model
 from assets.models import Asset
-
-def is_system_manager(user):
-    User = get_user_model()
-    return user.is_authenticated and user.user_type == User.UserType.SYSTEM_MANAGER
+from helpdesk.db import retry_on_locked, run_in_write_transaction
 
 @login_required
 def dashboard(request):
     """Technician dashboard showing ticket queue"""
     # Get system settings
-    settings = Settings.objects.first()
-    notification_manager = NotificationManager()
+    settings = get_settings(request)
 
     # Base queryset
-    if (settings and settings.ticket_visibility) or (is_system_manager(request.user)):
-        tickets = Ticket.objects.all()
-    else:
-        tickets = Ticket.objects.filter(assigned_to=request.user)
+    tickets = visible_tickets(request)
 
     # Search functionality
     search_query = request.GET.get('search', '')
@@ -53,6 +54,7 @@ def dashboard(request):
     sort_by = request.GET.get('sort', '-time_created')
     valid_sort_fields = [
         'time_created', '-time_created',
+        'last_activity_at', '-last_activity_at',
         'status', '-status',
         'type', '-type',
         'title', '-title'
@@ -65,14 +67,15 @@ def dashboard(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
-    # Count tickets by status
+    # Count tickets by status, in one query
+    counts = dict(tickets.order_by().values_list('status').annotate(count=Count('pk')))
     status_counts = {
-        'new': tickets.filter(status='NEW').count(),
-        'assigned': tickets.filter(status='ASG').count(),
-        'in_progress': tickets.filter(status='PRG').count(),
-        'waiting': tickets.filter(status='WTG').count(),
-        'resolved': tickets.filter(status='RES').count(),
-        'closed': tickets.filter(status='CLS').count(),
+        'new': counts.get('NEW', 0),
+        'assigned': counts.get('ASG', 0),
+        'in_progress': counts.get('PRG', 0),
+        'waiting': counts.get('WTG', 0),
+        'resolved': counts.get('RES', 0),
+        'closed': counts.get('CLS', 0),
     }
 
     context = {
@@ -89,6 +92,7 @@ def dashboard(request):
     return render(request, 'tickets/technician/dashboard.html', context)
 
 @login_required
+@retry_on_locked
 def create_ticket(request):
     """Allow technicians to create tickets on behalf of users"""
     if request.method == 'POST':
@@ -131,9 +135,15 @@ def create_ticket(request):
             for file in files:
                 TicketAttachment.objects.create(ticket=ticket, file=file)
 
+            original = flag_probable_duplicate(ticket)
+            if original:
+                messages.warning(request, f'This looks like a duplicate of open ticket {original.ticket_number}.')
+
             # Send notification
             notification_manager = NotificationManager()
             notification_manager.notify_ticket_created(ticket)
+            if auto_assign(ticket):
+                notification_manager.notify_ticket_assigned(ticket)
 
             messages.success(request, f'Ticket {ticket.ticket_number} created successfully!')
             return redirect('manage_ticket', ticket_number=ticket.ticket_number)
@@ -143,17 +153,31 @@ def create_ticket(request):
     return render(request, 'tickets/technician/create_ticket.html', {'form': form})
 
 @login_required
+@retry_on_locked
 def manage_ticket(request, ticket_number):
     """Handle ticket management operations"""
-    ticket = get_object_or_404(Ticket, ticket_number=ticket_number)
-    settings = Settings.objects.first()
+    try:
+        ticket = Ticket.objects.get(ticket_number=ticket_number)
+    except Ticket.DoesNotExist:
+        if ArchivedTicket.objects.filter(ticket_number=ticket_number).exists():
+            return redirect('archived_ticket', ticket_number=ticket_number)
+        raise Http404('No Ticket matches the given query.')
+    settings = get_settings(request)
     notification_manager = NotificationManager()
 
-    if not is_system_manager(request.user):
-        # Check if technician has access to this ticket
-        if not settings.ticket_visibility and ticket.assigned_to != request.user:
-            messages.error(request, "You don't have permission to view this ticket.")
-            return redirect('technician_dashboard')
+    # Check if technician has access to this ticket
+    if not can_view_ticket(request, ticket):
+        messages.error(request, "You don't have permission to view this ticket.")
+        return redirect('technician_dashboard')
+
+    if ticket.merged_into_id:
+        messages.info(request, f'Ticket {ticket.ticket_number} was merged into this ticket.')
+        return redirect('manage_ticket', ticket_number=ticket.merged_into.ticket_number)
+
+    if ticket.has_new_responses and ticket.assigned_to_id == request.user.id:
+        # The assigned technician has now seen the responses (and the digest drops the ticket).
+        # A write on GET too, so it waits for the lock like the POSTs do.
+        run_in_write_transaction(Ticket.objects.filter(pk=ticket.pk).update, has_new_responses=False)
 
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -178,8 +202,7 @@ def manage_ticket(request, ticket_number):
                 message.save()
 
                 # Generate new access code when technician responds
-                ticket.access_code = ticket.generate_access_code()
-                ticket.save()
+                ticket.refresh_access_code()
 
                 notification_manager.notify_new_message(ticket, message)
                 messages.success(request, 'Message added successfully.')
@@ -215,12 +238,28 @@ def manage_ticket(request, ticket_number):
                 try:
                     asset = Asset.objects.get(id=asset_id)
                     ticket.assets.remove(asset)
+                    Ticket.objects.filter(pk=ticket.pk).update(updated_at=now())
                     messages.success(request, f"Asset {asset.inventory_number} removed from ticket.")
                 except Asset.DoesNotExist:
                     messages.error(request, "Asset not found.")
             else:
                 messages.error(request, "No asset specified.")
 
+        elif action == 'merge_tickets':
+            numbers = set(request.POST.getlist('merge_ticket'))
+            numbers.update(re.split(r'[\s,]+', request.POST.get('merge_ticket_numbers', '')))
+            numbers -= {'', ticket.ticket_number}
+            sources = list(visible_tickets(request).filter(ticket_number__in=numbers, merged_into__isnull=True))
+            missing = numbers - {source.ticket_number for source in sources}
+            if missing:
+                messages.error(request, f"Tickets not found or already merged: {', '.join(sorted(missing))}")
+            elif not sources:
+                messages.error(request, 'No tickets selected to merge.')
+            else:
+                merge_tickets(ticket, sources, merged_by=request.user)
+                notification_manager.notify_tickets_merged(ticket, sources)
+                messages.success(request, f"Merged {', '.join(s.ticket_number for s in sources)} into this ticket.")
+
     message_form = TicketMessageForm()
 
     # Get available technicians for assignment:
@@ -228,26 +267,40 @@ def manage_ticket(request, ticket_number):
     available_technicians = User.objects.filter(id=request.user.id) # First get current user (in case they are sys manager, then they can self-assign)
     available_technicians = available_technicians | User.objects.filter(user_type='TCH') # union
 
+    thread_messages, has_earlier_messages = message_window(ticket.messages)
     context = {
         'ticket': ticket,
         'message_form': message_form,
+        'thread_messages': thread_messages,
+        'has_earlier_messages': has_earlier_messages,
+        'messages_url': reverse('ticket_messages', args=[ticket.ticket_number]),
         'available_technicians': available_technicians,
+        'similar_tickets': similar_resolved_tickets(ticket),
         'settings': settings,
         'status_choices': Ticket.status.field.choices,
     }
     return render(request, 'tickets/technician/manage_ticket.html', context)
 
 @login_required
+def ticket_messages(request, ticket_number):
+    """Earlier messages of a ticket's thread, for manage_ticket"""
+    ticket = get_object_or_404(Ticket, ticket_number=ticket_number)
+
+    if not can_view_ticket(request, ticket):
+        return HttpResponseForbidden("You don't have permission to view this ticket.")
+
+    return message_window_response(request, ticket)
+
+@login_required
+@retry_on_locked
 def add_asset_to_ticket(request, ticket_number):
     """Add an asset to a ticket"""
     ticket = get_object_or_404(Ticket, ticket_number=ticket_number)
-    settings = Settings.objects.first()
     
-    if not is_system_manager(request.user):
-        # Check if technician has access to this ticket
-        if (not settings.ticket_visibility and ticket.assigned_to != request.user):
-            messages.error(request, "You don't have permission to modify this ticket.")
-            return redirect('technician_dashboard')
+    # Check if technician has access to this ticket
+    if not can_view_ticket(request, ticket):
+        messages.error(request, "You don't have permission to modify this ticket.")
+        return redirect('technician_dashboard')
     
     if request.method == 'POST':
         inventory_number = request.POST.get('inventory_number')
@@ -259,6 +312,8 @@ def add_asset_to_ticket(request, ticket_number):
                     messages.warning(request, f"Asset {inventory_number} is already associated with this ticket.")
                 else:
                     ticket.assets.add(asset)
+                    # The public ticket page lists the assets
+                    Ticket.objects.filter(pk=ticket.pk).update(updated_at=now())
                     messages.success(request, f"Asset {inventory_number} added to ticket.")
             except Asset.DoesNotExist:
                 messages.error(request, f"No asset found with inventory number {inventory_number}.")
@@ -268,9 +323,10 @@ def add_asset_to_ticket(request, ticket_number):
     return redirect('manage_ticket', ticket_number=ticket.ticket_number)
 
 @login_required
+@retry_on_locked(methods=('GET', 'POST'))
 def self_assign_ticket(request, ticket_number):
     """Allow technicians to assign tickets to themselves"""
-    settings = Settings.objects.first()
+    settings = get_settings(request)
     notification_manager = NotificationManager()
 
     if not settings or not settings.ticket_self_assignment:
@@ -290,3 +346,44 @@ def self_assign_ticket(request, ticket_number):
         messages.success(request, 'Ticket self-assigned successfully.')
 
     return redirect('manage_ticket', ticket_number=ticket_number)
+
+@login_required
+def archive_list(request):
+    """Read-only search over archived tickets"""
+    tickets = visible_tickets(request, ArchivedTicket.objects.all())
+
+    search_query = request.GET.get('search', '')
+    if search_query:
+        tickets = tickets.filter(
+            Q(ticket_number__icontains=search_query) |
+            Q(title__icontains=search_query) |
+            Q(description__icontains=search_query) |
+            Q(requestor_email__icontains=search_query) |
+            Q(requestor_name__icontains=search_query)
+        )
+
+    type_filter = request.GET.get('type', '')
+    if type_filter:
+        tickets = tickets.filter(type=type_filter)
+
+    paginator = Paginator(tickets.order_by('-time_created'), 20)
+    page_obj = paginator.get_page(request.GET.get('page'))
+
+    context = {
+        'page_obj': page_obj,
+        'search_query': search_query,
+        'type_filter': type_filter,
+        'ticket_type_choices': Ticket.type.field.choices,
+    }
+    return render(request, 'tickets/technician/archive.html', context)
+
+@login_required
+def archived_ticket(request, ticket_number):
+    """Read-only view of an archived ticket"""
+    ticket = get_object_or_404(ArchivedTicket, ticket_number=ticket_number)
+
+    if not can_view_ticket(request, ticket):
+        messages.error(request, "You don't have permission to view this ticket.")
+        return redirect('archive_list')
+
+    return render(request, 'tickets/archived_ticket.html', {'ticket': ticket, 'staff_view': True})